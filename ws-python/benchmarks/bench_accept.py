@@ -0,0 +1,60 @@
+#!/bin/python3
+"""
+Measures how many connections per second `WebSocketServer.accept()` upgrades during a
+reconnect storm, while idle clients hold handshakes open without sending anything.
+
+Usage: python -m benchmarks.bench_accept [connections] [client threads] [idle clients]
+"""
+
+import socket, sys, threading, time
+
+from websocket.websockets import WebSocketServer
+
+HANDSHAKE = (
+    b"GET / HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\n"
+    b"Connection: Upgrade\r\nSec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n"
+    b"Sec-WebSocket-Version: 13\r\n\r\n"
+)
+
+
+def storm(addr, count: int) -> None:
+    for _ in range(count):
+        conn = socket.create_connection(addr)
+        conn.sendall(HANDSHAKE)
+        assert conn.recv(4096).startswith(b"HTTP/1.1 101")
+        conn.close()
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    idle = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+
+    server = WebSocketServer(("127.0.0.1", 0))
+    addr = server.sock.getsockname()
+    silent = [socket.create_connection(addr) for _ in range(idle)]
+
+    per_client = total // clients
+    threads = [
+        threading.Thread(target=storm, args=(addr, per_client)) for _ in range(clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for _ in range(per_client * clients):
+        ws = server.accept(timeout=10)
+        ws.conn.shutdown(socket.SHUT_RDWR)
+    elapsed = time.perf_counter() - start
+    for thread in threads:
+        thread.join()
+
+    print(f"{per_client * clients} handshakes from {clients} clients, {idle} idle")
+    print(f"{per_client * clients / elapsed:,.0f} connections/s")
+    for conn in silent:
+        conn.close()
+    server.acceptor.close()
+    server.sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/bin/python3
+"""
+Measures fan-out latency of `WebSocketServer.broadcast()`, the time from the call until
+the frame has been handed to every subscriber's socket, against sending to each
+connection with `send()`. Each subscriber is a socketpair, so counts are bounded by the
+open file limit: 50k subscribers needs `ulimit -n` above 100k.
+
+Usage: python -m benchmarks.bench_broadcast [subscriber count ...]
+"""
+
+import resource, selectors, socket, sys, threading, time
+
+from websocket.websockets import WebSocket, WebSocketServer
+
+
+def drain(peers: list[socket.socket], size: int) -> None:
+    sel = selectors.DefaultSelector()
+    for peer in peers:
+        sel.register(peer, selectors.EVENT_READ, [0])
+    remaining = len(peers)
+    while remaining:
+        for key, _ in sel.select():
+            got = key.data
+            got[0] += len(key.fileobj.recv(65536))
+            if got[0] >= size:
+                sel.unregister(key.fileobj)
+                remaining -= 1
+    sel.close()
+
+
+def percentiles(samples: list[float]) -> str:
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))] * 1e3
+    return f"p50 {pick(0.5):7.2f} ms  p99 {pick(0.99):7.2f} ms  max {pick(1):7.2f} ms"
+
+
+def run(count: int, rounds: int) -> None:
+    server = WebSocketServer(("127.0.0.1", 0))
+    peers = []
+    for _ in range(count):
+        a, b = socket.socketpair()
+        WebSocket(a, is_server=True, registry=server.connections)
+        peers.append(b)
+    msg = b'{"type": "tick", "price": 1234.5}' * 4
+    frame_size = len(msg) + 2
+
+    shared, naive = [], []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        assert server.broadcast(msg) == count
+        shared.append(time.perf_counter() - start)
+        drain(peers, frame_size)
+
+        start = time.perf_counter()
+        for ws in server.connections:
+            ws.send(msg)
+        naive.append(time.perf_counter() - start)
+        drain(peers, frame_size)
+
+    print(f"{count} subscribers, {rounds} rounds")
+    print(f"  broadcast: {percentiles(shared)}")
+    print(f"  send loop: {percentiles(naive)}")
+    for peer in peers:
+        peer.close()
+    server.sock.close()
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [1000, 10_000, 50_000]
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    threading.stack_size(256 * 1024)
+    for count in counts:
+        if count * 2 + 64 > hard:
+            print(f"{count} subscribers: skipped, needs a file limit above {count * 2}")
+            continue
+        run(count, max(10, 200_000 // count))
+
+
+if __name__ == "__main__":
+    main()
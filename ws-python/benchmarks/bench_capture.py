@@ -0,0 +1,83 @@
+#!/bin/python3
+"""
+Measures the cost `Capture` adds to each received frame, for captured connections and
+for connections left out of the sample, and the rate `replay()` sends a capture at full
+speed against a local `WebSocketServer`, next to the rate the server takes messages in.
+
+Usage: python -m benchmarks.bench_capture [frame count] [payload size] [connections]
+"""
+
+import os, sys, tempfile, threading, time
+
+from websocket.capture import Capture, replay
+from websocket.frames import Frame
+from websocket.metrics import Hooks
+from websocket.websockets import WebSocket, WebSocketServer
+
+
+def hook_cost(hooks: Hooks, frames: list[Frame], ws) -> float:
+    start = time.perf_counter()
+    for frame in frames:
+        hooks.on_frame_in(ws, frame)
+    return (time.perf_counter() - start) / len(frames) * 1e9
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    connections = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    frames = [Frame(Frame.BINARY, os.urandom(size))] * count
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "capture")
+        print(f"{count} frames of {size} B")
+        print(f"  no hooks          {hook_cost(Hooks(), frames, object()):6,.0f} ns")
+        skipped = Capture(os.path.join(directory, "skipped"), sample=0)
+        print(f"  capture, skipped  {hook_cost(skipped, frames, object()):6,.0f} ns")
+        skipped.close()
+
+        capture = Capture(path)
+        peers = [object() for _ in range(connections)]
+        start = time.perf_counter()
+        for i, frame in enumerate(frames):
+            capture.on_frame_in(peers[i % connections], frame)
+        elapsed = time.perf_counter() - start
+        for peer in peers:
+            capture.on_close(peer, 1000)
+        capture.close()
+        print(f"  capture, recorded {elapsed / count * 1e9:6,.0f} ns")
+
+        received = 0
+        done = threading.Event()
+        lock = threading.Lock()
+
+        def consume(ws: WebSocket) -> None:
+            nonlocal received
+            try:
+                while True:
+                    ws.recv_message()
+                    with lock:
+                        received += 1
+                        if received == count:
+                            done.set()
+            except ConnectionError:
+                pass
+
+        server = WebSocketServer(("127.0.0.1", 0), max_queue=None, max_queue_bytes=None)
+        url = f"ws://127.0.0.1:{server.sock.getsockname()[1]}/"
+        serving = threading.Thread(target=server.serve_forever, args=(consume, 0.05))
+        serving.start()
+        start = time.perf_counter()
+        result = replay(path, url, speed=None)
+        done.wait(60)
+        server_seconds = time.perf_counter() - start
+        server.shutdown()
+        serving.join()
+        server.close()
+        print(f"replay of {connections} connections at full speed")
+        print(f"  replay sent      {result['frames_per_s']:10,.0f} frames/s")
+        print(f"  server received  {received / server_seconds:10,.0f} messages/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/bin/python3
+"""
+Measures the cost of sending and receiving small JSON messages by hand, with
+`json.dumps()` and `send_text()`, then `recv_text()` and `json.loads()`, against
+`send_obj()` and `recv_obj()` with the "json" subprotocol's codec, which skips the
+intermediate strings and uses orjson when it is installed. Only the encoding, and the
+receive path from the frame's payload in the receive buffer, are timed.
+
+Usage: python -m benchmarks.bench_codec [message count]
+"""
+
+import json, sys, time
+
+from websocket import codec
+from websocket.frames import Frame
+from websocket.messages import MessageAssembler
+
+MESSAGE = {
+    "type": "trade",
+    "symbol": "BTC-USD",
+    "price": 64123.5,
+    "size": 0.0125,
+    "side": "buy",
+    "ids": [18234, 18235, 18236],
+    "maker": False,
+}
+
+
+def by_hand(frames: list[Frame]) -> tuple[float, float]:
+    start = time.perf_counter()
+    for _ in frames:
+        json.dumps(MESSAGE).encode()
+    encoded = time.perf_counter() - start
+    assembler = MessageAssembler()
+    start = time.perf_counter()
+    for frame in frames:
+        json.loads(assembler.feed(frame)[1])
+    return encoded, time.perf_counter() - start
+
+
+def with_codec(frames: list[Frame]) -> tuple[float, float]:
+    encode, decode = codec.JSON.encode, codec.JSON.decode
+    start = time.perf_counter()
+    for _ in frames:
+        encode(MESSAGE)
+    encoded = time.perf_counter() - start
+    # Connections with a codec subprotocol queue text as its bytes for recv_obj()
+    assembler = MessageAssembler(raw_text=True)
+    start = time.perf_counter()
+    for frame in frames:
+        decode(assembler.feed(frame)[1])
+    return encoded, time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    payload = bytearray(json.dumps(MESSAGE).encode())
+    # Received payloads this small are views of the receive buffer
+    frames = [Frame(Frame.TEXT, memoryview(payload))] * count
+    backend = "json" if codec.orjson is None else "orjson"
+    print(f"{count} messages of {len(payload)} B, codec backend {backend}")
+    for name, run in (("by hand", by_hand), ("codec", with_codec)):
+        encoded, decoded = run(frames)
+        print(
+            f"  {name:<8} encode {encoded / count * 1e9:6,.0f} ns, "
+            f"receive and decode {decoded / count * 1e9:6,.0f} ns"
+        )
+
+
+if __name__ == "__main__":
+    main()
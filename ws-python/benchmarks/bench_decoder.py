@@ -0,0 +1,37 @@
+#!/bin/python3
+"""
+Measures how fast `FrameDecoder` turns a stream of small frames into `Frame`s when the
+stream arrives in socket-sized reads.
+
+Usage: python -m benchmarks.bench_decoder [payload size] [frame count] [read size]
+"""
+
+import sys, time
+
+from websocket.frames import Frame, FrameDecoder
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+    read_size = int(sys.argv[3]) if len(sys.argv) > 3 else 4096
+
+    stream = bytes(Frame(Frame.BINARY, bytes(size))) * count
+    reads = [stream[i : i + read_size] for i in range(0, len(stream), read_size)]
+
+    decoder = FrameDecoder()
+    decoded = 0
+    start = time.perf_counter()
+    for data in reads:
+        decoder.feed(data)
+        for _frame in decoder.frames():
+            decoded += 1
+    elapsed = time.perf_counter() - start
+
+    assert decoded == count
+    print(f"{count} frames of {size} B in {read_size} B reads: {elapsed:.3f} s")
+    print(f"{count / elapsed:,.0f} frames/s, {len(stream) / elapsed / 1e6:.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/bin/python3
+"""
+Compares the CPU cost of permessage-deflate against the bytes it saves on a synthetic
+corpus of JSON messages, with and without context takeover and at several thresholds.
+
+Usage: python -m benchmarks.bench_deflate [message count]
+"""
+
+import json, random, sys, time
+
+from websocket.deflate import PerMessageDeflate
+
+
+def corpus(count: int) -> list[bytes]:
+    rng = random.Random(0)
+    symbols = ["AAPL", "MSFT", "GOOG", "AMZN", "NVDA", "META"]
+    messages = []
+    for seq in range(count):
+        msg = {"type": "trade", "seq": seq, "symbol": rng.choice(symbols)}
+        msg["price"] = round(rng.uniform(10, 1000), 2)
+        msg["size"] = rng.randint(1, 500)
+        if rng.random() < 0.2:
+            msg["book"] = [[round(rng.uniform(10, 1000), 2), rng.randint(1, 99)]] * 8
+        messages.append(json.dumps(msg).encode())
+    return messages
+
+
+def run(messages: list[bytes], takeover: bool, threshold: int) -> None:
+    sender = PerMessageDeflate(
+        server_no_context_takeover=not takeover, threshold=threshold
+    )._negotiated(True)
+    receiver = sender._negotiated(False)
+    raw = sent = 0
+    start = time.process_time()
+    for msg in messages:
+        raw += len(msg)
+        if len(msg) < threshold:
+            sent += len(msg)
+            continue
+        data = sender.compress(msg)
+        sent += len(data)
+        assert receiver.decompress(data) == msg
+    elapsed = time.process_time() - start
+    print(
+        f"takeover={'on ' if takeover else 'off'} threshold={threshold:<5} "
+        f"{sent / raw:6.1%} of {raw / 1e6:.1f} MB sent, "
+        f"{elapsed * 1e6 / len(messages):6.2f} us CPU/message"
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    messages = corpus(count)
+    for takeover in (True, False):
+        for threshold in (0, 64, 128, 192):
+            run(messages, takeover, threshold)
+
+
+if __name__ == "__main__":
+    main()
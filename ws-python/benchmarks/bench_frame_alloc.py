@@ -0,0 +1,61 @@
+#!/bin/python3
+"""
+Measures the memory allocated for each frame `FrameDecoder` decodes, with `tracemalloc`,
+and the decode rate, for small client (masked) and server (unmasked) frames, and for
+unmasked frames whose payloads are views of the receive buffer. Decoded frames are kept
+alive, so the allocations counted are those each `Frame` holds on to: the object
+itself, its payload and its mask key.
+
+Usage: python -m benchmarks.bench_frame_alloc [payload size] [frame count]
+"""
+
+import sys, time, tracemalloc
+
+from websocket.frames import Frame, FrameDecoder
+
+
+def measure(stream: bytes, count: int, view_size: int) -> tuple[float, float]:
+    decoder = FrameDecoder(bufsize=len(stream), view_size=view_size)
+    decoder.feed(stream)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    frames = list(decoder.frames())
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    assert len(frames) == count
+    stats = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in stats)
+    size = sum(stat.size_diff for stat in stats)
+    # The list holding the frames isn't part of the cost of a frame
+    size -= sys.getsizeof(frames)
+    return (blocks - 1) / count, size / count
+
+
+def rate(stream: bytes, count: int, view_size: int) -> float:
+    decoder = FrameDecoder(bufsize=len(stream), view_size=view_size)
+    start = time.perf_counter()
+    decoder.feed(stream)
+    for _frame in decoder.frames():
+        pass
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    print(f"{count} frames of {size} B")
+    for name, mask, view_size in (
+        ("masked", b"\x01\x02\x03\x04", 0),
+        ("unmasked", b"", 0),
+        ("views", b"", size),
+    ):
+        stream = bytes(Frame(Frame.BINARY, bytes(size), mask)) * count
+        blocks, nbytes = measure(stream, count, view_size)
+        print(
+            f"  {name:<9} {blocks:5.2f} blocks, {nbytes:6.1f} B per frame, "
+            f"{rate(stream, count, view_size):11,.0f} frames/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/bin/python3
+"""
+Compares parsing an opening handshake with `HandshakeParser`, fed in socket-sized
+reads, against the string splitting `Request.parse` did before, on the whole request.
+
+Usage: python -m benchmarks.bench_handshake_parse [iterations] [read size]
+"""
+
+import sys, time
+
+from websocket.http import HandshakeParser
+
+REQUEST = (
+    b"GET /chat?room=1 HTTP/1.1\r\nHost: example.com:8080\r\nUpgrade: websocket\r\n"
+    b"Connection: Upgrade\r\nSec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n"
+    b"Sec-WebSocket-Version: 13\r\nOrigin: https://example.com\r\n"
+    b"User-Agent: Mozilla/5.0 (X11; Linux x86_64) Gecko/20100101 Firefox/131.0\r\n"
+    b"Sec-WebSocket-Extensions: permessage-deflate; client_max_window_bits\r\n"
+    b"Cookie: session=" + b"s" * 600 + b"\r\n\r\n"
+)
+
+
+def legacy_parse(raw_request: str) -> tuple[str, dict[str, str]]:
+    lines = raw_request.split("\r\n")
+    lines = lines[: lines.index("")]
+    method, url, proto = lines[0].split(" ")
+    headers = {}
+    for header_pair in lines[1:]:
+        key, val = header_pair.split(": ")
+        headers[key] = val
+    return url, headers
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    read_size = int(sys.argv[2]) if len(sys.argv) > 2 else 4096
+    reads = [REQUEST[i : i + read_size] for i in range(0, len(REQUEST), read_size)]
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        legacy_parse(REQUEST.decode("utf-8"))
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        parser = HandshakeParser(is_request=True)
+        for data in reads:
+            req = parser.feed(data)
+        assert req is not None
+    incremental = time.perf_counter() - start
+
+    print(f"{len(REQUEST)} B handshake in {len(reads)} reads, {iterations} iterations")
+    print(f"legacy str split: {legacy / iterations * 1e6:6.2f} us/handshake")
+    print(f"HandshakeParser:  {incremental / iterations * 1e6:6.2f} us/handshake")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+#!/bin/python3
+"""
+Measures masking throughput for small, medium and large payloads, compared against a
+per-byte Python loop.
+
+Usage: python -m benchmarks.bench_mask
+"""
+
+import os, time
+
+from websocket import mask
+
+SIZES = [125, 64 * 1024, 16 * 1024 * 1024]
+
+
+def naive_mask(data: bytearray, key: bytes) -> None:
+    for i in range(len(data)):
+        data[i] ^= key[i % 4]
+
+
+def measure(fn, data: bytearray, key: bytes) -> float:
+    runs = max(1, (4 * 1024 * 1024) // len(data))
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn(data, key)
+    elapsed = time.perf_counter() - start
+    return len(data) * runs / elapsed / 1e6
+
+
+def main():
+    key = os.urandom(4)
+    backend = "numpy" if mask.numpy is not None else "int.from_bytes"
+    print(f"backend: {backend}")
+    for size in SIZES:
+        data = bytearray(os.urandom(size))
+        fast = measure(mask.apply_mask, data, key)
+        line = f"{size:>10} B: {fast:10.1f} MB/s"
+        if size <= 64 * 1024:
+            line += f"   (per-byte loop: {measure(naive_mask, data, key):.1f} MB/s)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+#!/bin/python3
+"""
+Measures the time from a frame being written to the socket until `recv_text` returns
+it on the other side.
+
+Usage: python -m benchmarks.bench_recv_latency [message count]
+"""
+
+import socket, statistics, sys, time
+
+from websocket.frames import Frame
+from websocket.websockets import WebSocket
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    a, b = socket.socketpair()
+    ws = WebSocket(a, is_server=True)
+    raw = bytes(Frame(Frame.TEXT, b"ping", b"\x00\x00\x00\x00"))
+
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        b.sendall(raw)
+        ws.recv_text()
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    print(f"{count} messages")
+    print(f"median: {statistics.median(latencies) * 1e6:.1f} us")
+    print(f"p99:    {latencies[int(count * 0.99)] * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/bin/python3
+"""
+Measures the rate of small messages sent over a TCP connection one `send()` at a time,
+with `send_many()`, and with corked sends, along with the system calls each makes. The
+receiver runs on another thread and only counts bytes.
+
+Usage: python -m benchmarks.bench_send_many [message count] [message size]
+"""
+
+import socket, sys, threading, time
+
+from websocket.websockets import WebSocket
+
+
+def connect() -> tuple[socket.socket, socket.socket]:
+    listener = socket.create_server(("127.0.0.1", 0))
+    client = socket.create_connection(listener.getsockname())
+    server, _ = listener.accept()
+    listener.close()
+    return server, client
+
+
+def receive(sock: socket.socket, size: int) -> None:
+    got = 0
+    while got < size:
+        got += len(sock.recv(1 << 20))
+
+
+class CountingSocket(socket.socket):
+    def sendmsg(self, *args):
+        self.calls += 1
+        return super().sendmsg(*args)
+
+
+def run(name: str, count: int, msg: bytes, batch: int, **options) -> None:
+    server, client = connect()
+    sock = CountingSocket(fileno=server.detach())
+    sock.calls = 0
+    ws = WebSocket(sock, is_server=True, **options)
+    reader = threading.Thread(target=receive, args=(client, count * (len(msg) + 2)))
+    reader.start()
+    start = time.perf_counter()
+    if batch:
+        for _ in range(count // batch):
+            ws.send_many([msg] * batch)
+    else:
+        for _ in range(count):
+            ws.send(msg)
+        ws.flush()
+    reader.join()
+    elapsed = time.perf_counter() - start
+    print(
+        f"  {name:<22} {count / elapsed:12,.0f} msg/s  {sock.calls:8,} sendmsg calls"
+    )
+    client.close()
+    sock.close()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    msg = b"x" * size
+    print(f"{count} messages of {size} B")
+    run("send", count, msg, 0)
+    run("send_many, 100 each", count, msg, 100)
+    run("send_many, 1000 each", count, msg, 1000)
+    run("corked send", count, msg, 0, cork=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/bin/python3
+"""
+Measures how many `wss://` connections per second `WebSocket.connect()` opens against a
+local server with a self-signed certificate, made with the openssl command, with a full
+TLS handshake each time and when resuming a cached session. Only the time spent in
+`connect()` is counted, not closing the connections.
+
+Usage: python -m benchmarks.bench_tls_handshake [connections] [TLS version, 1.2 or 1.3]
+"""
+
+import os, socket, ssl, subprocess, sys, tempfile, threading, time
+
+from websocket import tls
+from websocket.websockets import WebSocket, WebSocketServer
+
+
+def make_cert(directory: str) -> str:
+    path = os.path.join(directory, "keycert.pem")
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "ec", "-pkeyopt",
+            "ec_paramgen_curve:prime256v1", "-nodes", "-days", "1", "-subj",
+            "/CN=localhost", "-addext", "subjectAltName=DNS:localhost",
+            "-keyout", path, "-out", path + ".crt",
+        ],
+        check=True,
+        capture_output=True,
+    )  # fmt: skip
+    with open(path, "a") as key, open(path + ".crt") as cert:
+        key.write(cert.read())
+    return path
+
+
+def accept(server: WebSocketServer, count: int) -> None:
+    for _ in range(count):
+        ws = server.accept(timeout=10)
+        ws.conn.shutdown(socket.SHUT_RDWR)
+
+
+def run(url: str, server: WebSocketServer, count: int, context, resume: bool):
+    sessions = tls.SessionCache()
+    accepting = threading.Thread(target=accept, args=(server, count))
+    accepting.start()
+    resumed = 0
+    elapsed = 0.0
+    for _ in range(count):
+        if not resume:
+            sessions = tls.SessionCache()
+        start = time.perf_counter()
+        ws = WebSocket.connect(url, ssl_context=context, sessions=sessions)
+        elapsed += time.perf_counter() - start
+        resumed += ws.conn.session_reused
+        ws.close()
+    accepting.join()
+    return count / elapsed, resumed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    version = sys.argv[2] if len(sys.argv) > 2 else "1.3"
+    with tempfile.TemporaryDirectory() as directory:
+        cert = make_cert(directory)
+        server_context = tls.server_context(cert)
+        context = ssl.create_default_context(cafile=cert)
+        context.maximum_version = context.minimum_version = {
+            "1.2": ssl.TLSVersion.TLSv1_2,
+            "1.3": ssl.TLSVersion.TLSv1_3,
+        }[version]
+    server = WebSocketServer(("127.0.0.1", 0), ssl_context=server_context)
+    url = f"wss://localhost:{server.sock.getsockname()[1]}/"
+
+    print(f"{count} connections over TLS {version}")
+    for name, resume in (("full", False), ("resumed", True)):
+        rate, resumed = run(url, server, count, context, resume)
+        print(f"  {name:<8} {rate:8,.0f} handshakes/s, {resumed} resumed")
+    server.acceptor.close()
+    server.sock.close()
+
+
+if __name__ == "__main__":
+    main()
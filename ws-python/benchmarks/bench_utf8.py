@@ -0,0 +1,60 @@
+#!/bin/python3
+"""
+Measures the rate `MessageAssembler` takes in large text messages, checking they are
+valid UTF-8, for ASCII and mixed-script text, whole and split into fragments, decoding
+them to `str` and in raw text mode.
+
+Usage: python -m benchmarks.bench_utf8 [message size in KiB] [fragment size in KiB]
+"""
+
+import sys, time
+
+from websocket.frames import Frame
+from websocket.messages import MessageAssembler
+
+
+def frames(data: bytes, fragment: int) -> list[Frame]:
+    pieces = [data[i : i + fragment] for i in range(0, len(data), fragment)]
+    return [
+        Frame(
+            Frame.TEXT if i == 0 else Frame.CONTINUE,
+            piece,
+            fin=i == len(pieces) - 1,
+        )
+        for i, piece in enumerate(pieces)
+    ]
+
+
+def rate(message: list[Frame], size: int, raw_text: bool) -> float:
+    assembler = MessageAssembler(max_size=None, raw_text=raw_text)
+    repeat = max(1, 64 * 2**20 // size)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for frame in message:
+            assembler.feed(frame)
+    return size * repeat / (time.perf_counter() - start) / 2**20
+
+
+def main():
+    size = int(sys.argv[1]) * 1024 if len(sys.argv) > 1 else 1024 * 1024
+    fragment = int(sys.argv[2]) * 1024 if len(sys.argv) > 2 else 16 * 1024
+    mixed = "Hello, Привет, 你好, مرحبا, こんにちは! ".encode()
+    print(f"{size // 1024} KiB text messages, {fragment // 1024} KiB fragments")
+    for name, sample in (("ascii", b"Hello, World! "), ("mixed", mixed)):
+        data = (sample * (size // len(sample) + 1))[:size]
+        # Cut on a character boundary so the message itself is valid
+        data = data.decode(errors="ignore").encode()
+        for layout, message in (
+            ("whole", frames(data, len(data))),
+            ("fragmented", frames(data, fragment)),
+        ):
+            decoded = rate(message, len(data), False)
+            raw = rate(message, len(data), True)
+            print(
+                f"  {name:<6} {layout:<11} str {decoded:8,.0f} MiB/s, "
+                f"raw {raw:8,.0f} MiB/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/bin/python3
+"""
+Soak test of connection churn: clients repeatedly connect to a `WebSocketServer`, send a
+message and disconnect, while the server's RSS, registered connections and threads are
+printed at intervals. They should stay flat however many cycles run, as a closed
+connection leaves nothing behind.
+
+Clients reset their connections instead of closing them, so a million cycles don't run
+out of ports to TIME_WAIT.
+
+Usage: python -m benchmarks.soak_connections [cycles] [client threads] [report every]
+"""
+
+import socket, struct, sys, threading, time
+
+from websocket.bench import rss_bytes
+from websocket.frames import Frame
+from websocket.websockets import WebSocket, WebSocketServer
+
+HANDSHAKE = (
+    b"GET / HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\n"
+    b"Connection: Upgrade\r\nSec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n"
+    b"Sec-WebSocket-Version: 13\r\n\r\n"
+)
+MESSAGE = bytes(Frame(Frame.TEXT, b"hello", b"\x01\x02\x03\x04"))
+RESET = struct.pack("ii", 1, 0)
+
+
+def read(ws: WebSocket) -> None:
+    while True:
+        try:
+            ws.recv_message()
+        except ConnectionError:
+            return
+
+
+def churn(addr, count: int, done: list[int]) -> None:
+    for _ in range(count):
+        conn = socket.create_connection(addr)
+        conn.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, RESET)
+        conn.sendall(HANDSHAKE)
+        conn.recv(4096)
+        conn.sendall(MESSAGE)
+        conn.close()
+        done[0] += 1
+
+
+def main():
+    cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    every = int(sys.argv[3]) if len(sys.argv) > 3 else 50_000
+
+    server = WebSocketServer(("127.0.0.1", 0))
+    addr = server.sock.getsockname()
+    serving = threading.Thread(target=server.serve_forever, args=(read, 0.1))
+    serving.start()
+
+    counts = [[0] for _ in range(clients)]
+    threads = [
+        threading.Thread(target=churn, args=(addr, cycles // clients, done))
+        for done in counts
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    print(f"{'cycles':>10} {'RSS MiB':>9} {'registered':>10} {'threads':>8} {'cycles/s':>9}")
+    reported = 0
+    while any(thread.is_alive() for thread in threads) or reported < cycles:
+        time.sleep(0.2)
+        total = sum(done[0] for done in counts)
+        if total - reported < every and any(t.is_alive() for t in threads):
+            continue
+        reported = total
+        print(
+            f"{total:>10,} {rss_bytes() / 2**20:>9.1f} {len(server.connections):>10} "
+            f"{threading.active_count():>8} {total / (time.perf_counter() - start):>9,.0f}"
+        )
+        if total >= cycles // clients * clients:
+            break
+    for thread in threads:
+        thread.join()
+    server.shutdown()
+    serving.join()
+    server.close()
+
+
+if __name__ == "__main__":
+    main()
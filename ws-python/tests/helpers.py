@@ -0,0 +1,66 @@
+import asyncio, socket, threading
+
+from websocket.aio import AsyncWebSocket, AsyncWebSocketServer
+from websocket.frames import Frame, FrameDecoder
+from websocket.websockets import WebSocket, WebSocketServer
+
+
+def read_frames(sock: socket.socket, count: int) -> list[Frame]:
+    decoder = FrameDecoder()
+    frames = []
+    while len(frames) < count:
+        decoder.buffer_updated(sock.recv_into(decoder.get_buffer()))
+        frames.extend(decoder.frames())
+    return frames
+
+
+def read_frame(sock: socket.socket) -> Frame:
+    return read_frames(sock, 1)[0]
+
+
+def echo(ws: WebSocket) -> None:
+    try:
+        while True:
+            msg = ws.recv_message()
+            if isinstance(msg, str):
+                ws.send_text(msg)
+            else:
+                ws.send(msg)
+    except ConnectionError:
+        pass
+
+
+def serve(handler=echo, **options) -> tuple[WebSocketServer, threading.Thread, str]:
+    server = WebSocketServer(("127.0.0.1", 0), **options)
+    serving = threading.Thread(target=server.serve_forever, args=(handler, 0.05))
+    serving.start()
+    port = server.sock.getsockname()[1]
+    # Certificates are issued for a name rather than an address
+    if options.get("ssl_context") is not None:
+        return server, serving, f"wss://localhost:{port}/"
+    return server, serving, f"ws://127.0.0.1:{port}/"
+
+
+def stop(server: WebSocketServer, serving: threading.Thread) -> None:
+    server.shutdown()
+    serving.join()
+    server.close()
+
+
+async def echo_async(ws: AsyncWebSocket) -> None:
+    async for msg in ws:
+        if isinstance(msg, str):
+            await ws.send_text(msg)
+        else:
+            await ws.send(msg)
+
+
+def serve_async(client, **options):
+    async def main():
+        async with AsyncWebSocketServer(
+            echo_async, ("127.0.0.1", 0), **options
+        ) as server:
+            port = server.server.sockets[0].getsockname()[1]
+            return await client(f"ws://127.0.0.1:{port}/", server)
+
+    return asyncio.run(asyncio.wait_for(main(), 10))
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from websocket.aio import AsyncWebSocket
+from websocket.websockets import WebSocket
+from tests.helpers import serve_async
+
+
+def test_echoes_text_and_binary():
+    async def client(url, _server):
+        async with await AsyncWebSocket.connect(url) as ws:
+            await ws.send_text("Hello, World!")
+            await ws.send(bytes(100_000))
+            return await ws.recv_text(), await ws.recv()
+
+    assert serve_async(client) == ("Hello, World!", bytes(100_000))
+
+
+def test_serves_many_connections():
+    async def client(url, server):
+        sockets = await asyncio.gather(*[AsyncWebSocket.connect(url) for _ in range(200)])
+        assert len(server.connections) == 200
+        for i, ws in enumerate(sockets):
+            await ws.send_text(str(i))
+        replies = [await ws.recv_text() for ws in sockets]
+        for ws in sockets:
+            await ws.close()
+        return replies
+
+    assert serve_async(client) == [str(i) for i in range(200)]
+
+
+def test_threaded_client_interoperates():
+    async def client(url, _server):
+        def run():
+            ws = WebSocket.connect(url)
+            ws.send_text("over threads")
+            return ws.recv_text()
+
+        return await asyncio.to_thread(run)
+
+    assert serve_async(client) == "over threads"
+
+
+def test_closes_with_1009_on_oversized_message():
+    async def client(url, _server):
+        ws = await AsyncWebSocket.connect(url)
+        await ws.send(bytes(17))
+        with pytest.raises(ConnectionError):
+            await ws.recv()
+        return ws.close_code
+
+    assert serve_async(client, max_message_size=16) == 1009
+
+
+def test_pauses_reading_when_the_queue_is_full():
+    async def client(url, _server):
+        ws = await AsyncWebSocket.connect(url, max_queue=4)
+        for i in range(20):
+            await ws.send_text(str(i))
+        while not ws.reading_paused:
+            await asyncio.sleep(0.01)
+        replies = [await ws.recv_text() for _ in range(20)]
+        assert not ws.reading_paused
+        await ws.close()
+        return replies
+
+    assert serve_async(client) == [str(i) for i in range(20)]
+
+
+def test_close_waits_for_the_peers_close_frame():
+    async def client(url, server):
+        ws = await AsyncWebSocket.connect(url)
+        await ws.send_text("hi")
+        assert await ws.recv_text() == "hi"
+        [remote] = server.connections
+        await ws.close(4000, "done")
+        return ws.close_code, remote.close_code, remote.close_reason
+
+    assert serve_async(client) == (4000, 4000, "done")
@@ -0,0 +1,25 @@
+import json
+
+from websocket import bench
+
+
+def test_load_round_trips_messages():
+    results = bench.run_load(clients=2, size=16, duration=0.2)
+    assert results["messages"] > 0
+    assert results["latency_ms"]["p50"] <= results["latency_ms"]["p999"]
+
+
+def test_micro_times_every_benchmark():
+    results = bench.run_micro(number=10)
+    assert set(results) == {
+        "Frame.parse",
+        "Frame.__bytes__",
+        "Request.parse",
+        "make_sec_ws_accept",
+    }
+
+
+def test_writes_json(tmp_path):
+    path = tmp_path / "results.json"
+    bench.main(["micro", "--number", "10", "--json", str(path)])
+    assert "micro" in json.loads(path.read_text())
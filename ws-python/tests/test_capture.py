@@ -0,0 +1,127 @@
+import threading, time
+
+import pytest
+
+from websocket.capture import CLOSED, FIN, OPENED, Capture, CaptureReader, info, replay
+from websocket.frames import Frame
+from websocket.metrics import Metrics
+from websocket.websockets import WebSocket
+from tests.helpers import serve, stop
+
+
+def records(path) -> list[tuple]:
+    with CaptureReader(path) as reader:
+        return [
+            (conn, opcode, flags, bytes(payload))
+            for _elapsed, conn, opcode, flags, payload in reader
+        ]
+
+
+class Collector:
+    def __init__(self) -> None:
+        self.messages = []
+        self.lock = threading.Lock()
+
+    def __call__(self, ws: WebSocket) -> None:
+        try:
+            while True:
+                msg = ws.recv_message()
+                with self.lock:
+                    self.messages.append(msg)
+        except ConnectionError:
+            pass
+
+
+def test_captures_received_frames(tmp_path):
+    path = tmp_path / "capture"
+    metrics = Metrics()
+    capture = Capture(str(path), hooks=metrics)
+    server, serving, url = serve(Collector(), hooks=capture)
+    try:
+        client = WebSocket.connect(url)
+        client.send_text("hello")
+        client.send(b"\x00\x01")
+        client.close()
+    finally:
+        stop(server, serving)
+    capture.close()
+    assert records(path) == [
+        (0, OPENED, 0, b""),
+        (0, Frame.TEXT, FIN, b"hello"),
+        (0, Frame.BINARY, FIN, b"\x00\x01"),
+        (0, Frame.CLOSE, FIN, b"\x03\xe8"),
+        (0, CLOSED, 0, b""),
+    ]
+    assert metrics.frames_in[Frame.TEXT] == 1
+
+
+def test_samples_connections(tmp_path):
+    path = tmp_path / "capture"
+    capture = Capture(str(path), sample=0)
+    capture.on_frame_in(object(), Frame(Frame.TEXT, b"skipped"))
+    capture.close()
+    assert records(path) == []
+
+
+def test_ignores_a_truncated_record(tmp_path):
+    path = tmp_path / "capture"
+    capture = Capture(str(path))
+    ws = object()
+    capture.on_frame_in(ws, Frame(Frame.BINARY, b"whole"))
+    capture.on_frame_in(ws, Frame(Frame.BINARY, b"cut short"))
+    capture.flush()
+    size = path.stat().st_size
+    capture.close()
+    with open(path, "r+b") as f:
+        f.truncate(size - 3)
+    assert records(path) == [(0, OPENED, 0, b""), (0, Frame.BINARY, FIN, b"whole")]
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "capture"
+    path.write_bytes(b"not a capture")
+    with pytest.raises(ValueError):
+        CaptureReader(str(path))
+
+
+def test_replays_connections_in_order(tmp_path):
+    path = tmp_path / "capture"
+    capture = Capture(str(path))
+    a, b = object(), object()
+    capture.on_frame_in(a, Frame(Frame.TEXT, b"a1"))
+    capture.on_frame_in(b, Frame(Frame.BINARY, b"b1"))
+    capture.on_frame_in(a, Frame(Frame.TEXT, "é".encode()[:1], fin=False))
+    capture.on_frame_in(a, Frame(Frame.CONTINUE, "é".encode()[1:]))
+    capture.on_close(a, 1006)
+    capture.close()
+    assert info(str(path))["connections"] == 2
+
+    collector = Collector()
+    server, serving, url = serve(collector)
+    try:
+        result = replay(str(path), url, speed=None)
+        deadline = time.monotonic() + 1
+        while len(collector.messages) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        stop(server, serving)
+    assert result["connections"] == 2 and result["frames"] == 4
+    assert collector.messages.index("a1") < collector.messages.index("é")
+    assert sorted(map(str, collector.messages)) == ["a1", "b'b1'", "é"]
+
+
+def test_replays_with_the_captured_timing(tmp_path):
+    path = tmp_path / "capture"
+    capture = Capture(str(path))
+    ws = object()
+    capture.on_frame_in(ws, Frame(Frame.TEXT, b"first"))
+    time.sleep(0.2)
+    capture.on_frame_in(ws, Frame(Frame.TEXT, b"second"))
+    capture.close()
+
+    server, serving, url = serve(Collector())
+    try:
+        assert replay(str(path), url, speed=2)["seconds"] >= 0.09
+        assert replay(str(path), url, speed=None)["seconds"] < 0.09
+    finally:
+        stop(server, serving)
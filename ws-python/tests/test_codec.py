@@ -0,0 +1,34 @@
+import pytest
+
+from websocket import codec
+from websocket.frames import Frame
+from websocket.messages import RawText
+
+
+def test_json_round_trips_from_bytes_and_str():
+    obj = {"text": "héllo", "values": [1, 2.5, None, True]}
+    data = codec.JSON.encode(obj)
+    assert isinstance(data, bytes) and codec.JSON.opcode == Frame.TEXT
+    assert codec.JSON.decode(RawText(data)) == obj
+    assert codec.JSON.decode(data.decode()) == obj
+    with pytest.raises(ValueError):
+        codec.JSON.decode(RawText(b"{not json"))
+
+
+def test_raw_passes_bytes_through():
+    assert codec.RAW.encode(bytearray(b"abc")) == b"abc"
+    assert codec.RAW.decode(b"abc") == b"abc"
+    assert codec.RAW.decode("abc") == b"abc"
+
+
+def test_registers_codecs_by_name():
+    assert codec.get("json") is codec.JSON
+    assert codec.get("chat.v1") is None
+    assert codec.get(None) is None
+    assert (codec.get("msgpack") is None) == (codec.msgpack is None)
+    upper = codec.Codec("upper", Frame.TEXT, lambda s: s.upper().encode(), bytes.decode)
+    codec.register(upper)
+    try:
+        assert codec.get("upper") is upper
+    finally:
+        del codec._codecs["upper"]
@@ -0,0 +1,155 @@
+import socket, threading
+
+import pytest
+
+from websocket import http
+from websocket.deflate import PerMessageDeflate, parse_extensions
+from websocket.http import HandshakeParser, Response
+from websocket.websockets import WebSocket, WebSocketServer, read_handshake
+from tests.helpers import read_frames
+
+
+def negotiate(
+    client: PerMessageDeflate, server: PerMessageDeflate
+) -> tuple[PerMessageDeflate, PerMessageDeflate]:
+    [(_, offer)] = parse_extensions(client.offer())
+    server_ext, response = server.accept([offer])
+    [(_, params)] = parse_extensions(response)
+    return client.confirm(params), server_ext
+
+
+def test_parse_extensions():
+    assert parse_extensions(
+        "permessage-deflate; client_max_window_bits, permessage-deflate; server_max_window_bits=10, x-other"
+    ) == [
+        ("permessage-deflate", {"client_max_window_bits": None}),
+        ("permessage-deflate", {"server_max_window_bits": "10"}),
+        ("x-other", {}),
+    ]
+
+
+def test_negotiates_smaller_window_and_no_context_takeover():
+    client, server = negotiate(
+        PerMessageDeflate(server_max_window_bits=10, client_no_context_takeover=True),
+        PerMessageDeflate(),
+    )
+    assert client.server_max_window_bits == server.server_max_window_bits == 10
+    assert client.client_no_context_takeover and server.client_no_context_takeover
+    assert not client.is_server and server.is_server
+
+
+def test_rejects_unknown_parameters():
+    assert PerMessageDeflate().accept([{"x_unknown": None}]) is None
+
+
+def test_declines_8_bit_windows():
+    server = PerMessageDeflate()
+    assert server.accept([{"server_max_window_bits": "8"}]) is None
+    client, _ = negotiate(
+        PerMessageDeflate(), PerMessageDeflate(client_max_window_bits=9)
+    )
+    assert client.client_max_window_bits == 9
+    with pytest.raises(ValueError):
+        PerMessageDeflate().confirm({"client_max_window_bits": "8"})
+
+
+def test_round_trips_with_and_without_context_takeover():
+    for takeover in (False, True):
+        client, server = negotiate(
+            PerMessageDeflate(client_no_context_takeover=takeover), PerMessageDeflate()
+        )
+        msg = b'{"event": "tick", "price": 1234.5}' * 20
+        first, second = client.compress(msg), client.compress(msg)
+        assert server.decompress(first) == msg
+        assert server.decompress(second) == msg
+        # Without a reset the second copy compresses to a back reference to the first
+        assert (len(second) < len(first)) != takeover
+
+
+def test_limits_decompressed_size():
+    client, server = negotiate(PerMessageDeflate(), PerMessageDeflate())
+    try:
+        server.decompress(client.compress(bytes(100_000)), max_size=1000)
+    except OverflowError:
+        pass
+    else:
+        assert False, "Expected OverflowError"
+
+
+class TestCompressedWebSocket:
+    def test_compresses_large_messages_only(self):
+        a, b = socket.socketpair()
+        client, server = negotiate(PerMessageDeflate(threshold=64), PerMessageDeflate())
+        sender = WebSocket(a, is_server=True, deflate=server)
+        sender.send(b"small")
+        sender.send(bytes(1000))
+        small, large = read_frames(b, 2)
+        assert not small.rsv1 and small.payload == b"small"
+        assert large.rsv1 and len(large.payload) < 100
+        assert client.decompress(large.payload) == bytes(1000)
+
+    def test_round_trips_fragmented_messages(self):
+        a, b = socket.socketpair()
+        client, server = negotiate(PerMessageDeflate(), PerMessageDeflate())
+        sender = WebSocket(a, is_server=False, deflate=client, fragment_size=100)
+        receiver = WebSocket(b, is_server=True, deflate=server)
+        msg = "The quick brown fox jumps over the lazy dog. " * 200
+        threading.Thread(
+            target=sender.send_stream, args=([msg.encode()],), kwargs={"text": True}
+        ).start()
+        sender.send_text("after")
+        assert receiver.recv_text(timeout=2) == msg
+        assert receiver.recv_text(timeout=2) == "after"
+
+    def test_negotiated_in_handshake(self):
+        server = WebSocketServer(("127.0.0.1", 0), extensions=["permessage-deflate"])
+        port = server.sock.getsockname()[1]
+        result = {}
+        thread = threading.Thread(target=lambda: result.update(ws=server.accept()))
+        thread.start()
+        client = WebSocket.connect(
+            f"ws://127.0.0.1:{port}", extensions=["permessage-deflate"]
+        )
+        thread.join(2)
+        remote = result["ws"]
+        assert client.deflate is not None and remote.deflate is not None
+        client.send_text("x" * 1000)
+        assert remote.recv_text(timeout=2) == "x" * 1000
+        remote.send(bytes(500))
+        assert client.recv(timeout=2) == bytes(500)
+        for sock in (client.conn, remote.conn):
+            sock.shutdown(socket.SHUT_RDWR)
+            sock.close()
+        server.acceptor.close()
+        server.sock.close()
+
+
+@pytest.mark.parametrize(
+    "response",
+    ["x-unknown", "permessage-deflate; client_max_window_bits=8"],
+)
+def test_connect_closes_on_rejected_extensions(response, monkeypatch):
+    listener = socket.create_server(("127.0.0.1", 0))
+    port = listener.getsockname()[1]
+    opened = []
+    create_connection = socket.create_connection
+    monkeypatch.setattr(
+        socket,
+        "create_connection",
+        lambda *args: opened.append(create_connection(*args)) or opened[-1],
+    )
+
+    def respond():
+        conn, _ = listener.accept()
+        req = read_handshake(conn, HandshakeParser(is_request=True))
+        res = Response.new_ws(req.headers[http.HEADER_WS_KEY], [response])
+        conn.sendall(str(res).encode())
+        conn.close()
+
+    threading.Thread(target=respond).start()
+    client = WebSocket.connect(
+        f"ws://127.0.0.1:{port}", extensions=["permessage-deflate"]
+    )
+    listener.close()
+    assert client is None
+    assert opened[0].fileno() == -1
@@ -0,0 +1,180 @@
+import struct
+
+import pytest
+
+from websocket.frames import Frame, FrameDecoder, FrameTooLarge, ProtocolError
+from websocket.mask import mask
+
+
+def raw_frame(opcode: int, payload: bytes, mask: bytes = bytes()) -> bytes:
+    masked = 0b1000_0000 if mask else 0
+    if len(payload) >= 65536:
+        header = struct.pack("!BBQ", 0b1000_0000 | opcode, masked | 127, len(payload))
+    elif len(payload) > 125:
+        header = struct.pack("!BBH", 0b1000_0000 | opcode, masked | 126, len(payload))
+    else:
+        header = struct.pack("!BB", 0b1000_0000 | opcode, masked | len(payload))
+    return header + mask + payload
+
+
+class TestFrameDecoder:
+    def test_decodes_frame_split_across_reads(self):
+        decoder = FrameDecoder()
+        raw = raw_frame(Frame.TEXT, b"Hello, World!")
+        for i in range(len(raw) - 1):
+            decoder.feed(raw[i : i + 1])
+            assert decoder.next_frame() is None
+        decoder.feed(raw[-1:])
+        frame = decoder.next_frame()
+        assert frame.opcode == Frame.TEXT
+        assert frame.payload == b"Hello, World!"
+        assert decoder.pending == 0
+
+    def test_decodes_many_frames_from_one_read(self):
+        decoder = FrameDecoder()
+        payloads = [f"message {i}".encode() for i in range(100)]
+        decoder.feed(b"".join(raw_frame(Frame.BINARY, p) for p in payloads))
+        assert [frame.payload for frame in decoder.frames()] == payloads
+
+    def test_decodes_16_bit_length(self):
+        decoder = FrameDecoder()
+        payload = bytes(range(256)) * 4
+        decoder.feed(raw_frame(Frame.BINARY, payload))
+        frame = decoder.next_frame()
+        assert frame.length == 1024
+        assert frame.payload == payload
+
+    def test_decodes_64_bit_length_larger_than_buffer(self):
+        decoder = FrameDecoder(bufsize=1024)
+        payload = bytes(range(256)) * 1024
+        raw = raw_frame(Frame.BINARY, payload) + raw_frame(Frame.TEXT, b"next")
+        for i in range(0, len(raw), 1000):
+            decoder.feed(raw[i : i + 1000])
+        frames = list(decoder.frames())
+        assert [frame.length for frame in frames] == [len(payload), 4]
+        assert frames[0].payload == payload
+
+    def test_recv_into_buffer(self):
+        decoder = FrameDecoder()
+        raw = raw_frame(Frame.TEXT, b"abc") + raw_frame(Frame.TEXT, b"de")
+        view = decoder.get_buffer()
+        view[: len(raw) - 1] = raw[:-1]
+        decoder.buffer_updated(len(raw) - 1)
+        assert [frame.payload for frame in decoder.frames()] == [b"abc"]
+        decoder.feed(raw[-1:])
+        assert [frame.payload for frame in decoder.frames()] == [b"de"]
+
+    def test_reads_mask_key(self):
+        decoder = FrameDecoder()
+        decoder.feed(raw_frame(Frame.BINARY, b"data", mask=b"\x01\x02\x03\x04"))
+        frame = decoder.next_frame()
+        assert frame.is_masked
+        assert frame.mask == b"\x01\x02\x03\x04"
+
+    def test_unmasks_small_and_large_payloads(self):
+        decoder = FrameDecoder()
+        payloads = [bytes(range(50)), bytes(range(256)) * 100]
+        for payload in payloads:
+            masked = bytes(mask(payload, b"abcd"))
+            decoder.feed(raw_frame(Frame.BINARY, masked, b"abcd"))
+        assert [bytes(frame.payload) for frame in decoder.frames()] == payloads
+
+    def test_small_payloads_are_views_of_the_buffer(self):
+        decoder = FrameDecoder(view_size=16)
+        decoder.feed(raw_frame(Frame.TEXT, b"small") + raw_frame(Frame.TEXT, bytes(17)))
+        small, large = decoder.frames()
+        assert isinstance(small.payload, memoryview)
+        assert small.payload == b"small"
+        assert isinstance(large.payload, bytes)
+
+    def test_rejects_oversized_frame_from_its_header(self):
+        decoder = FrameDecoder(max_size=100)
+        decoder.feed(raw_frame(Frame.BINARY, bytes(101))[:4])
+        with pytest.raises(FrameTooLarge):
+            decoder.next_frame()
+
+    def test_grows_buffer_as_payload_arrives(self):
+        decoder = FrameDecoder()
+        decoder.feed(b"\x82\x7f" + (16 << 20).to_bytes(8, "big"))
+        assert decoder.next_frame() is None
+        assert len(decoder.get_buffer()) < 1 << 20
+        payload = bytes(range(256)) * (1 << 16)
+        received = 0
+        while received < len(payload):
+            view = decoder.get_buffer()
+            chunk = payload[received : received + len(view)]
+            view[: len(chunk)] = chunk
+            decoder.buffer_updated(len(chunk))
+            received += len(chunk)
+        assert decoder.next_frame().payload == payload
+
+    def test_rejects_length_with_most_significant_bit_set(self):
+        decoder = FrameDecoder()
+        decoder.feed(b"\x82\x7f" + (1 << 63).to_bytes(8, "big"))
+        with pytest.raises(ProtocolError):
+            decoder.next_frame()
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        b"\xa2\x00",
+        b"\x92\x00",
+        b"\x83\x00",
+        b"\x8b\x00",
+        raw_frame(Frame.PING, bytes(126))[:4],
+        b"\x09\x00",
+    ],
+    ids=["rsv2", "rsv3", "data opcode", "control opcode", "long ping", "fragmented"],
+)
+def test_rejects_frames_breaking_rfc_6455(raw):
+    decoder = FrameDecoder()
+    decoder.feed(raw)
+    with pytest.raises(ProtocolError):
+        decoder.next_frame()
+
+
+def test_parse_returns_none_for_incomplete_frame():
+    raw = raw_frame(Frame.TEXT, b"Hello, World!")
+    assert Frame.parse(raw[:5]) is None
+    assert Frame.parse(raw).payload == b"Hello, World!"
+
+
+def test_frames_keep_fields_in_slots():
+    frame = Frame(Frame.TEXT, b"Hello", fin=False, rsv1=True)
+    assert not hasattr(frame, "__dict__")
+    assert (frame.fin, frame.rsv1, frame.length, frame.is_masked) == (
+        False,
+        True,
+        5,
+        False,
+    )
+
+
+def test_packs_and_parses_every_reserved_bit():
+    frame = Frame(Frame.TEXT, b"Hello", rsv1=True, rsv2=True, rsv3=True)
+    assert frame.header() == b"\xf1\x05"
+    parsed = Frame.parse(bytes(Frame(Frame.BINARY, b"", rsv1=True)))
+    assert (parsed.rsv1, parsed.rsv2, parsed.rsv3) == (True, False, False)
+
+
+class TestFrameSerialization:
+    def test_packs_short_header(self):
+        frame = Frame(Frame.TEXT, b"Hello")
+        assert frame.header() == b"\x81\x05"
+        assert bytes(frame) == b"\x81\x05Hello"
+
+    def test_packs_16_bit_length(self):
+        payload = bytes(300)
+        assert Frame(Frame.BINARY, payload).header() == b"\x82\x7e\x01\x2c"
+        assert bytes(Frame(Frame.BINARY, payload)) == raw_frame(Frame.BINARY, payload)
+
+    def test_packs_64_bit_length(self):
+        payload = bytes(70_000)
+        header = Frame(Frame.BINARY, payload).header()
+        assert header == b"\x82\x7f" + (70_000).to_bytes(8, "big")
+        assert bytes(Frame(Frame.BINARY, payload)) == raw_frame(Frame.BINARY, payload)
+
+    def test_unmasked_payload_is_not_copied(self):
+        payload = b"x" * 1000
+        assert Frame(Frame.BINARY, payload).buffers()[1] is payload
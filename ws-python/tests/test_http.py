@@ -1,5 +1,7 @@
+import pytest
+
 from websocket import http
-from websocket.http import Request
+from websocket.http import HandshakeParser, Headers, Request, Response
 from websocket.url import Url
 
 
@@ -79,3 +81,73 @@ class TestRequest:
         req = Request.new_ws(url)
 
     
+
+
+class TestHeaders:
+    def test_looks_up_names_regardless_of_case(self):
+        headers = Headers({"Sec-WebSocket-Key": "abc"})
+        assert headers["sec-websocket-key"] == "abc"
+        assert "SEC-WEBSOCKET-KEY" in headers
+        assert headers == {"sec-websocket-key": "abc"}
+
+    def test_keeps_every_value_of_repeated_headers(self):
+        headers = Headers([("Cookie", "a=1"), ("Set-Cookie", "b"), ("cookie", "c=2")])
+        assert headers["Cookie"] == "a=1, c=2"
+        assert headers.get_all("COOKIE") == ["a=1", "c=2"]
+        assert list(headers.multi_items()) == [
+            ("Cookie", "a=1"),
+            ("Cookie", "c=2"),
+            ("Set-Cookie", "b"),
+        ]
+
+
+class TestHandshakeParser:
+    REQUEST = (
+        b"GET /chat HTTP/1.1\r\nHost: example.com\r\nUpgrade: websocket\r\n"
+        b"Connection: keep-alive, Upgrade\r\nSec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n"
+        b"Sec-WebSocket-Version: 13\r\nX-Note: a: b\r\n\r\n"
+    )
+
+    def test_parses_request_split_across_reads(self):
+        parser = HandshakeParser(is_request=True)
+        data = self.REQUEST + b"\x81\x00"
+        for i in range(len(data) - 3):
+            assert parser.feed(data[i : i + 1]) is None
+        req = parser.feed(data[-3:])
+        assert req.url == "/chat"
+        assert req.headers["x-note"] == "a: b"
+        assert req.is_valid_ws()
+        assert parser.leftover == b"\x81\x00"
+
+    def test_parses_response(self):
+        parser = HandshakeParser(is_request=False)
+        res = parser.feed(str(Response.new_ws("dGhlIHNhbXBsZSBub25jZQ==")).encode())
+        assert res.status == "101 Switching Protocols"
+        assert res.is_valid_ws("dGhlIHNhbXBsZSBub25jZQ==")
+
+    def test_limits_handshake_size(self):
+        parser = HandshakeParser(is_request=True, max_size=64)
+        assert parser.feed(b"GET / HTTP/1.1\r\n") is None
+        with pytest.raises(ValueError):
+            parser.feed(b"Cookie: " + b"a" * 64)
+
+    def test_limits_header_count(self):
+        parser = HandshakeParser(is_request=True, max_headers=2)
+        with pytest.raises(ValueError):
+            parser.feed(b"GET / HTTP/1.1\r\nA: 1\r\nB: 2\r\nC: 3\r\n\r\n")
+
+    def test_rejects_folded_headers(self):
+        parser = HandshakeParser(is_request=True)
+        with pytest.raises(ValueError):
+            parser.feed(b"GET / HTTP/1.1\r\nA: 1\r\n  continued\r\n\r\n")
+
+
+def test_selects_the_servers_preferred_protocol():
+    url = Url("ws:", "example.com", "8080", "/chat")
+    req = Request.new_ws(url, protocols=["chat.v1", "json", "msgpack"])
+    assert req.headers[http.HEADER_WS_PROTOCOL] == "chat.v1, json, msgpack"
+    assert http.select_protocol(req.headers, ["msgpack", "json"]) == "msgpack"
+    assert http.select_protocol(req.headers, ["JSON", "raw"]) is None
+    assert http.select_protocol(Headers({}), ["json"]) is None
+    res = Response.new_ws(req.headers[http.HEADER_WS_KEY], protocol="msgpack")
+    assert res.headers[http.HEADER_WS_PROTOCOL] == "msgpack"
@@ -0,0 +1,68 @@
+import socket, threading, time
+
+from websocket.frames import Frame
+from websocket.keepalive import Keepalive
+from websocket.websockets import WebSocket
+from tests.helpers import read_frames
+
+
+def wait_for(condition, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_measures_rtt_from_pongs():
+    keepalive = Keepalive(interval=0.05)
+    a, b = socket.socketpair()
+    ws = WebSocket(a, is_server=True, keepalive=keepalive)
+    _peer = WebSocket(b, is_server=False)
+    wait_for(lambda: ws.rtt is not None)
+    assert 0 < ws.last_rtt < 1
+    assert ws.missed_pongs == 0 and not ws.shutdown
+    keepalive.close()
+
+
+def test_times_pongs_handled_before_the_send_returns():
+    keepalive = Keepalive(interval=60)
+    a, b = socket.socketpair()
+    ws = WebSocket(a, is_server=True)
+    send_nowait = ws._send_nowait
+
+    def send_and_answer(opcode, payload):
+        sent = send_nowait(opcode, payload)
+        # As if the listener handled the peer's pong on another thread meanwhile
+        ws._on_pong(payload)
+        return sent
+
+    ws._send_nowait = send_and_answer
+    assert keepalive._tick(ws)
+    assert ws.last_rtt is not None and ws._ping is None
+    assert keepalive._tick(ws)
+    assert ws.missed_pongs == 0
+    b.close()
+    ws.listen_thread.join(1)
+
+
+def test_evicts_peer_that_stops_answering():
+    keepalive = Keepalive(interval=0.05, max_missed=2)
+    a, b = socket.socketpair()
+    ws = WebSocket(a, is_server=True, keepalive=keepalive)
+    wait_for(lambda: ws.shutdown)
+    assert ws.close_code == 1011
+    frames = read_frames(b, 3)
+    assert [frame.opcode for frame in frames] == [Frame.PING, Frame.PING, Frame.CLOSE]
+    assert len(keepalive) == 0
+    keepalive.close()
+
+
+def test_shares_one_thread_between_connections():
+    keepalive = Keepalive(interval=0.05)
+    pairs = [socket.socketpair() for _ in range(50)]
+    before = threading.active_count()
+    connections = [WebSocket(a, is_server=True, keepalive=keepalive) for a, _ in pairs]
+    _peers = [WebSocket(b, is_server=False) for _, b in pairs]
+    assert threading.active_count() == before + 100 + 1
+    wait_for(lambda: all(ws.rtt is not None for ws in connections))
+    keepalive.close()
@@ -0,0 +1,35 @@
+import os
+
+from websocket.frames import Frame, FrameDecoder
+from websocket.mask import apply_mask, mask
+
+
+def naive_mask(data: bytes, key: bytes) -> bytes:
+    return bytes(b ^ key[i % 4] for i, b in enumerate(data))
+
+
+def test_matches_per_byte_masking():
+    key = b"\x12\x34\x56\x78"
+    for size in [0, 1, 3, 4, 5, 125, 1023, 1024, 1027, 65536, 65539, 200_001]:
+        data = os.urandom(size)
+        assert bytes(mask(data, key)) == naive_mask(data, key)
+
+
+def test_masks_in_place_and_unmasks():
+    key = os.urandom(4)
+    data = os.urandom(70_000)
+    buf = bytearray(data)
+    apply_mask(buf, key)
+    assert buf != data
+    apply_mask(memoryview(buf)[:], key)
+    assert buf == data
+
+
+def test_masked_frame_round_trips():
+    key = b"\xaa\xbb\xcc\xdd"
+    raw = bytes(Frame(Frame.TEXT, b"Hello, World!", key))
+    assert raw[6:] == naive_mask(b"Hello, World!", key)
+    assert Frame.parse(raw).payload == b"Hello, World!"
+    decoder = FrameDecoder()
+    decoder.feed(raw)
+    assert decoder.next_frame().payload == b"Hello, World!"
@@ -0,0 +1,181 @@
+import threading, time
+
+import pytest
+
+from websocket.deflate import PerMessageDeflate
+from websocket.frames import Frame, FrameTooLarge, InvalidText, ProtocolError
+from websocket.messages import MessageAssembler, MessageQueue, RawText
+
+
+def test_keeps_text_and_binary_in_order():
+    queue = MessageQueue()
+    for msg in ["a", b"b", "c"]:
+        queue.put(msg)
+    assert [queue.get(), queue.get(), queue.get()] == ["a", b"b", "c"]
+
+
+def test_typed_get_skips_other_kinds():
+    queue = MessageQueue()
+    for msg in ["a", b"b", "c"]:
+        queue.put(msg)
+    assert queue.get(bytes) == b"b"
+    assert queue.get(str) == "a"
+    assert queue.get_nowait(bytes) is None
+    assert queue.get_nowait() == "c"
+
+
+def test_get_wakes_on_put():
+    queue = MessageQueue()
+    threading.Timer(0.05, queue.put, args=("late",)).start()
+    start = time.monotonic()
+    assert queue.get(timeout=5) == "late"
+    assert time.monotonic() - start < 1
+
+
+def test_get_times_out():
+    with pytest.raises(TimeoutError):
+        MessageQueue().get(timeout=0.01)
+
+
+def test_close_wakes_readers_after_draining():
+    queue = MessageQueue()
+    queue.put(b"last")
+    queue.close()
+    assert queue.get() == b"last"
+    with pytest.raises(ConnectionError):
+        queue.get()
+
+
+def test_wait_writable_pauses_between_watermarks():
+    queue = MessageQueue(max_messages=4)
+    for i in range(4):
+        queue.put(bytes(i))
+    resumed = threading.Event()
+
+    def writer():
+        queue.wait_writable()
+        resumed.set()
+
+    threading.Thread(target=writer, daemon=True).start()
+    time.sleep(0.05)
+    assert queue.paused
+    queue.get()
+    assert not resumed.wait(0.05)
+    queue.get()
+    assert resumed.wait(1)
+    assert len(queue) == 2
+
+
+def test_counts_queued_bytes():
+    queue = MessageQueue(max_bytes=100)
+    queue.put(bytes(60))
+    queue.put("x" * 10)
+    assert queue.size == 70
+    queue.get(str)
+    assert queue.size == 60
+
+
+class TestMessageAssembler:
+    def test_passes_unfragmented_payload_through(self):
+        payload = b"whole"
+        message = MessageAssembler().feed(Frame(Frame.BINARY, payload))
+        assert message[0] == Frame.BINARY
+        assert message[1] is payload
+
+    def test_reassembles_fragments(self):
+        assembler = MessageAssembler()
+        assert assembler.feed(Frame(Frame.TEXT, b"Hel", fin=False)) is None
+        assert assembler.feed(Frame(Frame.CONTINUE, b"lo, ", fin=False)) is None
+        assert assembler.feed(Frame(Frame.CONTINUE, b"World!")) == (
+            Frame.TEXT,
+            "Hello, World!",
+        )
+        assert assembler.feed(Frame(Frame.BINARY, b"next")) == (Frame.BINARY, b"next")
+
+    def test_rejects_unexpected_continuation(self):
+        with pytest.raises(ProtocolError):
+            MessageAssembler().feed(Frame(Frame.CONTINUE, b"orphan"))
+
+    def test_rejects_interleaved_messages(self):
+        assembler = MessageAssembler()
+        assembler.feed(Frame(Frame.TEXT, b"first", fin=False))
+        with pytest.raises(ProtocolError):
+            assembler.feed(Frame(Frame.BINARY, b"second"))
+
+    def test_limits_reassembled_size(self):
+        assembler = MessageAssembler(max_size=8)
+        assembler.feed(Frame(Frame.BINARY, bytes(5), fin=False))
+        with pytest.raises(FrameTooLarge):
+            assembler.feed(Frame(Frame.CONTINUE, bytes(5)))
+
+    def test_copies_fragments_given_as_views(self):
+        assembler = MessageAssembler()
+        buf = bytearray(b"first")
+        assembler.feed(Frame(Frame.BINARY, memoryview(buf), fin=False))
+        buf[:] = b"xxxxx"
+        assert assembler.feed(Frame(Frame.CONTINUE, b" second")) == (
+            Frame.BINARY,
+            b"first second",
+        )
+
+    def test_decodes_characters_split_between_fragments(self):
+        assembler = MessageAssembler()
+        data = "ünïcödé €".encode()
+        assembler.feed(Frame(Frame.TEXT, data[:1], fin=False))
+        assembler.feed(Frame(Frame.CONTINUE, data[1:-2], fin=False))
+        assert assembler.feed(Frame(Frame.CONTINUE, data[-2:])) == (
+            Frame.TEXT,
+            "ünïcödé €",
+        )
+
+    def test_rejects_invalid_utf8_on_first_bad_fragment(self):
+        assembler = MessageAssembler()
+        assembler.feed(Frame(Frame.TEXT, b"fine", fin=False))
+        with pytest.raises(InvalidText):
+            assembler.feed(Frame(Frame.CONTINUE, b"\xff", fin=False))
+        with pytest.raises(InvalidText):
+            MessageAssembler().feed(Frame(Frame.TEXT, b"\xc3"))
+
+    def test_rejects_text_ending_mid_character(self):
+        assembler = MessageAssembler(raw_text=True)
+        assembler.feed(Frame(Frame.TEXT, b"ok", fin=False))
+        assembler.feed(Frame(Frame.CONTINUE, "€".encode()[:2], fin=False))
+        with pytest.raises(InvalidText):
+            assembler.feed(Frame(Frame.CONTINUE, b"!"))
+
+    def test_raw_text_gives_validated_bytes(self):
+        assembler = MessageAssembler(raw_text=True)
+        opcode, payload = assembler.feed(Frame(Frame.TEXT, "héllo".encode()))
+        assert type(payload) is RawText and payload == "héllo".encode()
+        assembler.feed(Frame(Frame.TEXT, "€".encode()[:1], fin=False))
+        opcode, payload = assembler.feed(Frame(Frame.CONTINUE, "€".encode()[1:]))
+        assert type(payload) is RawText and payload == "€".encode()
+        with pytest.raises(InvalidText):
+            assembler.feed(Frame(Frame.TEXT, b"\xed\xa0\x80"))
+
+    def test_streams_fragments_as_they_arrive(self):
+        assembler = MessageAssembler(stream=True)
+        opcode, stream = assembler.feed(Frame(Frame.BINARY, b"a", fin=False))
+        assert opcode == Frame.BINARY
+        chunks = iter(stream)
+        assert next(chunks) == b"a"
+        assembler.feed(Frame(Frame.CONTINUE, b"b", fin=False))
+        assert next(chunks) == b"b"
+        assembler.feed(Frame(Frame.CONTINUE, b"c"))
+        assert list(chunks) == [b"c"]
+
+    def test_limits_inflated_fragments_when_streaming(self):
+        sender, receiver = PerMessageDeflate(), PerMessageDeflate()
+        receiver.is_server = True
+        assembler = MessageAssembler(max_size=1000, stream=True, deflate=receiver)
+        bomb = sender.compress_fragment(bytes(100_000), fin=False)
+        assert len(bomb) < 1000
+        with pytest.raises(FrameTooLarge):
+            assembler.feed(Frame(Frame.BINARY, bomb, fin=False, rsv1=True))
+
+    def test_close_aborts_stream(self):
+        assembler = MessageAssembler(stream=True)
+        _opcode, stream = assembler.feed(Frame(Frame.BINARY, b"a", fin=False))
+        assembler.close()
+        with pytest.raises(ConnectionError):
+            stream.read()
@@ -0,0 +1,85 @@
+import socket, struct, threading, urllib.request
+
+from websocket.frames import Frame
+from websocket.metrics import Hooks, Metrics, serve_metrics
+from websocket.websockets import WebSocket, WebSocketServer
+
+
+def test_counts_frames_in_and_out():
+    metrics = Metrics()
+    a, b = socket.socketpair()
+    sender = WebSocket(a, is_server=False, hooks=metrics)
+    receiver = WebSocket(b, is_server=True, hooks=metrics)
+    sender.send_text("hello")
+    sender.send(bytes(100))
+    receiver.recv_text(timeout=1)
+    receiver.recv(timeout=1)
+    assert metrics.frames_out[Frame.TEXT] == metrics.frames_in[Frame.TEXT] == 1
+    assert metrics.bytes_in[Frame.BINARY] == 100
+    assert sender.frames_out == receiver.frames_in == 2
+    assert sender.bytes_out == receiver.bytes_in == 105
+    text = metrics.render()
+    assert 'websocket_frames_in_total{opcode="text"} 1' in text
+    assert "websocket_send_seconds_count 2" in text
+
+
+def test_reports_close_code():
+    closed = []
+
+    class CloseHooks(Hooks):
+        def on_close(self, ws, code):
+            closed.append(code)
+
+    a, b = socket.socketpair()
+    ws = WebSocket(a, is_server=True, hooks=CloseHooks())
+    b.sendall(bytes(Frame(Frame.CLOSE, struct.pack("!H", 1001), b"\0\0\0\0")))
+    ws.listen_thread.join(1)
+    assert closed == [1001]
+
+
+def test_times_handshakes_and_serves_prometheus_text():
+    metrics = Metrics()
+    server = WebSocketServer(("127.0.0.1", 0), hooks=metrics)
+    port = server.sock.getsockname()[1]
+    accepted = []
+    thread = threading.Thread(target=lambda: accepted.append(server.accept(timeout=2)))
+    thread.start()
+    client = WebSocket.connect(f"ws://127.0.0.1:{port}/", hooks=metrics)
+    thread.join()
+    assert sum(metrics.handshake_seconds.counts) == 2
+
+    exporter = serve_metrics(metrics, ("127.0.0.1", 0))
+    url = f"http://127.0.0.1:{exporter.server_address[1]}/metrics"
+    with urllib.request.urlopen(url) as res:
+        body = res.read().decode()
+    assert "websocket_connections 2" in body
+    assert "websocket_handshake_seconds_count 2" in body
+    exporter.shutdown()
+
+    for sock in (client.conn, accepted[0].conn):
+        sock.shutdown(socket.SHUT_RDWR)
+    server.acceptor.close()
+    server.sock.close()
+
+
+def test_handshake_is_reported_before_close():
+    events = []
+
+    class OrderHooks(Hooks):
+        def on_handshake(self, ws, seconds):
+            events.append("handshake")
+
+        def on_close(self, ws, code):
+            events.append("close")
+
+    metrics = Metrics()
+    # The peer's close frame is already buffered, so the listener closes at once
+    close = bytes(Frame(Frame.CLOSE, struct.pack("!H", 1000), b"\0\0\0\0"))
+    for hooks in (OrderHooks(), metrics):
+        a, b = socket.socketpair()
+        ws = WebSocket(
+            a, is_server=True, hooks=hooks, handshake_seconds=0.01, buffered=close
+        )
+        ws.listen_thread.join(1)
+    assert events == ["handshake", "close"]
+    assert len(metrics.connections) == 0
@@ -0,0 +1,95 @@
+import socket, threading, time
+
+from websocket.pool import AddressCache, WebSocketPool, connect_many
+from websocket.selector import SelectorWebSocketServer
+from websocket.websockets import WebSocketServer
+
+
+class TestWebSocketPool:
+    def setup_method(self):
+        self.received = []
+        self.server = SelectorWebSocketServer(
+            ("127.0.0.1", 0),
+            on_message=lambda conn, msg: self.received.append((conn, msg)),
+        )
+        self.url = f"ws://127.0.0.1:{self.server.sock.getsockname()[1]}/"
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,))
+        self.thread.start()
+
+    def teardown_method(self):
+        self.server.stop()
+        self.thread.join()
+        self.server.close()
+
+    def wait_for(self, condition, timeout: float = 2.0) -> None:
+        deadline = time.monotonic() + timeout
+        while not condition():
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+    def test_connect_many_opens_connections_in_parallel(self):
+        with socket.socket() as unused:
+            unused.bind(("127.0.0.1", 0))
+            bad_url = f"ws://127.0.0.1:{unused.getsockname()[1]}/"
+            clients = connect_many(
+                [self.url] * 20 + [bad_url, "ws://127.0.0.1:99999/"], concurrency=8
+            )
+        assert all(ws is not None for ws in clients[:20])
+        assert clients[20:] == [None, None]
+        self.wait_for(lambda: len(self.server.connections) == 20)
+
+    def test_sends_round_robin(self):
+        with WebSocketPool([self.url] * 3) as pool:
+            for i in range(6):
+                pool.send_text(str(i))
+            self.wait_for(lambda: len(self.received) == 6)
+            by_conn = {}
+            for conn, msg in self.received:
+                by_conn.setdefault(conn, []).append(msg)
+            assert sorted(by_conn.values()) == [["0", "3"], ["1", "4"], ["2", "5"]]
+
+    def test_reconnects_dropped_connections(self):
+        with WebSocketPool([self.url] * 2, backoff=0.05) as pool:
+            self.wait_for(lambda: len(self.server.connections) == 2)
+            before = list(pool.connections)
+            # Connections belong to the server's thread, so close one while it's paused
+            self.server.stop()
+            self.thread.join()
+            next(iter(self.server.connections)).close()
+            self.thread = threading.Thread(
+                target=self.server.serve_forever, args=(0.05,)
+            )
+            self.thread.start()
+            self.wait_for(
+                lambda: len(pool.healthy()) == 2
+                and len(set(pool.connections) & set(before)) == 1
+            )
+
+
+def test_address_cache_resolves_once(monkeypatch):
+    calls = []
+    getaddrinfo = socket.getaddrinfo
+
+    def counting_getaddrinfo(*args, **kwargs):
+        calls.append(args)
+        return getaddrinfo(*args, **kwargs)
+
+    monkeypatch.setattr(socket, "getaddrinfo", counting_getaddrinfo)
+    cache = AddressCache()
+    assert cache.resolve("localhost", 80)[1] == 80
+    assert cache.resolve("localhost", 80) == cache.resolve("localhost", 80)
+    assert len(calls) == 1
+
+
+def test_close_sends_close_frames():
+    server = WebSocketServer(("127.0.0.1", 0))
+    url = f"ws://127.0.0.1:{server.sock.getsockname()[1]}/"
+    accepted = []
+    accepting = threading.Thread(target=lambda: accepted.append(server.accept(2)))
+    accepting.start()
+    pool = WebSocketPool([url])
+    accepting.join()
+    pool.close()
+    accepted[0].listen_thread.join(1)
+    assert accepted[0].close_code == 1000
+    server.close()
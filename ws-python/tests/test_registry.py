@@ -0,0 +1,93 @@
+import socket, threading, time
+
+from websocket.registry import ConnectionRegistry
+from websocket.websockets import WebSocket, WebSocketServer
+
+
+class Peer:
+    def __init__(self, host: str) -> None:
+        self.conn = self
+        self.host = host
+
+    def getpeername(self) -> tuple[str, int]:
+        return self.host, 1234
+
+
+class TestConnectionRegistry:
+    def test_adds_and_removes_by_id(self):
+        registry = ConnectionRegistry()
+        a, b = Peer("10.0.0.1"), Peer("10.0.0.2")
+        assert registry.add(a) != registry.add(b)
+        assert registry.get(a.conn_id) is a
+        registry.remove(a)
+        registry.remove(a)
+        assert registry.get(a.conn_id) is None
+        assert a not in registry and b in registry
+        assert list(registry) == [b]
+
+    def test_indexes_by_host(self):
+        registry = ConnectionRegistry()
+        peers = [Peer("10.0.0.1"), Peer("10.0.0.2"), Peer("10.0.0.1")]
+        for peer in peers:
+            registry.add(peer)
+        assert registry.by_host("10.0.0.1") == [peers[0], peers[2]]
+        registry.remove(peers[0])
+        assert registry.by_host("10.0.0.1") == [peers[2]]
+        assert registry.by_host("10.0.0.3") == []
+
+    def test_finds_idle_connections(self):
+        registry = ConnectionRegistry(granularity=0.01)
+        old, active, new = Peer("a"), Peer("b"), Peer("c")
+        registry.add(old)
+        registry.add(active)
+        time.sleep(0.05)
+        registry.touch(active)
+        registry.add(new)
+        assert registry.idle(0.03) == [old]
+
+    def test_iterating_is_a_snapshot(self):
+        registry = ConnectionRegistry()
+        peers = [Peer(str(i)) for i in range(10)]
+        for peer in peers:
+            registry.add(peer)
+        for peer in registry:
+            registry.remove(peer)
+        assert len(registry) == 0
+
+
+def test_closed_connections_leave_the_registry():
+    registry = ConnectionRegistry()
+    a, b = socket.socketpair()
+    ws = WebSocket(a, is_server=True, registry=registry)
+    assert ws in registry
+    b.close()
+    ws.listen_thread.join(1)
+    assert len(registry) == 0
+
+
+def read_until_closed(ws: WebSocket) -> None:
+    try:
+        while True:
+            ws.recv_message()
+    except ConnectionError:
+        pass
+
+
+def test_serve_forever_closes_idle_connections():
+    server = WebSocketServer(("127.0.0.1", 0), idle_timeout=0.2)
+    url = f"ws://127.0.0.1:{server.sock.getsockname()[1]}/"
+    serving = threading.Thread(
+        target=server.serve_forever, args=(read_until_closed, 0.05)
+    )
+    serving.start()
+    client = WebSocket.connect(url)
+    client.listen_thread.join(2)
+    assert (client.close_code, client.close_reason) == (1001, "Idle timeout")
+    deadline = time.monotonic() + 1
+    while len(server.connections) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(server.connections) == 0
+    server.shutdown()
+    serving.join()
+    server.close()
+    client.close()
@@ -0,0 +1,107 @@
+import socket, threading
+
+from websocket.frames import Frame
+from websocket.selector import SelectorWebSocketServer
+from websocket.websockets import WebSocket
+
+
+def echo(conn, msg):
+    if isinstance(msg, str):
+        conn.send_text(msg)
+    else:
+        conn.send(msg)
+
+
+def serve(**options) -> tuple[SelectorWebSocketServer, threading.Thread, str]:
+    server = SelectorWebSocketServer(("127.0.0.1", 0), **options)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,))
+    thread.start()
+    return server, thread, f"ws://127.0.0.1:{server.sock.getsockname()[1]}/"
+
+
+def stop(server: SelectorWebSocketServer, thread: threading.Thread) -> None:
+    server.stop()
+    thread.join()
+    server.close()
+
+
+def test_echoes_many_connections_on_one_thread():
+    opened = []
+    server, thread, url = serve(on_open=opened.append, on_message=echo)
+    try:
+        threads = threading.active_count()
+        clients = [WebSocket.connect(url) for _ in range(50)]
+        for i, ws in enumerate(clients):
+            ws.send_text(f"message {i}")
+        assert [ws.recv_text() for ws in clients] == [
+            f"message {i}" for i in range(50)
+        ]
+        assert len(opened) == 50
+        assert threading.active_count() == threads + len(clients)
+    finally:
+        stop(server, thread)
+
+
+def test_queues_messages_larger_than_socket_buffer():
+    server, thread, url = serve(on_message=echo)
+    try:
+        ws = WebSocket.connect(url)
+        ws.send(bytes(8 * 1024 * 1024))
+        received = ws.recv(timeout=10)
+        assert len(received) == 8 * 1024 * 1024
+    finally:
+        stop(server, thread)
+
+
+def test_invalid_ping_closes_only_its_connection():
+    server, thread, url = serve(on_message=echo)
+    try:
+        failing, healthy = WebSocket.connect(url), WebSocket.connect(url)
+        failing.conn.sendall(bytes(Frame(Frame.PING, bytes(126), b"\x01\x02\x03\x04")))
+        failing.listen_thread.join(1)
+        assert failing.close_code == 1002
+        healthy.send_text("still served")
+        assert healthy.recv_text(timeout=1) == "still served"
+    finally:
+        stop(server, thread)
+
+
+def test_failing_callback_closes_only_its_connection(capsys):
+    def on_message(conn, msg):
+        if msg == "boom":
+            raise RuntimeError("handler failed")
+        echo(conn, msg)
+
+    server, thread, url = serve(on_message=on_message)
+    try:
+        failing, healthy = WebSocket.connect(url), WebSocket.connect(url)
+        failing.send_text("boom")
+        failing.listen_thread.join(1)
+        assert failing.close_code == 1011
+        healthy.send_text("still served")
+        assert healthy.recv_text(timeout=1) == "still served"
+        assert "handler failed" in capsys.readouterr().err
+    finally:
+        stop(server, thread)
+
+
+def test_drops_handshakes_past_the_deadline():
+    server, thread, url = serve(handshake_timeout=0.2)
+    try:
+        silent = socket.create_connection(server.sock.getsockname())
+        silent.settimeout(1)
+        assert silent.recv(1) == b""
+        assert WebSocket.connect(url) is not None
+    finally:
+        stop(server, thread)
+
+
+def test_closes_with_1009_on_oversized_message():
+    server, thread, url = serve(on_message=echo, max_message_size=16)
+    try:
+        ws = WebSocket.connect(url)
+        ws.send(bytes(17))
+        ws.listen_thread.join(1)
+        assert ws.close_code == 1009
+    finally:
+        stop(server, thread)
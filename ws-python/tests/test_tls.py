@@ -0,0 +1,129 @@
+import asyncio, os, ssl, threading
+
+from websocket import tls
+from websocket.aio import AsyncWebSocket
+from websocket.websockets import WebSocket, WebSocketServer, sendmsg_all
+from tests.helpers import serve, stop
+
+CERT = os.path.join(os.path.dirname(__file__), "keycert.pem")
+
+
+def client_context() -> ssl.SSLContext:
+    return ssl.create_default_context(cafile=CERT)
+
+
+def serve_tls(**options) -> tuple[WebSocketServer, threading.Thread, str]:
+    return serve(ssl_context=tls.server_context(CERT), **options)
+
+
+class TestSessionCache:
+    def test_keeps_sessions_per_context_and_server(self):
+        cache = tls.SessionCache()
+        a, b = ssl.create_default_context(), ssl.create_default_context()
+        cache.put(a, "example.com", 443, "session")
+        assert cache.get(a, "example.com", 443) == "session"
+        assert cache.get(b, "example.com", 443) is None
+        assert cache.get(a, "example.com", 8443) is None
+
+    def test_drops_least_recently_used(self):
+        cache = tls.SessionCache(size=2)
+        context = ssl.create_default_context()
+        cache.put(context, "a", 1, "a")
+        cache.put(context, "b", 1, "b")
+        cache.get(context, "a", 1)
+        cache.put(context, "c", 1, "c")
+        assert len(cache) == 2
+        assert cache.get(context, "b", 1) is None
+        assert cache.get(context, "a", 1) == "a"
+
+
+def test_wss_round_trip():
+    server, serving, url = serve_tls()
+    try:
+        ws = WebSocket.connect(url, ssl_context=client_context())
+        assert isinstance(ws.conn, ssl.SSLSocket)
+        ws.send_text("hello")
+        assert ws.recv_message(1) == "hello"
+        ws.send(os.urandom(100_000))
+        assert len(ws.recv(2)) == 100_000
+        ws.close()
+    finally:
+        stop(server, serving)
+
+
+def test_async_wss_round_trip():
+    async def client(url):
+        ws = await AsyncWebSocket.connect(url, ssl_context=client_context())
+        async with ws:
+            assert ws.transport.get_extra_info("ssl_object") is not None
+            await ws.send_text("hello")
+            await ws.send(bytes(100_000))
+            return await ws.recv_text(), await ws.recv()
+
+    server, serving, url = serve_tls()
+    try:
+        assert asyncio.run(asyncio.wait_for(client(url), 10)) == (
+            "hello",
+            bytes(100_000),
+        )
+    finally:
+        stop(server, serving)
+
+
+def test_reconnects_resume_the_session():
+    server, serving, url = serve_tls()
+    context = client_context()
+    sessions = tls.SessionCache()
+    try:
+        first = WebSocket.connect(url, ssl_context=context, sessions=sessions)
+        assert not first.conn.session_reused
+        assert len(sessions) == 1
+        first.close()
+        second = WebSocket.connect(url, ssl_context=context, sessions=sessions)
+        assert second.conn.session_reused
+        second.send_text("resumed")
+        assert second.recv_message(1) == "resumed"
+        second.close()
+    finally:
+        stop(server, serving)
+
+
+def test_broadcast_over_tls():
+    # The echo handlers may still hold their connections' send locks, which the
+    # default policy would skip
+    server, serving, url = serve_tls(slow_policy="block")
+    try:
+        clients = [WebSocket.connect(url, ssl_context=client_context()) for _ in "ab"]
+        clients[0].send_text("ready")
+        clients[0].recv_message(1)
+        clients[1].send_text("ready")
+        clients[1].recv_message(1)
+        assert server.broadcast("all") == 2
+        assert [ws.recv_text(1) for ws in clients] == ["all", "all"]
+        for ws in clients:
+            ws.close()
+    finally:
+        stop(server, serving)
+
+
+def test_plain_clients_are_refused_by_tls_servers():
+    server, serving, url = serve_tls()
+    try:
+        try:
+            ws = WebSocket.connect(url.replace("wss", "ws"), timeout=1)
+        except OSError:
+            ws = None
+        assert ws is None
+    finally:
+        stop(server, serving)
+
+
+def test_sendmsg_all_coalesces_small_buffers_for_tls():
+    class Recorder(ssl.SSLSocket):
+        def sendall(self, data) -> None:
+            self.writes.append(bytes(data))
+
+    sock = Recorder.__new__(Recorder)
+    sock.writes = []
+    sendmsg_all(sock, [b"a" * 10, b"b" * 10, bytes(tls.RECORD_SIZE), b"c"])
+    assert [len(data) for data in sock.writes] == [20, tls.RECORD_SIZE, 1]
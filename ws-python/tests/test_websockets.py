@@ -0,0 +1,531 @@
+import socket, threading, time
+
+import pytest
+
+from websocket.frames import Frame
+from websocket.messages import RawText
+from websocket.metrics import Hooks
+from websocket.websockets import WebSocket, WebSocketServer, sendmsg_all
+from tests.helpers import read_frame, read_frames
+
+
+def test_sendmsg_all_sends_every_buffer():
+    a, b = socket.socketpair()
+    buffers = [b"head", bytes(300_000), b"", b"tail"]
+
+    def send():
+        sendmsg_all(a, buffers)
+        a.close()
+
+    threading.Thread(target=send).start()
+    received = bytearray()
+    while data := b.recv(65536):
+        received += data
+    assert received == b"".join(buffers)
+
+
+class TestWebSocketSend:
+    def test_server_sends_unmasked_frames(self):
+        a, b = socket.socketpair()
+        ws = WebSocket(a, is_server=True)
+        ws.send(bytes(70_000))
+        frame = read_frame(b)
+        assert frame.opcode == Frame.BINARY
+        assert not frame.is_masked
+        assert frame.payload == bytes(70_000)
+
+    def test_client_sends_masked_frames(self):
+        a, b = socket.socketpair()
+        ws = WebSocket(a, is_server=False)
+        ws.send_text("Hello, World!")
+        frame = read_frame(b)
+        assert frame.opcode == Frame.TEXT
+        assert frame.is_masked
+        assert frame.payload == b"Hello, World!"
+
+    def test_answers_ping_with_pong(self):
+        a, b = socket.socketpair()
+        _ws = WebSocket(a, is_server=True)
+        b.sendall(bytes(Frame(Frame.PING, b"are you there", b"\x01\x02\x03\x04")))
+        frame = read_frame(b)
+        assert frame.opcode == Frame.PONG
+        assert frame.payload == b"are you there"
+
+
+class TestBackpressure:
+    def test_stops_reading_at_high_watermark(self):
+        a, b = socket.socketpair()
+        ws = WebSocket(a, is_server=True, max_queue=4)
+        b.sendall(bytes(Frame(Frame.BINARY, b"x", b"\x01\x02\x03\x04")) * 20)
+        time.sleep(0.1)
+        assert ws.buffered_messages == 4
+        assert ws.reading_paused
+        for _ in range(20):
+            assert ws.recv(timeout=1) == b"x"
+        assert ws.buffered_messages == 0
+
+    def test_closes_with_1009_on_oversized_message(self):
+        a, b = socket.socketpair()
+        ws = WebSocket(a, is_server=True, max_message_size=16)
+        b.sendall(bytes(Frame(Frame.BINARY, bytes(17), b"\x01\x02\x03\x04")))
+        frame = read_frame(b)
+        assert frame.opcode == Frame.CLOSE
+        assert frame.payload[:2] == (1009).to_bytes(2, "big")
+        with pytest.raises(ConnectionError):
+            ws.recv(timeout=1)
+
+
+class TestFragmentation:
+    def test_send_stream_fragments_message(self):
+        a, b = socket.socketpair()
+        ws = WebSocket(a, is_server=True, fragment_size=4)
+        ws.send_stream([b"ab", b"cdefghij", b"k"])
+        frames = read_frames(b, 3)
+        assert [(f.opcode, f.fin, f.payload) for f in frames] == [
+            (Frame.BINARY, False, b"abcd"),
+            (Frame.CONTINUE, False, b"efgh"),
+            (Frame.CONTINUE, True, b"ijk"),
+        ]
+
+    def test_reassembles_received_fragments(self):
+        a, b = socket.socketpair()
+        ws = WebSocket(a, is_server=True)
+        key = b"\x01\x02\x03\x04"
+        b.sendall(
+            bytes(Frame(Frame.TEXT, b"Hello, ", key, fin=False))
+            + bytes(Frame(Frame.PING, b"", key))
+            + bytes(Frame(Frame.CONTINUE, b"World!", key))
+        )
+        assert ws.recv_text(timeout=1) == "Hello, World!"
+        assert read_frame(b).opcode == Frame.PONG
+
+    def test_send_file_round_trips_between_sockets(self, tmp_path):
+        path = tmp_path / "payload"
+        path.write_bytes(bytes(range(256)) * 4096)
+        a, b = socket.socketpair()
+        sender = WebSocket(a, is_server=False, fragment_size=100_000)
+        receiver = WebSocket(b, is_server=True, stream_messages=True)
+        threading.Thread(target=sender.send_file, args=(path,)).start()
+        stream = receiver.recv_stream(timeout=5)
+        chunks = list(stream)
+        assert not stream.is_text
+        assert len(chunks) == 11
+        assert b"".join(chunks) == path.read_bytes()
+
+
+class TestBroadcast:
+    def make_server(self, count: int, **options):
+        server = WebSocketServer(("127.0.0.1", 0), **options)
+        self.connections, peers = [], []
+        for _ in range(count):
+            a, b = socket.socketpair()
+            self.connections.append(
+                WebSocket(a, is_server=True, registry=server.connections)
+            )
+            peers.append(b)
+        return server, peers
+
+    def fill(self, sock: socket.socket) -> None:
+        sock.setblocking(False)
+        try:
+            while True:
+                sock.send(bytes(65536))
+        except BlockingIOError:
+            pass
+        sock.setblocking(True)
+
+    def test_sends_same_frame_to_every_connection(self):
+        server, peers = self.make_server(3)
+        assert server.broadcast("tick") == 3
+        for peer in peers:
+            frame = read_frame(peer)
+            assert frame.opcode == Frame.TEXT and frame.payload == b"tick"
+        server.sock.close()
+
+    def test_publishes_to_subscribers_only(self):
+        server, peers = self.make_server(3)
+        server.subscribe(self.connections[0], "prices")
+        server.subscribe(self.connections[2], "prices")
+        server.subscribe(self.connections[2], "news")
+        assert server.publish("prices", b"\x01") == 2
+        assert read_frame(peers[0]).payload == b"\x01"
+        assert read_frame(peers[2]).payload == b"\x01"
+        server.unsubscribe(self.connections[2])
+        assert server.topics == {"prices": {self.connections[0]}}
+        server.sock.close()
+
+    def test_skips_slow_connections(self):
+        server, peers = self.make_server(2)
+        self.fill(self.connections[0].conn)
+        assert server.broadcast(b"update") == 1
+        assert read_frame(peers[1]).payload == b"update"
+        server.sock.close()
+
+    def test_finishes_partial_writes_without_blocking(self):
+        server, peers = self.make_server(2)
+        slow = self.connections[0]
+        large = bytes(4 * 1024 * 1024)
+        # Leaves the slow peer's buffer partly full, so only part of the next fits
+        assert server.broadcast(b"first") == 2
+        started = time.monotonic()
+        assert server.broadcast(large, [slow]) == 1
+        assert server.broadcast(b"next") == 1
+        assert time.monotonic() - started < 1
+        assert [frame.payload for frame in read_frames(peers[1], 2)] == [
+            b"first",
+            b"next",
+        ]
+        assert [frame.payload for frame in read_frames(peers[0], 2)] == [
+            b"first",
+            large,
+        ]
+        deadline = time.monotonic() + 1
+        while slow._send_lock.locked() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert server.broadcast(b"last") == 2
+        assert read_frame(peers[0]).payload == b"last"
+        server.sock.close()
+
+    def test_drops_slow_connections(self):
+        server, peers = self.make_server(2, slow_policy="drop")
+        server.subscribe(self.connections[0], "prices")
+        self.fill(self.connections[0].conn)
+        assert server.publish("prices", b"update") == 0
+        assert server.topics == {}
+        self.connections[0].listen_thread.join(1)
+        assert self.connections[0].shutdown
+        server.sock.close()
+
+
+def test_accepts_split_handshake_followed_by_frames():
+    server = WebSocketServer(("127.0.0.1", 0))
+    client = socket.create_connection(server.sock.getsockname())
+    req = (
+        b"GET / HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\n"
+        b"Connection: Upgrade\r\nSec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n"
+        b"Sec-WebSocket-Version: 13\r\nCookie: " + b"c" * 4000 + b"\r\n\r\n"
+    )
+    frame = bytes(Frame(Frame.TEXT, b"early", b"\x01\x02\x03\x04"))
+
+    def send():
+        client.sendall(req[:100])
+        time.sleep(0.05)
+        client.sendall(req[100:] + frame)
+
+    threading.Thread(target=send).start()
+    ws = server.accept(timeout=1)
+    assert ws.recv_text(timeout=1) == "early"
+    client.close()
+    server.acceptor.close()
+    server.sock.close()
+
+
+HANDSHAKE = (
+    b"GET / HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\n"
+    b"Connection: Upgrade\r\nSec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n"
+    b"Sec-WebSocket-Version: 13\r\n\r\n"
+)
+
+
+def test_slow_handshake_does_not_block_others():
+    server = WebSocketServer(("127.0.0.1", 0), handshake_timeout=0.3)
+    silent = socket.create_connection(server.sock.getsockname())
+    with pytest.raises(TimeoutError):
+        server.accept(timeout=0.05)
+    client = socket.create_connection(server.sock.getsockname())
+    client.sendall(HANDSHAKE)
+    assert server.accept(timeout=1) is not None
+    assert client.recv(4096).startswith(b"HTTP/1.1 101")
+    assert server.acceptor.pending == 1
+    silent.settimeout(1)
+    assert silent.recv(1) == b""
+    assert server.acceptor.pending == 0
+    client.close()
+    server.acceptor.close()
+    server.sock.close()
+
+
+class TestBatchedSend:
+    def test_send_many_sends_every_message_in_order(self):
+        a, b = socket.socketpair()
+        ws = WebSocket(a, is_server=True)
+        messages = [str(i) if i % 2 else str(i).encode() for i in range(2000)]
+        threading.Thread(target=ws.send_many, args=(messages,)).start()
+        frames = read_frames(b, len(messages))
+        assert [frame.opcode for frame in frames[:2]] == [Frame.BINARY, Frame.TEXT]
+        assert [frame.payload.decode() for frame in frames] == [
+            str(i) for i in range(2000)
+        ]
+
+    def test_cork_holds_frames_until_flush(self):
+        a, b = socket.socketpair()
+        ws = WebSocket(a, is_server=True, cork=True, cork_interval=60)
+        ws.send(b"one")
+        ws.send_text("two")
+        b.settimeout(0.05)
+        with pytest.raises(TimeoutError):
+            b.recv(1)
+        ws.flush()
+        assert [frame.payload for frame in read_frames(b, 2)] == [b"one", b"two"]
+
+    def test_cork_flushes_on_threshold_and_control_frames(self):
+        a, b = socket.socketpair()
+        ws = WebSocket(a, is_server=True, cork=True, cork_bytes=100, cork_interval=60)
+        ws.send_many([bytes(40)] * 3)
+        assert len(read_frames(b, 3)) == 3
+        ws.send(b"held")
+        ws.ping(b"now")
+        frames = read_frames(b, 2)
+        assert [frame.opcode for frame in frames] == [Frame.BINARY, Frame.PING]
+
+    def test_cork_flushes_after_interval(self):
+        a, b = socket.socketpair()
+        ws = WebSocket(a, is_server=True, cork=True, cork_interval=0.01)
+        ws.send(b"soon")
+        b.settimeout(1)
+        assert read_frame(b).payload == b"soon"
+
+    def test_ping_does_not_wait_on_held_frames(self):
+        a, b = socket.socketpair()
+        ws = WebSocket(
+            a, is_server=True, cork=True, cork_bytes=1 << 24, cork_interval=60
+        )
+        large = bytes(4 * 1024 * 1024)
+        ws.send(large)
+        started = time.monotonic()
+        assert ws._send_nowait(Frame.PING, b"alive")
+        assert time.monotonic() - started < 1
+        frames = read_frames(b, 2)
+        assert [frame.payload for frame in frames] == [large, b"alive"]
+
+
+def test_drain_does_not_wait_on_a_stalled_peer():
+    server = WebSocketServer(("127.0.0.1", 0))
+    a, _b = socket.socketpair()
+    ws = WebSocket(
+        a, is_server=True, cork=True, cork_bytes=1 << 24, registry=server.connections
+    )
+    ws.send(bytes(4 * 1024 * 1024))
+    started = time.monotonic()
+    server.drain(0.5)
+    assert time.monotonic() - started < 2
+    assert not ws.listen_thread.is_alive()
+
+
+def test_connections_disable_nagle():
+    server = WebSocketServer(("127.0.0.1", 0))
+    url = f"ws://127.0.0.1:{server.sock.getsockname()[1]}/"
+    clients = []
+    connecting = threading.Thread(target=lambda: clients.append(WebSocket.connect(url)))
+    connecting.start()
+    ws = server.accept(timeout=1)
+    connecting.join()
+    client = clients[0]
+    for conn in (client.conn, ws.conn):
+        assert conn.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+    server.close()
+    client.close()
+
+
+class TestClose:
+    def test_close_handshake(self):
+        a, b = socket.socketpair()
+        server = WebSocket(a, is_server=True)
+        client = WebSocket(b, is_server=False)
+        started = time.monotonic()
+        client.close(4000, "done")
+        assert time.monotonic() - started < 1
+        assert (server.close_code, server.close_reason) == (4000, "done")
+        assert client.close_code == 4000
+        server.listen_thread.join(1)
+        assert server.shutdown and not server.listen_thread.is_alive()
+        with pytest.raises(ConnectionError):
+            server.send(b"late")
+        server.close()
+
+    def test_close_times_out_without_answer(self):
+        a, b = socket.socketpair()
+        ws = WebSocket(a, is_server=True, close_timeout=0.1)
+        ws.close()
+        frame = read_frame(b)
+        assert frame.opcode == Frame.CLOSE
+        assert frame.payload == b"\x03\xe8"
+        assert ws.close_code == 1006
+        assert not ws.listen_thread.is_alive()
+
+    def test_ping_during_close_handshake(self):
+        a, b = socket.socketpair()
+        ws = WebSocket(a, is_server=True)
+        closing = threading.Thread(target=ws.close)
+        closing.start()
+        assert read_frame(b).opcode == Frame.CLOSE
+        key = b"\x01\x02\x03\x04"
+        b.sendall(
+            bytes(Frame(Frame.PING, b"late", key))
+            + bytes(Frame(Frame.CLOSE, b"\x03\xe8", key))
+        )
+        closing.join(1)
+        assert not closing.is_alive()
+        assert ws.close_code == 1000
+
+    def test_invalid_close_code_is_protocol_error(self):
+        a, b = socket.socketpair()
+        ws = WebSocket(a, is_server=True)
+        b.sendall(bytes(Frame(Frame.CLOSE, b"\x03\xed", b"\x01\x02\x03\x04")))
+        assert read_frame(b).payload[:2] == b"\x03\xea"
+        ws.listen_thread.join(1)
+        assert ws.close_code == 1002
+
+    @pytest.mark.parametrize(
+        "raw",
+        [
+            b"\xa2\x80\x01\x02\x03\x04",
+            b"\x83\x80\x01\x02\x03\x04",
+            bytes(Frame(Frame.PING, bytes(126), b"\x01\x02\x03\x04")),
+            bytes(Frame(Frame.PING, b"ping", b"\x01\x02\x03\x04", fin=False)),
+        ],
+        ids=["rsv2", "reserved opcode", "long ping", "fragmented ping"],
+    )
+    def test_invalid_frames_close_with_1002(self, raw):
+        a, b = socket.socketpair()
+        ws = WebSocket(a, is_server=True)
+        b.sendall(raw)
+        frame = read_frame(b)
+        assert frame.opcode == Frame.CLOSE
+        assert frame.payload[:2] == b"\x03\xea"
+        ws.listen_thread.join(1)
+        assert ws.close_code == 1002
+
+    @pytest.mark.parametrize(
+        "is_server, key", [(True, b""), (False, b"\x01\x02\x03\x04")]
+    )
+    def test_wrong_mask_bit_closes_with_1002(self, is_server, key):
+        a, b = socket.socketpair()
+        ws = WebSocket(a, is_server=is_server)
+        b.sendall(bytes(Frame(Frame.BINARY, b"data", key)))
+        frame = read_frame(b)
+        assert frame.opcode == Frame.CLOSE
+        assert bytes(frame.payload[:2]) == b"\x03\xea"
+        ws.listen_thread.join(1)
+        assert ws.close_code == 1002
+        with pytest.raises(ConnectionError):
+            ws.recv(timeout=1)
+
+    def test_unexpected_error_closes_with_1011(self, capsys):
+        closed = []
+
+        class FailingHooks(Hooks):
+            def on_frame_in(self, ws, frame):
+                raise RuntimeError("broken hook")
+
+            def on_close(self, ws, code):
+                closed.append(code)
+
+        a, b = socket.socketpair()
+        ws = WebSocket(a, is_server=True, hooks=FailingHooks())
+        b.sendall(bytes(Frame(Frame.BINARY, b"data", b"\x01\x02\x03\x04")))
+        assert read_frame(b).payload[:2] == b"\x03\xf3"
+        ws.listen_thread.join(1)
+        assert closed == [1011]
+        assert b.recv(1) == b""
+        with pytest.raises(ConnectionError):
+            ws.recv(timeout=1)
+        assert "broken hook" in capsys.readouterr().err
+
+    def test_invalid_text_closes_with_1007(self):
+        a, b = socket.socketpair()
+        ws = WebSocket(a, is_server=True)
+        b.sendall(bytes(Frame(Frame.TEXT, b"caf\xe9", b"\x01\x02\x03\x04")))
+        assert read_frame(b).payload[:2] == b"\x03\xef"
+        ws.listen_thread.join(1)
+        assert ws.close_code == 1007
+
+
+class TestSubprotocols:
+    def connect(self, server_protocols, client_protocols):
+        server = WebSocketServer(("127.0.0.1", 0), protocols=server_protocols)
+        url = f"ws://127.0.0.1:{server.sock.getsockname()[1]}/"
+        clients = []
+        connecting = threading.Thread(
+            target=lambda: clients.append(
+                WebSocket.connect(url, protocols=client_protocols)
+            )
+        )
+        connecting.start()
+        self.ws_server = server
+        ws = server.accept(timeout=1)
+        connecting.join()
+        return ws, clients[0]
+
+    def teardown_method(self):
+        self.ws_server.close()
+
+    def test_negotiates_the_servers_preference(self):
+        server, client = self.connect(["msgpack", "json"], ["chat.v1", "json"])
+        assert server.subprotocol == client.subprotocol == "json"
+        client.send_obj({"id": 1, "tags": ["a", "é"]})
+        assert server.recv_obj(1) == {"id": 1, "tags": ["a", "é"]}
+        server.send_obj([None, 2.5])
+        assert client.recv_obj(1) == [None, 2.5]
+        # Negotiating a codec leaves text received as text
+        assert not server.raw_text and not client.raw_text
+        client.send_text("é")
+        client.send_text("plain")
+        assert server.recv_text(1) == "é"
+        assert type(server.recv_message(1)) is str
+        client.close()
+        server.close()
+
+    def test_no_common_protocol(self):
+        server, client = self.connect(["json"], ["chat.v1"])
+        assert server.subprotocol is None and client.subprotocol is None
+        assert not client.raw_text
+        client.send_obj({"fallback": "json"})
+        assert server.recv_text(1) == '{"fallback":"json"}'
+        client.close()
+        server.close()
+
+
+def test_raw_text_mode():
+    a, b = socket.socketpair()
+    server = WebSocket(a, is_server=True, raw_text=True)
+    client = WebSocket(b, is_server=False)
+    client.send_text("héllo")
+    client.send(b"binary")
+    assert server.recv_text(1) == RawText("héllo".encode())
+    assert type(server.recv_message(1)) is bytes
+    client.send_text("plain")
+    assert type(server.recv_message(1)) is RawText
+    server.send_text("back")
+    assert client.recv_text(1) == "back"
+    client.close()
+    server.close()
+
+
+def test_drain_closes_connections_with_going_away():
+    server = WebSocketServer(("127.0.0.1", 0))
+    url = f"ws://127.0.0.1:{server.sock.getsockname()[1]}/"
+
+    def echo(ws):
+        while True:
+            try:
+                ws.send(ws.recv())
+            except ConnectionError:
+                return
+
+    serving = threading.Thread(target=server.serve_forever, args=(echo, 0.05))
+    serving.start()
+    clients = [WebSocket.connect(url) for _ in range(3)]
+    for ws in clients:
+        ws.send(b"hi")
+        assert ws.recv(timeout=1) == b"hi"
+    started = time.monotonic()
+    server.drain(5)
+    assert time.monotonic() - started < 1
+    serving.join(1)
+    assert not serving.is_alive()
+    assert server.connection_count() == 0
+    for ws in clients:
+        ws.listen_thread.join(1)
+        assert (ws.close_code, ws.close_reason) == (1001, "Going away")
+        ws.close()
@@ -0,0 +1,63 @@
+import os, signal, socket, subprocess, sys, textwrap, time
+
+from websocket.websockets import WebSocket
+
+SERVER = textwrap.dedent(
+    """
+    import os, sys
+    from websocket import WebSocketServer
+
+    def handler(ws):
+        while True:
+            msg = ws.recv_text()
+            if msg == "crash":
+                os._exit(1)
+            ws.send_text(str(os.getpid()))
+
+    WebSocketServer(("127.0.0.1", int(sys.argv[1])), workers=2, drain_timeout=1).serve_forever(handler)
+    """
+)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def connect(url: str) -> WebSocket:
+    for _ in range(50):
+        try:
+            return WebSocket.connect(url)
+        except ConnectionRefusedError:
+            time.sleep(0.1)
+    raise ConnectionRefusedError(url)
+
+
+def worker_pid(url: str) -> int:
+    ws = connect(url)
+    ws.send_text("pid")
+    return int(ws.recv_text())
+
+
+def test_workers_share_port_restart_and_drain():
+    port = free_port()
+    url = f"ws://127.0.0.1:{port}/"
+    proc = subprocess.Popen(
+        [sys.executable, "-c", SERVER, str(port)],
+        cwd=os.path.dirname(os.path.dirname(__file__)),
+    )
+    try:
+        pids = {worker_pid(url) for _ in range(16)}
+        assert len(pids) == 2
+        assert proc.pid not in pids
+
+        ws = connect(url)
+        ws.send_text("crash")
+        time.sleep(1.5)
+        assert len({worker_pid(url) for _ in range(16)} - pids) >= 1
+
+        proc.send_signal(signal.SIGTERM)
+        assert proc.wait(10) == 0
+    finally:
+        proc.kill()
@@ -1 +1,4 @@
-from websocket.websockets import WebSocket, WebSocketServer
\ No newline at end of file
+from websocket.websockets import WebSocket, WebSocketServer
+from websocket.aio import AsyncWebSocket, AsyncWebSocketServer
+from websocket.selector import SelectorWebSocketServer
+from websocket.pool import WebSocketPool, connect_many
@@ -0,0 +1,242 @@
+import queue, selectors, socket, ssl, threading, time
+from typing import Callable, Optional
+from websocket.http import HandshakeParser, Request
+
+
+class _Handshake:
+    """
+    A connection whose opening handshake is still being read.
+    """
+
+    __slots__ = ("conn", "parser", "started", "deadline", "tls_pending")
+
+    def __init__(self, conn: socket.socket, started: float, deadline: float) -> None:
+        self.conn = conn
+        self.parser = HandshakeParser(is_request=True)
+        self.started = started
+        self.deadline = deadline
+        self.tls_pending = isinstance(conn, ssl.SSLSocket)
+
+
+class Acceptor:
+    """
+    Accepts connections on a listening socket and reads their opening handshakes
+    concurrently from one background thread with a `selectors` loop, so a client that
+    is slow to send its handshake, or never does, doesn't hold up the others. Each
+    handshake has a deadline, after which the connection is closed. With an
+    `ssl_context`, the TLS handshake is done the same way first, within the same
+    deadline.
+
+    Upgraded connections are put on a ready queue and taken with `get()`. While the
+    queue is full, new connections are left in the kernel's listen backlog.
+    """
+
+    def __init__(
+        self,
+        sock: socket.socket,
+        upgrade: Callable[[socket.socket, Request, bytes, float], Optional[object]],
+        timeout: float = 10.0,
+        max_ready: int = 1024,
+        ssl_context: Optional[ssl.SSLContext] = None,
+    ) -> None:
+        """
+        Constructs a new Acceptor, call `start()` to start accepting.
+
+        Args:
+            sock: The listening socket.
+            upgrade: Called on the acceptor's thread with a blocking connection, its
+                    handshake request, any bytes received after it and the
+                    `time.monotonic()` it was accepted at, returns the upgraded
+                    connection to queue or None if the handshake was refused.
+            timeout: How long, in seconds, a client has to send its handshake.
+                    Defaults to 10.
+            max_ready: The most upgraded connections queued before accepting pauses.
+                    Defaults to 1024.
+            ssl_context: The server side TLS context to wrap connections in, if any.
+        """
+        self.sock = sock
+        self.upgrade = upgrade
+        self.timeout = timeout
+        self.max_ready = max_ready
+        self.ssl_context = ssl_context
+        self.ready: queue.Queue = queue.Queue()
+        self._pending: dict[socket.socket, _Handshake] = {}
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._listening = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def pending(self) -> int:
+        """
+        The number of connections whose handshake is still being read
+        """
+        return len(self._pending)
+
+    def start(self) -> None:
+        """
+        Starts accepting connections on a background thread.
+        """
+        self.sock.setblocking(False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+        self._listen(True)
+        self._thread.start()
+
+    def get(self, timeout: Optional[float] = None) -> object:
+        """
+        Removes and returns the oldest upgraded connection, waiting for one if needed.
+
+        Args:
+            timeout: The longest time to wait in seconds, or None to wait forever.
+
+        Raises:
+            TimeoutError: If no connection was upgraded within `timeout`.
+        """
+        try:
+            conn = self.ready.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("Timed out waiting for a connection")
+        if not self._listening:
+            self._wake()
+        return conn
+
+    def close(self) -> None:
+        """
+        Stops accepting, and closes every connection whose handshake wasn't finished.
+        Connections already upgraded are left on the ready queue.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread.is_alive():
+            self._wake()
+            self._thread.join()
+        for handshake in self._pending.values():
+            handshake.conn.close()
+        self._pending.clear()
+        self._selector.close()
+        self._wake_r.close()
+        self._wake_w.close()
+
+    def _wake(self) -> None:
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass
+
+    def _listen(self, listening: bool) -> None:
+        if listening and not self._listening:
+            self._selector.register(self.sock, selectors.EVENT_READ, self.sock)
+        elif not listening and self._listening:
+            self._selector.unregister(self.sock)
+        self._listening = listening
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._listen(self.ready.qsize() < self.max_ready)
+            timeout = None
+            if self._pending:
+                first = next(iter(self._pending.values()))
+                timeout = max(0.0, first.deadline - time.monotonic())
+            for key, _events in self._selector.select(timeout):
+                if key.data is None:
+                    try:
+                        while self._wake_r.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                elif key.data is self.sock:
+                    self._accept()
+                else:
+                    self._read(key.data)
+            self._expire()
+
+    def _accept(self) -> None:
+        started = time.monotonic()
+        deadline = started + self.timeout
+        for _ in range(64):
+            try:
+                conn, _addr = self.sock.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                # Out of file descriptors, leave the rest in the backlog for a moment
+                time.sleep(0.01)
+                return
+            conn.setblocking(False)
+            if self.ssl_context is not None:
+                # The TLS handshake sends small records back to back, don't let them
+                # wait on delayed ACKs
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                conn = self.ssl_context.wrap_socket(
+                    conn, server_side=True, do_handshake_on_connect=False
+                )
+            handshake = _Handshake(conn, started, deadline)
+            self._pending[conn] = handshake
+            self._selector.register(conn, selectors.EVENT_READ, handshake)
+
+    def _read(self, handshake: _Handshake) -> None:
+        conn = handshake.conn
+        if handshake.tls_pending:
+            try:
+                conn.do_handshake()
+            except ssl.SSLWantReadError:
+                self._selector.modify(conn, selectors.EVENT_READ, handshake)
+                return
+            except ssl.SSLWantWriteError:
+                self._selector.modify(conn, selectors.EVENT_WRITE, handshake)
+                return
+            except OSError:
+                self._drop(conn)
+                return
+            handshake.tls_pending = False
+            self._selector.modify(conn, selectors.EVENT_READ, handshake)
+        while True:
+            try:
+                data = conn.recv(4096)
+            except (BlockingIOError, InterruptedError, ssl.SSLWantReadError):
+                return
+            except OSError:
+                data = b""
+            try:
+                req = handshake.parser.feed(data) if data else None
+            except ValueError:
+                data, req = b"", None
+            if not data or req is not None:
+                break
+            # Decrypted bytes left in the TLS buffer don't wake the selector
+            if not isinstance(conn, ssl.SSLSocket) or not conn.pending():
+                return
+        self._selector.unregister(conn)
+        del self._pending[conn]
+        if req is None:
+            conn.close()
+            return
+        conn.setblocking(True)
+        try:
+            upgraded = self.upgrade(
+                conn, req, handshake.parser.leftover, handshake.started
+            )
+        except OSError:
+            upgraded = None
+        if upgraded is None:
+            conn.close()
+        else:
+            self.ready.put(upgraded)
+
+    def _drop(self, conn: socket.socket) -> None:
+        self._selector.unregister(conn)
+        del self._pending[conn]
+        conn.close()
+
+    def _expire(self) -> None:
+        # Deadlines are all the same distance from the accept, so the pending handshakes
+        # are in deadline order
+        now = time.monotonic()
+        while self._pending:
+            conn, handshake = next(iter(self._pending.items()))
+            if handshake.deadline > now:
+                return
+            self._drop(conn)
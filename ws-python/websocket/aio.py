@@ -0,0 +1,540 @@
+import asyncio, os, ssl, struct
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Optional
+from websocket import http, tls
+from websocket.frames import (
+    Frame,
+    FrameDecoder,
+    FrameTooLarge,
+    InvalidText,
+    ProtocolError,
+)
+from websocket.http import Request, Response
+from websocket.messages import MessageAssembler, MessageQueue
+from websocket.websockets import parse_close, parse_ws_url
+
+
+class AsyncWebSocket:
+    """
+    A Websocket connection as specified by RFC 6455, driven by an asyncio event loop
+    """
+
+    def __init__(
+        self,
+        transport: asyncio.Transport,
+        is_server: bool,
+        protocols: list[str] = [],
+        extensions: list[str] = [],
+        *,
+        max_message_size: Optional[int] = 16 * 1024 * 1024,
+        max_queue: Optional[int] = 1024,
+        max_queue_bytes: Optional[int] = 64 * 1024 * 1024,
+        low_queue: Optional[int] = None,
+        low_queue_bytes: Optional[int] = None,
+        close_timeout: float = 10.0,
+    ) -> None:
+        """
+        Constructs an `AsyncWebSocket` connection from parts, note that `AsyncWebSocket`
+        should usually not be constructed directly, and users should instead use
+        `AsyncWebSocket.connect()` to open client side connections, or use an
+        `AsyncWebSocketServer` to open server side connections.
+
+        Received messages are queued until read. Once `max_queue` messages or
+        `max_queue_bytes` bytes are queued, the transport stops reading, so TCP flow
+        control pushes back on the peer, until the queue drains to `low_queue`
+        messages and `low_queue_bytes` bytes.
+
+        Args:
+            transport: The transport of the connection, assumes a websocket handshake
+                    has already been performed.
+            is_server: Describes if the connection is from a server or client.
+            protocols: A list of protocols on top of the WebSocket connection. Defaults to [].
+            extensions: A list of extensions on top of the WebSocket connection. Defaults to [].
+            max_message_size: The largest message accepted, larger ones close the
+                    connection with status 1009. None for no limit. Defaults to 16 MiB.
+            max_queue: The most messages queued before reading pauses, None for no
+                    limit. Defaults to 1024.
+            max_queue_bytes: The most bytes queued before reading pauses, None for no
+                    limit. Defaults to 64 MiB.
+            low_queue: The number of queued messages at which reading resumes.
+                    Defaults to half of `max_queue`.
+            low_queue_bytes: The number of queued bytes at which reading resumes.
+                    Defaults to half of `max_queue_bytes`.
+            close_timeout: How long, in seconds, `close()` waits for the peer to answer
+                    the close frame before dropping the connection. Defaults to 10.
+        """
+        self.transport = transport
+        self.is_server = is_server
+        self.protocols = protocols
+        self.extensions = extensions
+        self.max_message_size = max_message_size
+        self.close_timeout = close_timeout
+        self.close_code = 1006
+        self.close_reason = ""
+        self.closed = False
+        self.reading_paused = False
+        self._close_sent = False
+        self.messages = MessageQueue(
+            max_queue, max_queue_bytes, low_queue, low_queue_bytes
+        )
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self._closed = asyncio.Event()
+        self._assembler = MessageAssembler(max_message_size)
+
+    @staticmethod
+    async def connect(
+        url: str,
+        protocols: list[str] = [],
+        extensions: list[str] = [],
+        ssl_context: Optional[ssl.SSLContext] = None,
+        **options,
+    ) -> Optional["AsyncWebSocket"]:
+        """Connect to a websocket server and perform an opening handshake
+
+        Args:
+            url: the url of the server to connect to
+            protocols: an optional list of protocols to request from the server. Defaults to [].
+            extensions: an optional list of extensions to request from the server Defaults to [].
+            ssl_context: The TLS context for `wss://` urls. Defaults to the one shared
+                    by every connection, verifying the server's certificate.
+            options: Keyword arguments passed on to `AsyncWebSocket`, such as
+                    `max_queue`.
+
+        Returns:
+            Either an open AsyncWebSocket connection, or None if the connection failed
+        """
+        server_url = parse_ws_url(url)
+        loop = asyncio.get_running_loop()
+        handshake = loop.create_future()
+        tls_options = {}
+        if server_url.scheme == "wss":
+            tls_options = {
+                "ssl": ssl_context or tls.default_context(),
+                "server_hostname": server_url.host,
+            }
+        await loop.create_connection(
+            lambda: _ClientProtocol(
+                Request.new_ws(server_url), handshake, protocols, extensions, options
+            ),
+            *server_url.hostpair(),
+            **tls_options,
+        )
+        return await handshake
+
+    async def send(self, msg: bytes) -> None:
+        """
+        Send binary data over the websocket connection.
+
+        Args:
+            msg: The data to send.
+        """
+        await self._send_frame(Frame.BINARY, msg)
+
+    async def send_text(self, msg: str) -> None:
+        """
+        Send text data over the websocket connection.
+
+        Args:
+            msg: The text data to send.
+        """
+        await self._send_frame(Frame.TEXT, msg.encode())
+
+    async def recv(self) -> bytes:
+        """
+        Receive bytes from the WebSocket connection, waiting for a binary message if
+        none has arrived yet.
+
+        Returns:
+            bytes: The binary data received from the connection.
+        """
+        return await self._next_message(bytes)
+
+    async def recv_text(self) -> str:
+        """
+        Receive text from the WebSocket connection, waiting for a text message if none
+        has arrived yet.
+
+        Returns:
+            str: The text received from the connection.
+        """
+        return await self._next_message(str)
+
+    async def recv_message(self) -> str | bytes:
+        """
+        Receive the next message from the WebSocket connection, whether text or binary.
+
+        Returns:
+            str | bytes: The message, `str` for text messages and `bytes` for binary ones.
+        """
+        return await self._next_message(None)
+
+    async def ping(self, payload: bytes = bytes()) -> None:
+        """
+        Send a ping control frame, the peer should answer with a pong.
+
+        Args:
+            payload: Up to 125 bytes of application data, echoed back in the pong.
+        """
+        await self._send_control(Frame.PING, payload)
+
+    async def pong(self, payload: bytes = bytes()) -> None:
+        """
+        Send a pong control frame.
+
+        Args:
+            payload: Up to 125 bytes of application data, usually that of the ping
+                    being answered.
+        """
+        await self._send_control(Frame.PONG, payload)
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        """
+        Closes the connection with the closing handshake: sends a close frame, waits up
+        to `close_timeout` for the peer's close frame in answer, then closes the
+        transport. Messages that arrive meanwhile can still be received.
+
+        Args:
+            code: The close status code to send. Defaults to 1000.
+            reason: Why the connection is closing, at most 123 bytes once encoded.
+                    Defaults to none.
+
+        Raises:
+            ValueError: If the reason is too long.
+        """
+        payload = struct.pack("!H", code) + reason.encode()
+        if len(payload) > 125:
+            raise ValueError("Close reasons must be at most 123 bytes")
+        self._send_close(payload)
+        try:
+            await asyncio.wait_for(self._closed.wait(), self.close_timeout)
+        except TimeoutError:
+            self.transport.abort()
+            await self._closed.wait()
+
+    async def _next_message(self, kind: Optional[type]) -> str | bytes:
+        while True:
+            msg = self.messages.get_nowait(kind)
+            if msg is not None:
+                if self.reading_paused and self.messages.drained:
+                    self.reading_paused = False
+                    self.transport.resume_reading()
+                return msg
+            if self.closed:
+                raise ConnectionError("WebSocket connection is closed")
+            self._readable.clear()
+            await self._readable.wait()
+
+    async def _send_control(self, opcode: int, payload: bytes) -> None:
+        if len(payload) > 125:
+            raise ValueError("Control frame payloads must be at most 125 bytes")
+        await self._send_frame(opcode, payload)
+
+    async def _send_frame(self, opcode: int, payload: bytes) -> None:
+        if self.closed or self._close_sent:
+            raise ConnectionError("WebSocket connection is closed")
+        self._write_frame(opcode, payload)
+        if not self._writable.is_set():
+            await self._writable.wait()
+
+    def _write_frame(self, opcode: int, payload: bytes) -> None:
+        frame = Frame(opcode, payload, mask=bytes() if self.is_server else os.urandom(4))
+        self.transport.writelines(frame.buffers())
+
+    def _send_close(self, payload: bytes) -> None:
+        """
+        Sends a close frame unless one was already sent, after which nothing more may be
+        sent.
+        """
+        if self.closed or self._close_sent:
+            return
+        self._close_sent = True
+        self._write_frame(Frame.CLOSE, payload)
+
+    def _fail(self, code: int, reason: str) -> None:
+        """
+        Sends a close frame with the given status and drops the connection.
+        """
+        self.close_code = code
+        self._send_close(struct.pack("!H", code) + reason.encode()[:123])
+        self.transport.close()
+
+    def _handle_frame(self, frame: Frame) -> None:
+        match frame.opcode:
+            case Frame.BINARY | Frame.TEXT | Frame.CONTINUE:
+                message = self._assembler.feed(frame)
+                if message is not None:
+                    self._put_message(message[1])
+            case Frame.PING:
+                # Nothing more may be sent after our close frame
+                if not self._close_sent:
+                    self._write_frame(Frame.PONG, frame.payload)
+            case Frame.CLOSE:
+                self.close_code, self.close_reason = parse_close(bytes(frame.payload))
+                # Answer with the same status, unless this answers our close frame
+                self._send_close(frame.payload[:2])
+                self.transport.close()
+
+    def _put_message(self, msg: str | bytes) -> None:
+        self.messages.put(msg)
+        self._readable.set()
+        if not self.reading_paused and self.messages.full:
+            self.reading_paused = True
+            self.transport.pause_reading()
+
+    def _connection_lost(self) -> None:
+        self.closed = True
+        self.messages.close()
+        self._readable.set()
+        self._writable.set()
+        self._closed.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str | bytes:
+        try:
+            return await self.recv_message()
+        except ConnectionError:
+            raise StopAsyncIteration
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_tb):
+        await self.close()
+
+
+class _WebSocketProtocol(asyncio.BufferedProtocol, ABC):
+    """
+    Reads the opening handshake, then hands every frame received to an `AsyncWebSocket`.
+    """
+
+    _is_server = False
+
+    def __init__(self) -> None:
+        self.transport: Optional[asyncio.Transport] = None
+        self.ws: Optional[AsyncWebSocket] = None
+        self._head = bytearray(4096)
+        self._parser = http.HandshakeParser(is_request=self._is_server)
+        self._decoder = FrameDecoder(bufsize=4096, masked=self._is_server)
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        if self.ws is None:
+            return memoryview(self._head)
+        return self._decoder.get_buffer()
+
+    def buffer_updated(self, nbytes: int) -> None:
+        if self.ws is not None:
+            self._decoder.buffer_updated(nbytes)
+            self._dispatch()
+            return
+        try:
+            head = self._parser.feed(self._head[:nbytes])
+            if head is None:
+                return
+            self.ws = self._handshake(head)
+        except ValueError:
+            self.ws = None
+        if self.ws is None:
+            self._reject()
+            return
+        self._decoder.max_size = self.ws.max_message_size
+        self._decoder.feed(self._parser.leftover)
+        self._head = bytearray()
+        self._parser = None
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        ws = self.ws
+        try:
+            for frame in self._decoder.frames():
+                ws._handle_frame(frame)
+                # Nothing the peer sends after its close frame is read
+                if frame.opcode == Frame.CLOSE:
+                    return
+        except FrameTooLarge:
+            ws._fail(1009, "Message too big")
+        except InvalidText as e:
+            ws._fail(1007, str(e))
+        except ProtocolError as e:
+            ws._fail(1002, str(e))
+
+    @abstractmethod
+    def _handshake(self, head: Request | Response) -> Optional[AsyncWebSocket]:
+        """
+        Answers or checks the opening handshake, giving the connection once it has
+        succeeded, or None to drop it.
+        """
+
+    def _reject(self) -> None:
+        self.transport.close()
+
+    def pause_writing(self) -> None:
+        if self.ws is not None:
+            self.ws._writable.clear()
+
+    def resume_writing(self) -> None:
+        if self.ws is not None:
+            self.ws._writable.set()
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        if self.ws is not None:
+            self.ws._connection_lost()
+
+
+class _ClientProtocol(_WebSocketProtocol):
+    def __init__(
+        self,
+        req: Request,
+        handshake: asyncio.Future,
+        protocols: list[str],
+        extensions: list[str],
+        options: dict,
+    ) -> None:
+        super().__init__()
+        self.req = req
+        self.handshake = handshake
+        self.protocols = protocols
+        self.extensions = extensions
+        self.options = options
+
+    def connection_made(self, transport) -> None:
+        super().connection_made(transport)
+        transport.write(bytes(self.req))
+
+    def _handshake(self, res: Response) -> Optional[AsyncWebSocket]:
+        if not res.is_valid_ws(
+            self.req.headers[http.HEADER_WS_KEY]
+        ):
+            return None
+        ws = AsyncWebSocket(
+            self.transport,
+            is_server=False,
+            protocols=self.protocols,
+            extensions=self.extensions,
+            **self.options,
+        )
+        self.handshake.set_result(ws)
+        return ws
+
+    def _reject(self) -> None:
+        super()._reject()
+        if not self.handshake.done():
+            self.handshake.set_result(None)
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        super().connection_lost(exc)
+        if not self.handshake.done():
+            self.handshake.set_result(None)
+
+
+class _ServerProtocol(_WebSocketProtocol):
+    _is_server = True
+
+    def __init__(self, server: "AsyncWebSocketServer") -> None:
+        super().__init__()
+        self.server = server
+
+    def _handshake(self, req: Request) -> Optional[AsyncWebSocket]:
+        if not req.is_valid_ws():
+            return None
+        res = Response.new_ws(req.headers[http.HEADER_WS_KEY])
+        self.transport.write(str(res).encode("utf-8"))
+        ws = AsyncWebSocket(
+            self.transport,
+            is_server=True,
+            protocols=self.server.protocols,
+            extensions=self.server.extensions,
+            **self.server.options,
+        )
+        self.server._on_open(ws)
+        return ws
+
+
+class AsyncWebSocketServer:
+    """
+    A WebSocket server running every connection on one asyncio event loop, each
+    handled by its own task running `handler`
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[AsyncWebSocket], Awaitable[None]],
+        addr: tuple[str, int] = ("", 80),
+        protocols: list[str] = [],
+        extensions: list[str] = [],
+        **options,
+    ) -> None:
+        """
+        Constructs a new AsyncWebSocketServer, call `start()` or `serve_forever()` to
+        start accepting connections.
+
+        Args:
+            handler: A coroutine function called with each new connection, the
+                    connection is closed once it returns.
+            addr: The address to listen on. Defaults to ("", 80).
+            protocols: A list of protocols on top of the WebSocket connection. Defaults to [].
+            extensions: A list of extensions on top of the WebSocket connection. Defaults to [].
+            options: Keyword arguments passed on to each `AsyncWebSocket`, such as
+                    `max_queue`.
+        """
+        self.handler = handler
+        self.addr = addr
+        self.protocols = protocols
+        self.extensions = extensions
+        self.options = options
+        self.connections: set[AsyncWebSocket] = set()
+        self.server: Optional[asyncio.Server] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        """
+        Starts listening for connections.
+        """
+        loop = asyncio.get_running_loop()
+        self.server = await loop.create_server(
+            lambda: _ServerProtocol(self), *self.addr, backlog=1024
+        )
+
+    async def serve_forever(self) -> None:
+        """
+        Accepts connections until cancelled.
+        """
+        if self.server is None:
+            await self.start()
+        await self.server.serve_forever()
+
+    async def close(self) -> None:
+        """
+        Stops accepting connections and closes every open connection.
+        """
+        if self.server is not None:
+            self.server.close()
+        await asyncio.gather(*(ws.close(1001) for ws in list(self.connections)))
+        if self.server is not None:
+            await self.server.wait_closed()
+
+    def _on_open(self, ws: AsyncWebSocket) -> None:
+        self.connections.add(ws)
+        task = asyncio.get_running_loop().create_task(self._run_handler(ws))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_handler(self, ws: AsyncWebSocket) -> None:
+        try:
+            await self.handler(ws)
+        finally:
+            self.connections.discard(ws)
+            await ws.close()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_tb):
+        await self.close()
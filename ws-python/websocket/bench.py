@@ -0,0 +1,258 @@
+"""
+A load test and microbenchmarks for the library, to catch performance regressions.
+
+The load test starts a local `WebSocketServer` echoing every message, and drives it
+from concurrent clients sending a mix of text and binary messages for a while, timing
+each round trip. Results can be written as JSON to compare runs.
+
+Usage: python -m websocket.bench [load|micro|all] [options], see --help
+"""
+
+import argparse, json, os, platform, resource, socket, sys, threading, time, timeit
+from typing import Optional
+from websocket.frames import Frame
+from websocket.http import Request, make_sec_ws_accept
+from websocket.metrics import Hooks, Metrics
+from websocket.pool import connect_many
+from websocket.websockets import WebSocket, WebSocketServer
+
+
+def echo(ws: WebSocket) -> None:
+    while True:
+        try:
+            msg = ws.recv_message()
+        except ConnectionError:
+            return
+        if isinstance(msg, str):
+            ws.send_text(msg)
+        else:
+            ws.send(msg)
+
+
+def percentile(samples: list[float], q: float) -> float:
+    """
+    Gives the `q` quantile of sorted samples, by the nearest rank.
+    """
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def rss_bytes() -> int:
+    """
+    Gives the resident set size of this process, in bytes.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def run_load(
+    clients: int = 8,
+    size: int = 128,
+    text_ratio: float = 0.5,
+    duration: float = 5.0,
+    hooks: Optional[Hooks] = None,
+) -> dict:
+    """
+    Runs the load test against a server in this process.
+
+    Args:
+        clients: The number of concurrent client connections. Defaults to 8.
+        size: The payload size of each message, in bytes. Defaults to 128.
+        text_ratio: The fraction of messages sent as text. Defaults to 0.5.
+        duration: How long to send messages for, in seconds. Defaults to 5.
+        hooks: Instrumentation given to the server and clients, to measure its cost.
+                Defaults to none.
+
+    Returns:
+        dict: Messages and bytes per second, round trip latency percentiles in
+                milliseconds, CPU seconds used and RSS in bytes
+    """
+    server = WebSocketServer(("127.0.0.1", 0), hooks=hooks)
+    url = f"ws://127.0.0.1:{server.sock.getsockname()[1]}/"
+    serving = threading.Thread(target=server.serve_forever, args=(echo, 0.1))
+    serving.start()
+    connections = connect_many([url] * clients, timeout=None, hooks=hooks)
+    if None in connections:
+        server.shutdown()
+        serving.join()
+        raise ConnectionError("Couldn't open every client connection")
+
+    text = "x" * size
+    binary = os.urandom(size)
+    latencies: list[list[float]] = [[] for _ in connections]
+    deadline = time.perf_counter() + duration
+
+    def client(ws: WebSocket, samples: list[float]) -> None:
+        # Spread text messages evenly instead of at random, so runs are comparable
+        credit = 0.0
+        while time.perf_counter() < deadline:
+            credit += text_ratio
+            start = time.perf_counter()
+            if credit >= 1:
+                credit -= 1
+                ws.send_text(text)
+                ws.recv_text()
+            else:
+                ws.send(binary)
+                ws.recv()
+            samples.append(time.perf_counter() - start)
+
+    cpu_before = resource.getrusage(resource.RUSAGE_SELF)
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=client, args=(ws, samples))
+        for ws, samples in zip(connections, latencies)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    cpu_after = resource.getrusage(resource.RUSAGE_SELF)
+    rss = rss_bytes()
+
+    for ws in connections:
+        ws.conn.shutdown(socket.SHUT_WR)
+        ws.close()
+    server.shutdown()
+    serving.join()
+    server.acceptor.close()
+    server.sock.close()
+
+    samples = sorted(sample for samples in latencies for sample in samples)
+    messages = len(samples)
+    return {
+        "clients": clients,
+        "size": size,
+        "text_ratio": text_ratio,
+        "duration": elapsed,
+        "messages": messages,
+        "messages_per_s": messages / elapsed,
+        # Every message crosses the connection twice, once each way
+        "mb_per_s": messages * size * 2 / elapsed / 1e6,
+        "latency_ms": {
+            "p50": percentile(samples, 0.5) * 1e3,
+            "p99": percentile(samples, 0.99) * 1e3,
+            "p999": percentile(samples, 0.999) * 1e3,
+        },
+        "cpu_s": (cpu_after.ru_utime - cpu_before.ru_utime)
+        + (cpu_after.ru_stime - cpu_before.ru_stime),
+        "rss_bytes": rss,
+    }
+
+
+def run_micro(number: Optional[int] = None) -> dict:
+    """
+    Times the hot paths of framing and the handshake.
+
+    Args:
+        number: How many times to run each benchmark. Defaults to as many as fit in
+                about 0.2 seconds.
+
+    Returns:
+        dict: Nanoseconds per call of each benchmark
+    """
+    frame = Frame(Frame.BINARY, bytes(125), b"\x01\x02\x03\x04")
+    raw_frame = bytes(frame)
+    raw_request = (
+        "GET /chat HTTP/1.1\r\nHost: example.com\r\nUpgrade: websocket\r\n"
+        "Connection: Upgrade\r\nSec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n"
+        "Sec-WebSocket-Version: 13\r\n\r\n"
+    )
+    benchmarks = {
+        "Frame.parse": lambda: Frame.parse(raw_frame),
+        "Frame.__bytes__": lambda: bytes(frame),
+        "Request.parse": lambda: Request.parse(raw_request),
+        "make_sec_ws_accept": lambda: make_sec_ws_accept("dGhlIHNhbXBsZSBub25jZQ=="),
+    }
+    results = {}
+    for name, func in benchmarks.items():
+        timer = timeit.Timer(func)
+        count = number or timer.autorange()[0]
+        best = min(timer.repeat(repeat=3, number=count))
+        results[name] = best / count * 1e9
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(
+        prog="python -m websocket.bench", description=__doc__.strip().splitlines()[0]
+    )
+    parser.add_argument(
+        "suite", nargs="?", choices=("load", "micro", "all"), default="all"
+    )
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--size", type=int, default=128, help="message size in bytes")
+    parser.add_argument(
+        "--text-ratio", type=float, default=0.5, help="fraction of text messages"
+    )
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds of load")
+    parser.add_argument(
+        "--metrics", action="store_true", help="run the load test with `Metrics`"
+    )
+    parser.add_argument(
+        "--number", type=int, help="runs of each microbenchmark, default automatic"
+    )
+    parser.add_argument(
+        "--json", metavar="PATH", help="write results as JSON, - for stdout"
+    )
+    args = parser.parse_args(argv)
+
+    results: dict = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.time(),
+    }
+    if args.suite in ("load", "all"):
+        results["load"] = run_load(
+            args.clients,
+            args.size,
+            args.text_ratio,
+            args.duration,
+            Metrics() if args.metrics else None,
+        )
+    if args.suite in ("micro", "all"):
+        results["micro"] = run_micro(args.number)
+
+    if args.json == "-":
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+        report(results)
+    return results
+
+
+def report(results: dict) -> None:
+    load = results.get("load")
+    if load is not None:
+        latency = load["latency_ms"]
+        print(
+            f"load: {load['clients']} clients, {load['size']} B messages, "
+            f"{load['text_ratio']:.0%} text, {load['duration']:.1f} s"
+        )
+        print(
+            f"  {load['messages_per_s']:,.0f} messages/s, {load['mb_per_s']:.2f} MB/s"
+        )
+        print(
+            f"  round trip p50 {latency['p50']:.3f} ms, p99 {latency['p99']:.3f} ms, "
+            f"p999 {latency['p999']:.3f} ms"
+        )
+        print(f"  CPU {load['cpu_s']:.2f} s, RSS {load['rss_bytes'] / 2**20:.1f} MiB")
+    micro = results.get("micro")
+    if micro is not None:
+        print("micro:")
+        for name, ns in micro.items():
+            print(f"  {name:<20} {ns:10,.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
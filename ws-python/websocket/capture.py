@@ -0,0 +1,447 @@
+"""
+Capture of the frames connections receive into a compact, append-only file, and replay
+of a capture against a server with the original timing, to reproduce production
+traffic offline.
+
+A capture is a magic string followed by one record per event: a fixed size header,
+holding the time since the capture started in nanoseconds, the connection's number in
+the capture, the opcode, the FIN and RSV1 bits and the payload length, then the payload.
+Connections opening and closing are recorded as events too, so a replay opens and
+closes its connections at the same points.
+
+Usage: python -m websocket.capture [info|replay] FILE [URL] [options], see --help
+"""
+
+import argparse, itertools, mmap, random, selectors, socket, struct, threading, time
+from typing import Iterator, Optional
+from websocket import http
+from websocket.frames import Frame
+from websocket.http import HandshakeParser, Request
+from websocket.metrics import Hooks
+from websocket.url import Url
+from websocket.websockets import parse_ws_url, read_handshake, sendmsg_all
+
+MAGIC = b"WSCAP01\n"
+# Time in nanoseconds, connection number, opcode, flags and payload length
+_RECORD = struct.Struct("<QIBBI")
+# Events outside the range of frame opcodes, for connections opening and closing
+OPENED = 0x10
+CLOSED = 0x11
+FIN = 0x1
+RSV1 = 0x2
+# Replayed frames are masked with an all zero key, which leaves payloads unchanged
+_ZERO_KEY = bytes(4)
+# Frames for one connection written together by one `sendmsg` when replaying fast
+_BATCH_BYTES = 65536
+_BATCH_FRAMES = 256
+
+
+class Capture(Hooks):
+    """
+    Hooks recording the frames a sample of connections receive into a capture file, to
+    pass as `hooks` to a `WebSocketServer`. Each connection is sampled once, when its
+    first frame arrives, which is recorded as its opening. Records are appended through
+    an in-memory buffer under a lock, so the cost on a captured connection is a copy of
+    each payload and on others a dictionary lookup.
+
+    Only received frames are recorded, as `on_frame_out` isn't given payloads, which is
+    what a replay needs to drive a server.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        sample: float = 1.0,
+        hooks: Optional[Hooks] = None,
+        buffer_size: int = 1 << 20,
+    ) -> None:
+        """
+        Constructs a new Capture, writing to a new file at `path`, replacing any file
+        already there.
+
+        Args:
+            path: The capture file.
+            sample: The fraction of connections captured, chosen at random.
+                    Defaults to all of them.
+            hooks: Other hooks to call as well, such as a `Metrics`. Defaults to none.
+            buffer_size: The size of the write buffer, in bytes. Defaults to 1 MiB.
+        """
+        self.path = path
+        self.sample = sample
+        self.hooks = hooks
+        self._file = open(path, "wb", buffering=buffer_size)
+        self._file.write(MAGIC)
+        self._connections: dict = {}
+        self._ids = itertools.count()
+        self._start = time.monotonic_ns()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def on_frame_in(self, ws, frame: Frame) -> None:
+        conn = self._connections.get(ws, -1)
+        if conn == -1:
+            conn = self._open(ws)
+        if conn is not None:
+            flags = (FIN if frame.fin else 0) | (RSV1 if frame.rsv1 else 0)
+            self._write(conn, frame.opcode, flags, frame.payload)
+        if self.hooks is not None:
+            self.hooks.on_frame_in(ws, frame)
+
+    def on_frame_out(self, ws, opcode: int, size: int, seconds: float) -> None:
+        if self.hooks is not None:
+            self.hooks.on_frame_out(ws, opcode, size, seconds)
+
+    def on_handshake(self, ws, seconds: float) -> None:
+        # Connections are only sampled from their first frame, so those that never
+        # send one aren't recorded
+        if self.hooks is not None:
+            self.hooks.on_handshake(ws, seconds)
+
+    def on_close(self, ws, code: int) -> None:
+        conn = self._connections.pop(ws, None)
+        if conn is not None:
+            self._write(conn, CLOSED, 0, b"")
+        if self.hooks is not None:
+            self.hooks.on_close(ws, code)
+
+    def flush(self) -> None:
+        """
+        Writes buffered records out to the file.
+        """
+        with self._lock:
+            if not self._closed:
+                self._file.flush()
+
+    def close(self) -> None:
+        """
+        Stops capturing and closes the file. Connections still open are recorded as
+        closed, so a replay closes them too.
+        """
+        for ws, conn in list(self._connections.items()):
+            if conn is not None:
+                self._write(conn, CLOSED, 0, b"")
+        self._connections.clear()
+        with self._lock:
+            self._closed = True
+            self._file.close()
+
+    def _open(self, ws) -> Optional[int]:
+        with self._lock:
+            # Another thread may have sampled the connection meanwhile
+            conn = self._connections.get(ws, -1)
+            if conn != -1:
+                return conn
+            conn = next(self._ids) if random.random() < self.sample else None
+            self._connections[ws] = conn
+        if conn is not None:
+            self._write(conn, OPENED, 0, b"")
+        return conn
+
+    def _write(self, conn: int, opcode: int, flags: int, payload: bytes) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            # Timed under the lock, so records are in time order
+            elapsed = time.monotonic_ns() - self._start
+            self._file.write(_RECORD.pack(elapsed, conn, opcode, flags, len(payload)))
+            self._file.write(payload)
+
+
+class CaptureReader:
+    """
+    Reads a capture file through `mmap`, so payloads are views of the mapped file
+    rather than copies. A record cut short, as by a crash while capturing, ends the
+    capture.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Opens and maps a capture file.
+
+        Raises:
+            ValueError: If the file isn't a capture.
+        """
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[: len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} isn't a capture file")
+
+    def __iter__(self) -> Iterator[tuple[int, int, int, int, memoryview]]:
+        """
+        Yields each record as its time in nanoseconds, connection number, opcode,
+        flags and payload, a view of the file valid until the reader is closed.
+        """
+        unpack = _RECORD.unpack_from
+        size = _RECORD.size
+        end = len(self._map)
+        offset = len(MAGIC)
+        view = memoryview(self._map)
+        try:
+            while offset + size <= end:
+                elapsed, conn, opcode, flags, length = unpack(view, offset)
+                offset += size
+                if offset + length > end:
+                    return
+                yield elapsed, conn, opcode, flags, view[offset : offset + length]
+                offset += length
+        finally:
+            view.release()
+
+    def close(self) -> None:
+        """
+        Unmaps the file. Every payload view must have been released first.
+        """
+        self._map.close()
+
+    def __enter__(self) -> "CaptureReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class _Drain:
+    """
+    Reads and discards whatever a server sends replayed connections, from one
+    background thread, so the server never blocks on them. Connections are closed once
+    the server closes them.
+    """
+
+    def __init__(self) -> None:
+        self._selector = selectors.DefaultSelector()
+        self._buf = bytearray(65536)
+        self._open = 0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, sock: socket.socket) -> None:
+        with self._cond:
+            self._open += 1
+        self._selector.register(sock, selectors.EVENT_READ)
+
+    def wait(self, timeout: float) -> None:
+        """
+        Waits for the server to close every connection, then stops reading.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._open == 0, timeout)
+            self._stopped = True
+        self._thread.join()
+        for key in list(self._selector.get_map().values()):
+            key.fileobj.close()
+        self._selector.close()
+
+    def _run(self) -> None:
+        while not self._stopped:
+            for key, _events in self._selector.select(0.05):
+                sock = key.fileobj
+                try:
+                    nbytes = sock.recv_into(self._buf)
+                except OSError:
+                    nbytes = 0
+                if nbytes == 0:
+                    self._selector.unregister(sock)
+                    sock.close()
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify_all()
+
+
+def _connect(url: Url, extensions: list[str], timeout: float) -> socket.socket:
+    sock = socket.create_connection(url.hostpair(), timeout)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    req = Request.new_ws(url, extensions)
+    sock.sendall(bytes(req))
+    try:
+        res = read_handshake(sock, HandshakeParser(is_request=False))
+    except ValueError:
+        res = None
+    if res is None or not res.is_valid_ws(req.headers[http.HEADER_WS_KEY]):
+        sock.close()
+        raise ConnectionError(f"{url} refused the WebSocket handshake")
+    sock.settimeout(None)
+    return sock
+
+
+def replay(
+    path: str,
+    url: str,
+    speed: Optional[float] = 1.0,
+    extensions: list[str] = [],
+    timeout: float = 3.0,
+) -> dict:
+    """
+    Replays a capture against the server at a `ws://` url: opens a connection for each
+    captured one and sends its frames in order, at the captured times divided by
+    `speed`, or as fast as possible with `speed` None.
+
+    Frames are sent from one thread, masked with an all zero key so payloads go from the
+    mapped file to the socket unchanged, and consecutive frames of a connection that are
+    already due are written with one system call. What the server sends back is read
+    and discarded on another thread. Compressed frames are sent as they were captured,
+    so pass the `extensions` the captured clients negotiated.
+
+    Args:
+        path: The capture file.
+        url: The url of the server to replay against.
+        speed: How many times faster than captured to replay, or None for as fast as
+                possible. Defaults to 1.
+        extensions: The extensions to request in each handshake. Defaults to [].
+        timeout: How long, in seconds, to wait for each handshake, and at the end for
+                the server to close the connections. Defaults to 3.
+
+    Returns:
+        dict: The connections, frames and payload bytes sent, the seconds taken and
+                the frames sent per second
+    """
+    server_url = parse_ws_url(url)
+    sockets: dict[int, socket.socket] = {}
+    drain = _Drain()
+    batch: list = []
+    batch_sock: Optional[socket.socket] = None
+    batch_bytes = 0
+    frames = nbytes = connections = 0
+    origin = None
+    frame = payload = None
+
+    def flush() -> None:
+        nonlocal batch, batch_bytes
+        if batch:
+            try:
+                sendmsg_all(batch_sock, batch)
+            except OSError:
+                pass
+            batch = []
+            batch_bytes = 0
+
+    with CaptureReader(path) as reader:
+        started = time.perf_counter()
+        for elapsed, conn, opcode, flags, payload in reader:
+            # Time starts from the first record, not when the capture was opened
+            if origin is None:
+                origin = elapsed
+            if speed is not None:
+                due = started + (elapsed - origin) / 1e9 / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    flush()
+                    time.sleep(delay)
+            if opcode == OPENED:
+                sockets[conn] = sock = _connect(server_url, extensions, timeout)
+                drain.add(sock)
+                connections += 1
+                continue
+            sock = sockets.get(conn)
+            if sock is None:
+                continue
+            if sock is not batch_sock:
+                flush()
+                batch_sock = sock
+            if opcode == CLOSED:
+                flush()
+                del sockets[conn]
+                try:
+                    sock.shutdown(socket.SHUT_WR)
+                except OSError:
+                    pass
+                continue
+            frame = Frame(
+                opcode, payload, _ZERO_KEY, bool(flags & FIN), bool(flags & RSV1)
+            )
+            batch.append(frame.header())
+            batch.append(payload)
+            batch_bytes += len(payload)
+            frames += 1
+            nbytes += len(payload)
+            if batch_bytes >= _BATCH_BYTES or len(batch) >= 2 * _BATCH_FRAMES:
+                flush()
+        flush()
+        elapsed = time.perf_counter() - started
+        # The reader can only be closed once no view of the file is left
+        frame = payload = None
+    for sock in sockets.values():
+        try:
+            sock.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+    drain.wait(timeout)
+    return {
+        "connections": connections,
+        "frames": frames,
+        "bytes": nbytes,
+        "seconds": elapsed,
+        "frames_per_s": frames / elapsed if elapsed else 0.0,
+    }
+
+
+def info(path: str) -> dict:
+    """
+    Summarizes a capture file.
+
+    Returns:
+        dict: The connections, frames and payload bytes captured, and the seconds from
+                the first record to the last
+    """
+    connections = frames = nbytes = 0
+    last = first = None
+    with CaptureReader(path) as reader:
+        for elapsed, _conn, opcode, _flags, payload in reader:
+            first = elapsed if first is None else first
+            last = elapsed
+            if opcode == OPENED:
+                connections += 1
+            elif opcode != CLOSED:
+                frames += 1
+                nbytes += len(payload)
+            payload.release()
+    return {
+        "connections": connections,
+        "frames": frames,
+        "bytes": nbytes,
+        "seconds": 0.0 if first is None else (last - first) / 1e9,
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(
+        prog="python -m websocket.capture",
+        description="Summarizes or replays a capture file.",
+    )
+    parser.add_argument("command", choices=("info", "replay"))
+    parser.add_argument("path", help="the capture file")
+    parser.add_argument("url", nargs="?", help="the server to replay against")
+    speed = parser.add_mutually_exclusive_group()
+    speed.add_argument(
+        "--speed", type=float, default=1.0, help="times faster than captured"
+    )
+    speed.add_argument("--max", action="store_true", help="replay as fast as possible")
+    parser.add_argument(
+        "--extension", action="append", default=[], help="extension to request"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        result = info(args.path)
+        print(
+            f"{result['connections']} connections, {result['frames']} frames, "
+            f"{result['bytes']:,} bytes over {result['seconds']:.3f} s"
+        )
+        return result
+    if args.url is None:
+        parser.error("replay needs the url of a server")
+    result = replay(
+        args.path, args.url, None if args.max else args.speed, args.extension
+    )
+    print(
+        f"{result['connections']} connections, {result['frames']} frames, "
+        f"{result['bytes']:,} bytes in {result['seconds']:.3f} s, "
+        f"{result['frames_per_s']:,.0f} frames/s"
+    )
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Codecs turning objects into messages and back for `WebSocket.send_obj()` and
+`recv_obj()`, each named for the subprotocol it is negotiated as in the opening
+handshake.
+
+JSON is encoded and parsed with orjson when it is installed, straight from and to the
+UTF-8 bytes of the message, and otherwise with the standard library. msgpack is only
+available when the msgpack package is installed.
+"""
+
+import json
+from typing import Any, Callable, Optional
+from websocket.frames import Frame
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class Codec:
+    """
+    Encodes objects into message payloads and decodes them back, for the subprotocol
+    `name`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        opcode: int,
+        encode: Callable[[Any], bytes],
+        decode: Callable[[str | bytes], Any],
+    ) -> None:
+        """
+        Constructs a new Codec, call `register()` to negotiate it.
+
+        Args:
+            name: The subprotocol sent in the Sec-WebSocket-Protocol header.
+            opcode: The kind of message objects are sent as, `Frame.TEXT` or
+                    `Frame.BINARY`.
+            encode: Gives the payload of the message for an object.
+            decode: Gives the object from a received message, which is `bytes`, or
+                    `RawText` for text messages. Raises ValueError if the message is
+                    malformed.
+        """
+        self.name = name
+        self.opcode = opcode
+        self.encode = encode
+        self.decode = decode
+
+
+def _json_encode(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _orjson_decode(data: str | bytes) -> Any:
+    # orjson only takes exact bytes, so subclasses like RawText are passed as views
+    return orjson.loads(memoryview(data) if isinstance(data, bytes) else data)
+
+
+def _raw_decode(data: str | bytes) -> bytes:
+    return data.encode() if isinstance(data, str) else data
+
+
+def _binary_only(decode: Callable[[bytes], Any]) -> Callable[[str | bytes], Any]:
+    def decode_binary(data: str | bytes) -> Any:
+        if isinstance(data, str):
+            raise ValueError("Expected a binary message, got text")
+        return decode(data)
+
+    return decode_binary
+
+
+JSON = Codec(
+    "json",
+    Frame.TEXT,
+    _json_encode if orjson is None else orjson.dumps,
+    json.loads if orjson is None else _orjson_decode,
+)
+RAW = Codec("raw", Frame.BINARY, bytes, _raw_decode)
+MSGPACK = (
+    None
+    if msgpack is None
+    else Codec("msgpack", Frame.BINARY, msgpack.packb, _binary_only(msgpack.unpackb))
+)
+
+_codecs: dict[str, Codec] = {}
+
+
+def register(codec: Codec) -> None:
+    """
+    Makes a codec available to negotiate as a subprotocol, replacing any registered
+    with the same name.
+    """
+    _codecs[codec.name] = codec
+
+
+def get(name: Optional[str]) -> Optional[Codec]:
+    """
+    Gives the codec registered for a subprotocol, or None if there is none.
+    """
+    return _codecs.get(name)
+
+
+register(JSON)
+register(RAW)
+if MSGPACK is not None:
+    register(MSGPACK)
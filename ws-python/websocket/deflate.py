@@ -0,0 +1,293 @@
+"""
+The permessage-deflate extension from RFC 7692, compressing each message with zlib.
+"""
+
+import zlib
+from typing import Optional
+
+NAME = "permessage-deflate"
+# Every message compressed with a sync flush ends with these bytes, which RFC 7692
+# has the sender strip and the receiver put back
+_TAIL = b"\x00\x00\xff\xff"
+
+
+class PerMessageDeflate:
+    """
+    The settings of permessage-deflate, and once negotiated, the zlib contexts compressing
+    and decompressing the messages of one connection.
+    """
+
+    def __init__(
+        self,
+        server_max_window_bits: int = 15,
+        client_max_window_bits: int = 15,
+        server_no_context_takeover: bool = False,
+        client_no_context_takeover: bool = False,
+        threshold: int = 128,
+        level: int = 6,
+    ) -> None:
+        """
+        Constructs new permessage-deflate settings, passed to `WebSocket.connect()` or
+        `WebSocketServer` in `extensions`. Passing the name "permessage-deflate" instead
+        uses the defaults.
+
+        Args:
+            server_max_window_bits: The log2 of the LZ77 window the server compresses
+                    with, 9 to 15. Defaults to 15.
+            client_max_window_bits: The log2 of the LZ77 window the client compresses
+                    with, 9 to 15. Defaults to 15.
+            server_no_context_takeover: Have the server reset its compressor after each
+                    message, trading compression for memory. Defaults to False.
+            client_no_context_takeover: Have the client reset its compressor after each
+                    message. Defaults to False.
+            threshold: Messages smaller than this many bytes are sent uncompressed.
+                    Defaults to 128.
+            level: The zlib compression level, 0 to 9. Defaults to 6.
+        """
+        self.server_max_window_bits = server_max_window_bits
+        self.client_max_window_bits = client_max_window_bits
+        self.server_no_context_takeover = server_no_context_takeover
+        self.client_no_context_takeover = client_no_context_takeover
+        self.threshold = threshold
+        self.level = level
+        self.is_server = False
+        self._compressor = None
+        self._decompressor = None
+
+    def offer(self) -> str:
+        """
+        Formats the client's offer for the Sec-WebSocket-Extensions header.
+        """
+        params = [NAME, "client_max_window_bits"]
+        if self.server_max_window_bits < 15:
+            params.append(f"server_max_window_bits={self.server_max_window_bits}")
+        if self.server_no_context_takeover:
+            params.append("server_no_context_takeover")
+        if self.client_no_context_takeover:
+            params.append("client_no_context_takeover")
+        return "; ".join(params)
+
+    def accept(
+        self, offers: list[dict[str, Optional[str]]]
+    ) -> Optional[tuple["PerMessageDeflate", str]]:
+        """
+        Picks the first acceptable offer from a client, on the server side.
+
+        Args:
+            offers: The parameters of each permessage-deflate offer in the request.
+
+        Returns:
+            (PerMessageDeflate, str) | None: The settings for the connection and the
+                    response for the Sec-WebSocket-Extensions header, or `None` if no
+                    offer is acceptable
+        """
+        for params in offers:
+            try:
+                server_bits = _window_bits(params, "server_max_window_bits")
+                client_bits = _window_bits(params, "client_max_window_bits")
+            except ValueError:
+                continue
+            # zlib can't compress raw deflate streams with an 8 bit window
+            if server_bits == 8 or set(params) - _PARAMS:
+                continue
+            ext = self._negotiated(True)
+            ext.server_max_window_bits = min(
+                server_bits or 15, self.server_max_window_bits
+            )
+            ext.server_no_context_takeover |= "server_no_context_takeover" in params
+            ext.client_no_context_takeover |= "client_no_context_takeover" in params
+            response = [NAME]
+            if ext.server_no_context_takeover:
+                response.append("server_no_context_takeover")
+            if ext.client_no_context_takeover:
+                response.append("client_no_context_takeover")
+            if ext.server_max_window_bits < 15:
+                response.append(f"server_max_window_bits={ext.server_max_window_bits}")
+            if "client_max_window_bits" in params:
+                ext.client_max_window_bits = min(
+                    client_bits or 15, self.client_max_window_bits
+                )
+                if ext.client_max_window_bits < 15:
+                    response.append(
+                        f"client_max_window_bits={ext.client_max_window_bits}"
+                    )
+            else:
+                ext.client_max_window_bits = 15
+            return ext, "; ".join(response)
+        return None
+
+    def confirm(self, params: dict[str, Optional[str]]) -> "PerMessageDeflate":
+        """
+        Applies the server's response to the client's offer, on the client side.
+
+        Args:
+            params: The parameters of permessage-deflate in the response.
+
+        Returns:
+            PerMessageDeflate: The settings for the connection
+
+        Raises:
+            ValueError: If the response has parameters the client didn't allow, or
+                    limits the client to an 8 bit window, which zlib can't compress
+                    with.
+        """
+        if set(params) - _PARAMS:
+            raise ValueError(f"Unknown {NAME} parameters in response: {params}")
+        client_bits = _window_bits(params, "client_max_window_bits")
+        if client_bits == 8:
+            raise ValueError(f"Unsupported client_max_window_bits: {client_bits}")
+        ext = self._negotiated(False)
+        ext.server_max_window_bits = (
+            _window_bits(params, "server_max_window_bits") or 15
+        )
+        ext.client_max_window_bits = min(
+            client_bits or 15, self.client_max_window_bits
+        )
+        ext.server_no_context_takeover = "server_no_context_takeover" in params
+        ext.client_no_context_takeover |= "client_no_context_takeover" in params
+        return ext
+
+    def compress(self, payload: bytes) -> bytes:
+        """
+        Compresses a whole message.
+        """
+        return self.compress_fragment(payload, fin=True)
+
+    def compress_fragment(self, data: bytes, fin: bool) -> bytes:
+        """
+        Compresses the next fragment of a message, resetting the compressor at the end
+        of the message if context takeover is off.
+
+        Args:
+            data: The uncompressed fragment.
+            fin: Whether this is the last fragment of the message.
+        """
+        if self._compressor is None:
+            bits = (
+                self.server_max_window_bits
+                if self.is_server
+                else self.client_max_window_bits
+            )
+            self._compressor = zlib.compressobj(self.level, zlib.DEFLATED, -bits)
+        compressor = self._compressor
+        out = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if fin:
+            if out.endswith(_TAIL):
+                out = out[:-4]
+            if self._resets(self.is_server):
+                self._compressor = None
+        return out
+
+    def decompress(self, payload: bytes, max_size: Optional[int] = None) -> bytes:
+        """
+        Decompresses a whole message.
+
+        Raises:
+            zlib.error: If the payload isn't valid deflate data.
+            OverflowError: If the message decompresses to more than `max_size` bytes.
+        """
+        return self.decompress_fragment(payload, True, max_size)
+
+    def decompress_fragment(
+        self, data: bytes | memoryview, fin: bool, max_size: Optional[int] = None
+    ) -> bytes:
+        """
+        Decompresses the next fragment of a message.
+
+        Args:
+            data: The compressed fragment, any bytes-like object.
+            fin: Whether this is the last fragment of the message.
+            max_size: The most bytes the fragment may decompress to.
+
+        Raises:
+            zlib.error: If the data isn't valid deflate data.
+            OverflowError: If the fragment decompresses to more than `max_size` bytes.
+        """
+        if self._decompressor is None:
+            self._decompressor = zlib.decompressobj(-15)
+        if fin:
+            data = b"".join((data, _TAIL))
+        limit = 0 if max_size is None else max_size + 1
+        out = self._decompressor.decompress(data, limit)
+        if self._decompressor.unconsumed_tail:
+            raise OverflowError("Message decompresses to more than the size limit")
+        if max_size is not None and len(out) > max_size:
+            raise OverflowError("Message decompresses to more than the size limit")
+        if fin and self._resets(not self.is_server):
+            self._decompressor = None
+        return out
+
+    def _resets(self, server_side: bool) -> bool:
+        if server_side:
+            return self.server_no_context_takeover
+        return self.client_no_context_takeover
+
+    def _negotiated(self, is_server: bool) -> "PerMessageDeflate":
+        ext = PerMessageDeflate(
+            self.server_max_window_bits,
+            self.client_max_window_bits,
+            self.server_no_context_takeover,
+            self.client_no_context_takeover,
+            self.threshold,
+            self.level,
+        )
+        ext.is_server = is_server
+        return ext
+
+
+_PARAMS = {
+    "server_max_window_bits",
+    "client_max_window_bits",
+    "server_no_context_takeover",
+    "client_no_context_takeover",
+}
+
+
+def _window_bits(params: dict[str, Optional[str]], name: str) -> Optional[int]:
+    value = params.get(name)
+    if value is None:
+        return None
+    bits = int(value.strip('"'))
+    if not 8 <= bits <= 15:
+        raise ValueError(f"Invalid {name}: {bits}")
+    return bits
+
+
+def parse_extensions(header: str) -> list[tuple[str, dict[str, Optional[str]]]]:
+    """
+    Parses a Sec-WebSocket-Extensions header into each extension's name and parameters.
+
+    Args:
+        header: The header value, such as "permessage-deflate; client_max_window_bits"
+
+    Returns:
+        list[tuple[str, dict[str, str | None]]]: The name and parameters of each
+                extension, parameters without a value map to `None`
+    """
+    extensions = []
+    for item in header.split(","):
+        parts = [part.strip() for part in item.split(";")]
+        if not parts[0]:
+            continue
+        params: dict[str, Optional[str]] = {}
+        for part in parts[1:]:
+            if "=" in part:
+                key, val = part.split("=", 1)
+                params[key.strip()] = val.strip()
+            elif part:
+                params[part] = None
+        extensions.append((parts[0], params))
+    return extensions
+
+
+def find_config(extensions: list) -> Optional[PerMessageDeflate]:
+    """
+    Finds permessage-deflate settings in the `extensions` given to a `WebSocket` or
+    `WebSocketServer`, either as a `PerMessageDeflate` or by name.
+    """
+    for ext in extensions:
+        if isinstance(ext, PerMessageDeflate):
+            return ext
+        if ext == NAME:
+            return PerMessageDeflate()
+    return None
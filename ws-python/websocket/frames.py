@@ -0,0 +1,429 @@
+import struct
+from typing import Iterator, Optional
+from websocket.mask import apply_mask, mask as mask_payload
+
+_HEADER = struct.Struct("!BB")
+_HEADER_16 = struct.Struct("!BBH")
+_HEADER_64 = struct.Struct("!BBQ")
+_LENGTH_16 = struct.Struct("!H")
+_LENGTH_64 = struct.Struct("!Q")
+_NO_MASK = bytes()
+# Masked payloads up to this size are unmasked into a new copy in one step, larger ones
+# are unmasked in place in the receive buffer first
+_UNMASK_COPY = 16384
+# The most free space `FrameDecoder.get_buffer` makes for the rest of a frame at once,
+# so the receive buffer grows with the payload that arrives, not the length announced
+_GROW_SIZE = 65536
+# RFC 6455 limits 64 bit payload lengths to 63 bits
+_MAX_LENGTH = 2**63 - 1
+
+
+class Frame:
+    """
+    A single WebSocket frame. Frames are created for every message sent and received,
+    so they keep their fields in slots rather than an instance dict.
+    """
+
+    __slots__ = ("opcode", "payload", "mask", "fin", "rsv1", "rsv2", "rsv3")
+
+    CONTINUE = 0x0
+    TEXT = 0x1
+    BINARY = 0x2
+    CLOSE = 0x8
+    PING = 0x9
+    PONG = 0xA
+
+    def __init__(
+        self,
+        opcode: int,
+        payload: bytes,
+        mask: bytes = bytes([]),
+        fin: bool = True,
+        rsv1: bool = False,
+        rsv2: bool = False,
+        rsv3: bool = False,
+    ) -> None:
+        """
+        Constructs a new Frame object.
+
+        Args:
+            opcode (int): The opcode specifying the kind of message, use one of the Frame
+                    constants such as `Frame.TEXT`
+            payload (bytes): The data contained by this frame, or a memoryview
+            mask (bytes): The mask key, either an empty `bytes` object if not masking or a
+                    `bytes` object of length 4
+            fin (bool): Whether this is the final fragment of its message, defaults to True
+            rsv1 (bool): The first reserved bit, set on compressed messages by
+                    permessage-deflate, defaults to False
+            rsv2 (bool): The second reserved bit, defaults to False
+            rsv3 (bool): The third reserved bit, defaults to False
+        """
+        self.opcode = opcode
+        self.payload = payload
+        self.mask = mask
+        self.fin = fin
+        self.rsv1 = rsv1
+        self.rsv2 = rsv2
+        self.rsv3 = rsv3
+
+    @staticmethod
+    def parse(raw_frame: bytes) -> Optional["Frame"]:
+        """
+        Parses a binary frame into a Frame object
+
+        Args:
+            raw_frame (bytes): The binary frame received from a websocket connection
+
+        Returns:
+            Frame | None: The first frame in `raw_frame`, or `None` if `raw_frame` does
+                    not yet hold a complete frame
+
+
+        Raises:
+            ProtocolError: If the frame breaks RFC 6455
+        """
+        decoded = _decode_frame(raw_frame, 0, len(raw_frame))
+        if decoded is None:
+            return None
+        return decoded[0]
+
+    @property
+    def length(self) -> int:
+        """
+        The length of the payload, in bytes
+        """
+        return len(self.payload)
+
+    @property
+    def is_masked(self) -> bool:
+        """
+        Whether the payload is masked, as every frame sent by a client must be
+        """
+        return len(self.mask) != 0
+
+    def header(self) -> bytes:
+        """
+        Packs the frame header, that is everything in the frame before the payload
+
+        Returns:
+            bytes: The header, including the extended length and mask key
+        """
+        first = (0b1000_0000 if self.fin else 0) | self.opcode
+        if self.rsv1:
+            first |= 0b0100_0000
+        if self.rsv2:
+            first |= 0b0010_0000
+        if self.rsv3:
+            first |= 0b0001_0000
+        key = self.mask
+        mask = 0b1000_0000 if key else 0
+        length = len(self.payload)
+        if length >= 65536:
+            header = _HEADER_64.pack(first, mask | 127, length)
+        elif length > 125:
+            header = _HEADER_16.pack(first, mask | 126, length)
+        else:
+            header = _HEADER.pack(first, mask | length)
+        if key:
+            return header + key
+        return header
+
+    def buffers(self) -> list[bytes | bytearray]:
+        """
+        Gives the frame as separate header and payload buffers, ready to be sent with
+        `socket.sendmsg`. Unmasked payloads are passed through without being copied.
+
+        Returns:
+            list[bytes | bytearray]: The header followed by the payload
+        """
+        if self.mask:
+            return [self.header(), mask_payload(self.payload, self.mask)]
+        return [self.header(), self.payload]
+
+    def __bytes__(self) -> bytes:
+        """
+        Converts the frame to a byte array to be sent over the network
+
+        Returns:
+            bytes: The finalized bytes
+        """
+        return b"".join(self.buffers())
+
+
+def _parse_header(buf, start: int, end: int) -> Optional[tuple[int, int]]:
+    """
+    Reads the header of the frame starting at `buf[start]`.
+
+    Returns:
+        (int, int) | None: The size of the header and the length of the payload, or
+                `None` if the header is not complete yet
+    """
+    if end - start < 2:
+        return None
+    length = buf[start + 1] & 0b0111_1111
+    header = 6 if buf[start + 1] & 0b1000_0000 else 2
+    if length == 126:
+        if end - start < 4:
+            return None
+        (length,) = _LENGTH_16.unpack_from(buf, start + 2)
+        header += 2
+    elif length == 127:
+        if end - start < 10:
+            return None
+        (length,) = _LENGTH_64.unpack_from(buf, start + 2)
+        header += 8
+    return header, length
+
+
+def _decode_frame(
+    buf, start: int, end: int, view_size: int = 0
+) -> Optional[tuple[Frame, int]]:
+    """
+    Decodes a single frame from `buf[start:end]`. Unmasked payloads of up to
+    `view_size` bytes are memoryview slices of `buf` rather than copies.
+
+    Returns:
+        (Frame, int) | None: The frame and the index just past its last byte, or `None`
+                if the frame is not complete yet
+
+    Raises:
+        ProtocolError: If the header breaks RFC 6455, checked before the payload arrives
+    """
+    available = end - start
+    if available < 2:
+        return None
+    first, second = _HEADER.unpack_from(buf, start)
+    length = second & 0b0111_1111
+    opcode = first & 0b0000_1111
+    if first & 0b0011_0000:
+        raise ProtocolError("RSV2 or RSV3 set without a negotiated extension")
+    if opcode & 0b1000:
+        if opcode > Frame.PONG:
+            raise ProtocolError(f"Reserved control opcode {opcode:#x}")
+        if length > 125:
+            raise ProtocolError("Control frame payload longer than 125 bytes")
+        if not first & 0b1000_0000:
+            raise ProtocolError("Fragmented control frame")
+    elif opcode > Frame.BINARY:
+        raise ProtocolError(f"Reserved data opcode {opcode:#x}")
+    if length < 126:
+        idx = start + 2
+    elif length == 126:
+        if available < 4:
+            return None
+        length = _HEADER_16.unpack_from(buf, start)[2]
+        idx = start + 4
+    else:
+        if available < 10:
+            return None
+        length = _HEADER_64.unpack_from(buf, start)[2]
+        if length > _MAX_LENGTH:
+            raise ProtocolError("Payload length has its most significant bit set")
+        idx = start + 10
+    masked = second & 0b1000_0000
+    if masked:
+        idx += 4
+    stop = idx + length
+    if stop > end:
+        return None
+    if masked:
+        mask = bytes(buf[idx - 4 : idx])
+        if length <= _UNMASK_COPY:
+            payload = mask_payload(memoryview(buf)[idx:stop], mask)
+        else:
+            with memoryview(buf) as view:
+                if view.readonly:
+                    payload = bytearray(view[idx:stop])
+                    apply_mask(payload, mask)
+                else:
+                    apply_mask(view[idx:stop], mask)
+                    payload = bytes(view[idx:stop])
+    else:
+        mask = _NO_MASK
+        if length <= view_size:
+            payload = memoryview(buf)[idx:stop]
+        else:
+            payload = bytes(memoryview(buf)[idx:stop])
+    return (
+        Frame(
+            opcode,
+            payload,
+            mask,
+            first & 0b1000_0000 != 0,
+            first & 0b0100_0000 != 0,
+            first & 0b0010_0000 != 0,
+            first & 0b0001_0000 != 0,
+        ),
+        stop,
+    )
+
+
+def _frame_size(buf, start: int, end: int) -> int:
+    """
+    Gives the total size of the frame starting at `buf[start]`, or the size of the
+    longest possible header if not enough of the header has arrived to know.
+    """
+    parsed = _parse_header(buf, start, end)
+    if parsed is None:
+        return 14
+    return parsed[0] + parsed[1]
+
+
+class FrameTooLarge(ValueError):
+    """
+    Raised when a frame's header announces a payload larger than allowed, or when a
+    fragmented message grows larger than allowed.
+    """
+
+
+class ProtocolError(ValueError):
+    """
+    Raised when the peer sends frames that break RFC 6455, such as a continuation frame
+    with no message to continue.
+    """
+
+
+class InvalidText(ProtocolError):
+    """
+    Raised when a text message, or a close frame's reason, isn't valid UTF-8.
+    """
+
+
+class FrameDecoder:
+    """
+    Incrementally decodes the byte stream of a WebSocket connection into `Frame`s.
+
+    Bytes are read straight into a reusable receive buffer with `get_buffer` and
+    `buffer_updated` (matching `socket.recv_into` and `asyncio.BufferedProtocol`), or
+    copied in with `feed`. Every complete frame is then available from `frames`, no
+    matter how the stream was split into reads.
+    """
+
+    def __init__(
+        self,
+        bufsize: int = 65536,
+        min_read: int = 4096,
+        max_size: Optional[int] = None,
+        view_size: int = 0,
+        masked: Optional[bool] = None,
+    ) -> None:
+        """
+        Constructs a new FrameDecoder.
+
+        Args:
+            bufsize: The initial size of the receive buffer. Defaults to 65536.
+            min_read: The least free space `get_buffer` will hand out. Defaults to 4096.
+            max_size: The largest payload accepted, checked as soon as the header
+                    arrives so oversized frames are never buffered. Defaults to no limit.
+            view_size: Unmasked payloads of up to this many bytes are given as
+                    memoryview slices of the receive buffer instead of `bytes` copies.
+                    They are only valid until more data is received, so must be
+                    copied to be kept. Defaults to 0, always copying.
+            masked: Whether every frame must be masked, True for a server reading
+                    from clients and False for a client reading from a server.
+                    Defaults to None, accepting both.
+        """
+        self._buf = bytearray(bufsize)
+        self._start = 0
+        self._end = 0
+        self.min_read = min_read
+        self.max_size = max_size
+        self.view_size = view_size
+        self.masked = masked
+
+    @property
+    def pending(self) -> int:
+        """
+        The number of bytes received but not yet decoded into a frame
+        """
+        return self._end - self._start
+
+    def get_buffer(self, sizehint: int = -1) -> memoryview:
+        """
+        Gives a writable view of the free space at the end of the receive buffer. After
+        writing to it, call `buffer_updated` with the number of bytes written.
+
+        Args:
+            sizehint: The minimum free space wanted, defaults to enough for the frame
+                    currently being received, up to 64 KiB at a time.
+
+        Returns:
+            memoryview: The free space in the receive buffer
+        """
+        rest = _frame_size(self._buf, self._start, self._end) - self.pending
+        wanted = max(sizehint, self.min_read, min(rest, _GROW_SIZE))
+        if len(self._buf) - self._end < wanted:
+            self._make_room(wanted)
+        return memoryview(self._buf)[self._end :]
+
+    def buffer_updated(self, nbytes: int) -> None:
+        """
+        Marks `nbytes` bytes written to the view from `get_buffer` as received.
+        """
+        self._end += nbytes
+
+    def feed(self, data: bytes) -> None:
+        """
+        Copies received bytes into the receive buffer.
+        """
+        with self.get_buffer(len(data)) as view:
+            view[: len(data)] = data
+        self.buffer_updated(len(data))
+
+    def next_frame(self) -> Optional[Frame]:
+        """
+        Decodes the next frame from the receive buffer.
+
+        Returns:
+            Frame | None: The next complete frame, or `None` if it hasn't fully arrived
+
+        Raises:
+            FrameTooLarge: If the next frame is larger than `max_size`.
+            ProtocolError: If the next frame's header breaks RFC 6455, or its mask bit
+                    isn't the one `masked` requires.
+        """
+        masked = self.masked
+        if (
+            masked is not None
+            and self._end - self._start >= 2
+            and (self._buf[self._start + 1] & 0b1000_0000 != 0) != masked
+        ):
+            sender = "client" if masked else "server"
+            raise ProtocolError(f"Wrong mask bit on a frame from the {sender}")
+        decoded = _decode_frame(self._buf, self._start, self._end, self.view_size)
+        max_size = self.max_size
+        if decoded is None:
+            if max_size is not None:
+                parsed = _parse_header(self._buf, self._start, self._end)
+                if parsed is not None and parsed[1] > max_size:
+                    self._too_large(parsed[1])
+            return None
+        frame, end = decoded
+        if max_size is not None and len(frame.payload) > max_size:
+            self._too_large(len(frame.payload))
+        self._start = end
+        if self._start == self._end:
+            self._start = self._end = 0
+        return frame
+
+    def frames(self) -> Iterator[Frame]:
+        """
+        Yields every complete frame in the receive buffer.
+        """
+        while (frame := self.next_frame()) is not None:
+            yield frame
+
+    def _too_large(self, length: int) -> None:
+        raise FrameTooLarge(
+            f"Frame of {length} bytes exceeds the limit of {self.max_size}"
+        )
+
+    def _make_room(self, wanted: int) -> None:
+        pending = self.pending
+        if len(self._buf) - pending >= wanted:
+            self._buf[:pending] = self._buf[self._start : self._end]
+        else:
+            buf = bytearray(max(pending + wanted, 2 * len(self._buf)))
+            buf[:pending] = self._buf[self._start : self._end]
+            self._buf = buf
+        self._start, self._end = 0, pending
@@ -1,6 +1,7 @@
 import hashlib, os
 from base64 import b64encode, b64decode
-from typing import Optional
+from collections.abc import Mapping, MutableMapping
+from typing import Iterator, Optional
 
 HEADER_WS_VERSION = "Sec-WebSocket-Version"
 HEADER_WS_KEY = "Sec-WebSocket-Key"
@@ -8,64 +9,229 @@ HEADER_WS_ACCEPT = "Sec-WebSocket-Accept"
 HEADER_WS_PROTOCOL = "Sec-WebSocket-Protocol"
 HEADER_WS_EXTENSIONS = "Sec-WebSocket-Extensions"
 
+# The largest opening handshake accepted, in bytes
+MAX_HANDSHAKE_SIZE = 8192
+# The most header lines accepted in an opening handshake
+MAX_HEADERS = 100
+
+
+class Headers(MutableMapping):
+    """
+    HTTP headers, looked up regardless of the case of their names. A header may appear
+    more than once; indexing joins its values with ", " as allowed by RFC 7230 section
+    3.2.2, and `get_all()` gives them one by one.
+    """
+
+    def __init__(self, headers: Mapping[str, str] | Iterator = ()) -> None:
+        """
+        Constructs new Headers.
+
+        Args:
+            headers: A mapping, or (name, value) pairs with names possibly repeated.
+        """
+        self._headers: dict[str, tuple[str, list[str]]] = {}
+        if isinstance(headers, Headers):
+            headers = headers.multi_items()
+        elif isinstance(headers, Mapping):
+            headers = headers.items()
+        for name, value in headers:
+            self.add(name, value)
+
+    def add(self, name: str, value: str) -> None:
+        """
+        Adds a value to a header, keeping any it already has.
+        """
+        entry = self._headers.get(name.lower())
+        if entry is None:
+            self._headers[name.lower()] = (name, [value])
+        else:
+            entry[1].append(value)
+
+    def get_all(self, name: str) -> list[str]:
+        """
+        Gives every value of a header in the order they were added, or an empty list.
+        """
+        entry = self._headers.get(name.lower())
+        return [] if entry is None else list(entry[1])
+
+    def multi_items(self) -> Iterator[tuple[str, str]]:
+        """
+        Iterates over (name, value) pairs, once for each value of each header.
+        """
+        for name, values in self._headers.values():
+            for value in values:
+                yield name, value
+
+    def __getitem__(self, name: str) -> str:
+        return ", ".join(self._headers[name.lower()][1])
+
+    def __setitem__(self, name: str, value: str) -> None:
+        self._headers[name.lower()] = (name, [value])
+
+    def __delitem__(self, name: str) -> None:
+        del self._headers[name.lower()]
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and name.lower() in self._headers
+
+    def __iter__(self) -> Iterator[str]:
+        return (name for name, _values in self._headers.values())
+
+    def __len__(self) -> int:
+        return len(self._headers)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        other = other if isinstance(other, Headers) else Headers(other)
+        return {key: values for key, (_name, values) in self._headers.items()} == {
+            key: values for key, (_name, values) in other._headers.items()
+        }
+
+    def __repr__(self) -> str:
+        return f"Headers({list(self.multi_items())})"
+
+
+class HandshakeParser:
+    """
+    Parses the head of an HTTP request or response incrementally from bytes, as they
+    arrive from the socket, so a handshake split across reads is put back together.
+    Anything after the blank line ending the head, such as the first frames of the
+    connection, is kept in `leftover`.
+    """
+
+    def __init__(
+        self,
+        is_request: bool,
+        max_size: Optional[int] = MAX_HANDSHAKE_SIZE,
+        max_headers: int = MAX_HEADERS,
+    ) -> None:
+        """
+        Constructs a new HandshakeParser.
+
+        Args:
+            is_request: Whether to parse a request, on the server side, or a response.
+            max_size: The largest head accepted, in bytes, None for no limit. Defaults
+                    to `MAX_HANDSHAKE_SIZE`.
+            max_headers: The most header lines accepted. Defaults to `MAX_HEADERS`.
+        """
+        self.is_request = is_request
+        self.max_size = max_size
+        self.max_headers = max_headers
+        self.leftover = bytes()
+        self._buf = bytearray()
+
+    def feed(self, data: bytes) -> Optional["Request | Response"]:
+        """
+        Adds bytes received from the socket.
+
+        Args:
+            data: The bytes received.
+
+        Returns:
+            Request | Response | None: The parsed head once it is complete, `None` while
+                    more bytes are needed
+
+        Raises:
+            ValueError: If the head is malformed or larger than the limits.
+        """
+        search_from = max(0, len(self._buf) - 3)
+        self._buf += data
+        end = self._buf.find(b"\r\n\r\n", search_from)
+        if self.max_size is not None and (
+            len(self._buf) if end == -1 else end + 4
+        ) > self.max_size:
+            raise ValueError(f"Handshake larger than {self.max_size} bytes")
+        if end == -1:
+            return None
+        self.leftover = bytes(self._buf[end + 4 :])
+        head = bytes(self._buf[:end])
+        self._buf = bytearray()
+        start, headers = _parse_head(head, self.max_headers)
+        if self.is_request:
+            return _parse_request_line(start, headers)
+        return _parse_status_line(start, headers)
+
+
+def _parse_head(head: bytes, max_headers: int) -> tuple[str, Headers]:
+    lines = head.decode("latin-1").split("\r\n")
+    if len(lines) - 1 > max_headers:
+        raise ValueError(f"More than {max_headers} headers")
+    headers = Headers()
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if not sep or not name or name[-1] in " \t" or line[0] in " \t":
+            raise ValueError(f"Invalid Header format: {line}")
+        headers.add(name, value.strip(" \t"))
+    return lines[0], headers
+
+
+def _parse_request_line(line: str, headers: Headers) -> "Request":
+    try:
+        method, url, proto = line.split(" ")
+    except ValueError:
+        raise ValueError(f"Invalid first line of request: {line}")
+    if proto != "HTTP/1.1" and proto != "HTTP/1.0":
+        raise ValueError("Invalid HTTP protocol specified by request")
+    return Request(method, url, headers)
+
+
+def _parse_status_line(line: str, headers: Headers) -> "Response":
+    try:
+        proto, status = line.split(" ", 1)
+    except ValueError:
+        raise ValueError(f"Invalid first line of response: {line}")
+    if not proto.startswith("HTTP/"):
+        raise ValueError(f"Invalid first line of response: {line}")
+    return Response(status, headers)
+
 
 class Request:
     def __init__(
         self,
         method: str = "GET",
         url: str = "/",
-        headers: dict[str, str] = {},
+        headers: Mapping[str, str] = {},
         body: str = "",
     ) -> None:
         self.method: str = method
         self.url: str = url
-        self.headers: dict[str, str] = headers
+        self.headers: Headers = (
+            headers if isinstance(headers, Headers) else Headers(headers)
+        )
         self._body = ""
         self._set_body(body)
 
     @staticmethod
     def parse(raw_request: str) -> "Request":
-        lines = raw_request.split("\r\n")
-        try:
-            lines, body_splits = lines[: lines.index("")], lines[lines.index("") + 1 :]
-        except ValueError:
+        parser = HandshakeParser(is_request=True, max_size=None)
+        req = parser.feed(raw_request.encode("utf-8"))
+        if req is None:
             raise ValueError("No trailing line after headers")
-        body = "\r\n".join(body_splits)
-        try:
-            method, url, proto = lines[0].split(" ")
-        except (ValueError, IndexError):
-            raise ValueError(f"Invalid first line of request: {lines[0]}")
-        if proto != "HTTP/1.1" and proto != "HTTP/1.0":
-            raise ValueError("Invalid HTTP protocol specified by request")
-        headers = {}
-        for header_pair in lines[1:]:
-            try:
-                key, val = header_pair.split(": ")
-                headers[key] = val
-            except ValueError:
-                raise ValueError(f"Invalid Header format: {header_pair}")
-        return Request(method, url, headers, body)
+        req.body = parser.leftover.decode("utf-8")
+        return req
 
     @staticmethod
-    def new_ws(url):
-        return Request(
-            "GET",
-            url.path,
-            headers={
-                "Host": url.host,
-                "Upgrade": "websocket",
-                "Connection": "Upgrade",
-                HEADER_WS_KEY: new_sec_ws_key(),
-                HEADER_WS_VERSION: "13",
-            },
-        )
+    def new_ws(url, extensions: list[str] = [], protocols: list[str] = []):
+        headers = {
+            "Host": url.host,
+            "Upgrade": "websocket",
+            "Connection": "Upgrade",
+            HEADER_WS_KEY: new_sec_ws_key(),
+            HEADER_WS_VERSION: "13",
+        }
+        if protocols:
+            headers[HEADER_WS_PROTOCOL] = ", ".join(protocols)
+        if extensions:
+            headers[HEADER_WS_EXTENSIONS] = ", ".join(extensions)
+        return Request("GET", url.path, headers=headers)
 
     def is_valid_ws(self):
         return (
             self.method == "GET"
             and self.headers.get("Host") != None
-            and self.headers.get("Upgrade") == "websocket"
-            and self.headers.get("Connection") == "Upgrade"
+            and has_token(self.headers, "Upgrade", "websocket")
+            and has_token(self.headers, "Connection", "Upgrade")
             and self.headers.get(HEADER_WS_VERSION) == "13"
             and self.headers.get(HEADER_WS_KEY) != None
         )
@@ -83,7 +249,7 @@ class Request:
     body = property(_get_body, _set_body, _del_body)
 
     def __str__(self) -> str:
-        return f"{self.method} {self.url} HTTP/1.1\r\n{format_headers(self.headers)}\r\n{self._body}"
+        return f"{self.method} {self.url} HTTP/1.1\r\n{format_headers(self.headers)}\r\n\r\n{self._body}"
 
     def __bytes__(self) -> bytes:
         return str(self).encode("utf-8")
@@ -100,46 +266,41 @@ class Request:
 
 class Response:
     def __init__(
-        self, status: str = "", headers: dict[str, str] = {}, body: str = ""
+        self, status: str = "", headers: Mapping[str, str] = {}, body: str = ""
     ) -> None:
         self.status = status
-        self.headers = headers
+        self.headers: Headers = (
+            headers if isinstance(headers, Headers) else Headers(headers)
+        )
         self._body = body
 
     @staticmethod
     def parse(raw_response: str) -> Optional["Response"]:
-        lines = raw_response.split("\r\n")
-        lines, body_splits = lines[: lines.index("")], lines[lines.index("") + 1 :]
-        body = "\r\n".join(body_splits)
-        try:
-            _proto, status = lines[0].split(" ", 1)
-        except (ValueError, IndexError):
-            raise ValueError(f"Invalid first line of response: {lines[0]}")
-        headers = {}
-        for header_pair in lines[1:]:
-            try:
-                (key, val) = header_pair.split(": ")
-            except ValueError:
-                raise ValueError(f"Invalid Header format: {header_pair}")
-            headers[key] = val
-        return Response(status, headers, body)
+        parser = HandshakeParser(is_request=False, max_size=None)
+        res = parser.feed(raw_response.encode("utf-8"))
+        if res is None:
+            raise ValueError("No trailing line after headers")
+        res._body = parser.leftover.decode("utf-8")
+        return res
 
     @staticmethod
-    def new_ws(ws_key: str):
-        return Response(
-            "101 Switching Protocols",
-            headers={
-                "Upgrade": "websocket",
-                "Connection": "Upgrade",
-                HEADER_WS_ACCEPT: make_sec_ws_accept(ws_key),
-            },
-        )
+    def new_ws(ws_key: str, extensions: list[str] = [], protocol: Optional[str] = None):
+        headers = {
+            "Upgrade": "websocket",
+            "Connection": "Upgrade",
+            HEADER_WS_ACCEPT: make_sec_ws_accept(ws_key),
+        }
+        if protocol is not None:
+            headers[HEADER_WS_PROTOCOL] = protocol
+        if extensions:
+            headers[HEADER_WS_EXTENSIONS] = ", ".join(extensions)
+        return Response("101 Switching Protocols", headers=headers)
 
     def is_valid_ws(self, ws_key):
         return (
-            self.status == "101 Switching Protocols"
-            and self.headers.get("Upgrade").casefold() == "websocket"
-            and self.headers.get("Connection").casefold() == "upgrade"
+            self.status.split(" ", 1)[0] == "101"
+            and has_token(self.headers, "Upgrade", "websocket")
+            and has_token(self.headers, "Connection", "Upgrade")
             and self.headers.get(HEADER_WS_ACCEPT) == make_sec_ws_accept(ws_key)
         )
 
@@ -157,7 +318,7 @@ class Response:
 
     def __str__(self) -> str:
         return (
-            f"HTTP/1.1 {self.status}\r\n{format_headers(self.headers)}\r\n{self.body}"
+            f"HTTP/1.1 {self.status}\r\n{format_headers(self.headers)}\r\n\r\n{self.body}"
         )
 
     def __eq__(self, other: object) -> bool:
@@ -169,8 +330,35 @@ class Response:
         )
 
 
-def format_headers(headers: dict[str, str]) -> str:
-    return "\r\n".join([f"{key}: {val}" for (key, val) in headers.items()])
+def format_headers(headers: Headers) -> str:
+    return "\r\n".join([f"{key}: {val}" for (key, val) in headers.multi_items()])
+
+
+def has_token(headers: Headers, name: str, token: str) -> bool:
+    """
+    Checks if a comma separated header, such as "Connection: keep-alive, Upgrade",
+    lists a token, ignoring case.
+    """
+    token = token.casefold()
+    return any(
+        item.strip().casefold() == token
+        for value in headers.get_all(name)
+        for item in value.split(",")
+    )
+
+
+def select_protocol(headers: Headers, supported: list[str]) -> Optional[str]:
+    """
+    Picks the subprotocol for a connection from those the client offered in the
+    Sec-WebSocket-Protocol header: the first of `supported` that was offered, so the
+    server's order of preference wins. Subprotocol names are case sensitive.
+    """
+    offered = {
+        item.strip()
+        for value in headers.get_all(HEADER_WS_PROTOCOL)
+        for item in value.split(",")
+    }
+    return next((protocol for protocol in supported if protocol in offered), None)
 
 
 WS_MAGIC_WORD = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
@@ -0,0 +1,106 @@
+import heapq, itertools, random, struct, threading, time
+from typing import Optional
+from websocket.frames import Frame
+
+
+class Keepalive:
+    """
+    Pings connections at an interval and closes those whose peer stopped answering,
+    so half-open TCP connections don't pile up. The round trip time of each answered
+    ping is recorded on the connection.
+
+    One `Keepalive` serves any number of connections from a single thread and a heap
+    of due times, pass the same one as `keepalive` to every `WebSocket`, for example
+    through `WebSocketServer(keepalive=...)`.
+    """
+
+    def __init__(self, interval: float = 20.0, max_missed: int = 2) -> None:
+        """
+        Constructs a new Keepalive, its thread starts with the first connection.
+
+        Args:
+            interval: The time, in seconds, between pings on each connection.
+                    Defaults to 20.
+            max_missed: The number of pings in a row that may go unanswered, or
+                    couldn't be sent because the connection was backed up, before
+                    the connection is closed with status 1011. Defaults to 2.
+        """
+        self.interval = interval
+        self.max_missed = max_missed
+        self._heap: list[tuple[float, int, object]] = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition(threading.Lock())
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def add(self, ws) -> None:
+        """
+        Starts pinging a connection. The first ping is sent at a random point within
+        one interval, so connections opened together don't ping together.
+        """
+        due = time.monotonic() + random.uniform(0, self.interval)
+        with self._cond:
+            if self._closed:
+                return
+            heapq.heappush(self._heap, (due, next(self._counter), ws))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            elif self._heap[0][2] is ws:
+                self._cond.notify()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def close(self) -> None:
+        """
+        Stops pinging every connection.
+        """
+        with self._cond:
+            self._closed = True
+            self._heap.clear()
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed:
+                    now = time.monotonic()
+                    if self._heap and self._heap[0][0] <= now:
+                        due, _, ws = heapq.heappop(self._heap)
+                        break
+                    self._cond.wait(self._heap[0][0] - now if self._heap else None)
+                else:
+                    return
+            if self._tick(ws):
+                # Schedule from the due time rather than now so pings don't drift
+                with self._cond:
+                    if not self._closed:
+                        due = max(due + self.interval, time.monotonic())
+                        heapq.heappush(self._heap, (due, next(self._counter), ws))
+
+    def _tick(self, ws) -> bool:
+        """
+        Pings a connection, or closes it if its peer missed too many pings. Returns
+        whether the connection should be pinged again.
+        """
+        if ws.shutdown:
+            return False
+        if ws._ping is not None:
+            ws.missed_pongs += 1
+        if ws.missed_pongs >= self.max_missed:
+            ws._evict(1011, "Keepalive timeout")
+            return False
+        payload = struct.pack("!Q", next(self._counter))
+        # Recorded before sending, as the pong may be handled before the send returns
+        previous, ping = ws._ping, (payload, time.perf_counter())
+        ws._ping = ping
+        if not ws._send_nowait(Frame.PING, payload):
+            if ws._ping is ping:
+                ws._ping = previous
+            if previous is None:
+                # A connection too backed up to take a ping counts as not answering
+                ws.missed_pongs += 1
+        return True
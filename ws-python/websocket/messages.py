@@ -0,0 +1,448 @@
+import codecs, threading, time, zlib
+from collections import deque
+from typing import Iterator, Optional
+from websocket.deflate import PerMessageDeflate
+from websocket.frames import Frame, FrameTooLarge, InvalidText, ProtocolError
+
+_Utf8Decoder = codecs.getincrementaldecoder("utf-8")
+
+
+class RawText(bytes):
+    """
+    A text message received in raw text mode: its UTF-8 encoded bytes, already checked
+    to be valid, so they can be handed to a parser that takes bytes without decoding
+    them to a `str` first.
+    """
+
+
+class MessageQueue:
+    """
+    A thread safe queue of received messages, in the order they arrived. Readers block
+    on a condition variable until a message arrives instead of polling.
+
+    The queue may be bounded by a high watermark on the number of messages and on their
+    size, counted in bytes for binary messages and characters for text. Once either is
+    reached, `wait_writable` blocks the writer until the queue drains below the low
+    watermarks, so the writer can stop reading from the network in the meantime.
+    """
+
+    def __init__(
+        self,
+        max_messages: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        low_messages: Optional[int] = None,
+        low_bytes: Optional[int] = None,
+    ) -> None:
+        """
+        Constructs a new MessageQueue.
+
+        Args:
+            max_messages: The high watermark on queued messages. Defaults to no limit.
+            max_bytes: The high watermark on the size of queued messages. Defaults to no
+                    limit.
+            low_messages: The low watermark on queued messages. Defaults to half of
+                    `max_messages`.
+            low_bytes: The low watermark on the size of queued messages. Defaults to
+                    half of `max_bytes`.
+        """
+        self._messages: deque[str | bytes] = deque()
+        lock = threading.Lock()
+        self._cond = threading.Condition(lock)
+        self._writable = threading.Condition(lock)
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        if low_messages is None and max_messages is not None:
+            low_messages = max_messages // 2
+        if low_bytes is None and max_bytes is not None:
+            low_bytes = max_bytes // 2
+        self.low_messages = low_messages
+        self.low_bytes = low_bytes
+        self.size = 0
+        self.paused = False
+        self.closed = False
+
+    def put(self, msg: str | bytes) -> None:
+        """
+        Adds a message to the end of the queue and wakes any waiting readers.
+        """
+        with self._cond:
+            self._messages.append(msg)
+            self.size += _size(msg)
+            self._cond.notify_all()
+
+    def wait_writable(self) -> None:
+        """
+        Returns at once if the queue is below its high watermarks, otherwise blocks
+        until the queue has drained below its low watermarks or is closed.
+        """
+        with self._cond:
+            if not self._above_high():
+                return
+            self.paused = True
+            while not self.closed and not self._below_low():
+                self._writable.wait()
+            self.paused = False
+
+    def get(
+        self, kind: Optional[type] = None, timeout: Optional[float] = None
+    ) -> str | bytes:
+        """
+        Removes and returns the oldest message, waiting for one to arrive if needed.
+
+        Args:
+            kind: Only return messages of this type, `str` or `bytes`, leaving others
+                    queued. Defaults to any message.
+            timeout: The longest time to wait in seconds, or None to wait forever.
+
+        Returns:
+            str | bytes: The message
+
+        Raises:
+            TimeoutError: If no message arrived within `timeout`.
+            ConnectionError: If the queue was closed and holds no more messages.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                msg = self._pop(kind)
+                if msg is not None:
+                    return msg
+                if self.closed:
+                    raise ConnectionError("WebSocket connection is closed")
+                if deadline is None:
+                    self._cond.wait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("Timed out waiting for a message")
+                    self._cond.wait(remaining)
+
+    def get_nowait(self, kind: Optional[type] = None) -> Optional[str | bytes]:
+        """
+        Removes and returns the oldest message without waiting.
+
+        Args:
+            kind: Only return messages of this type, `str` or `bytes`, leaving others
+                    queued. Defaults to any message.
+
+        Returns:
+            str | bytes | None: The message, or `None` if there are none queued
+        """
+        with self._cond:
+            return self._pop(kind)
+
+    @property
+    def full(self) -> bool:
+        """
+        Whether the queue has reached either of its high watermarks
+        """
+        with self._cond:
+            return self._above_high()
+
+    @property
+    def drained(self) -> bool:
+        """
+        Whether the queue is below both of its low watermarks
+        """
+        with self._cond:
+            return self._below_low()
+
+    def close(self) -> None:
+        """
+        Marks that no more messages will arrive and wakes any waiting readers.
+        """
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+            self._writable.notify_all()
+
+    def _above_high(self) -> bool:
+        return (
+            self.max_messages is not None and len(self._messages) >= self.max_messages
+        ) or (self.max_bytes is not None and self.size >= self.max_bytes)
+
+    def _below_low(self) -> bool:
+        return (
+            self.low_messages is None or len(self._messages) <= self.low_messages
+        ) and (self.low_bytes is None or self.size <= self.low_bytes)
+
+    def _pop(self, kind: Optional[type]) -> Optional[str | bytes]:
+        messages = self._messages
+        if not messages:
+            return None
+        if kind is None or type(messages[0]) is kind:
+            msg = messages.popleft()
+        else:
+            for idx, msg in enumerate(messages):
+                if type(msg) is kind:
+                    del messages[idx]
+                    break
+            else:
+                return None
+        self.size -= _size(msg)
+        if self.paused and self._below_low():
+            self._writable.notify_all()
+        return msg
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+
+class MessageStream:
+    """
+    The fragments of one message, readable as they arrive. Iterating over the stream
+    yields each fragment's payload as `bytes`, waiting for more until the final one.
+    """
+
+    def __init__(self, is_text: bool, max_pending: Optional[int] = None) -> None:
+        """
+        Constructs a new MessageStream.
+
+        Args:
+            is_text: Whether the message is a text message.
+            max_pending: The most bytes buffered before the writer blocks until they are
+                    read. Defaults to no limit.
+        """
+        self.is_text = is_text
+        self.max_pending = max_pending
+        self.complete = False
+        self.aborted = False
+        self.pending = 0
+        self._chunks: deque[bytes] = deque()
+        self._cond = threading.Condition(threading.Lock())
+
+    def read(self) -> bytes:
+        """
+        Waits for the whole message and returns it.
+        """
+        return b"".join(self)
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            with self._cond:
+                while not self._chunks and not self.complete and not self.aborted:
+                    self._cond.wait()
+                if self._chunks:
+                    chunk = self._chunks.popleft()
+                    self.pending -= len(chunk)
+                    self._cond.notify_all()
+                elif self.complete:
+                    return
+                else:
+                    raise ConnectionError("WebSocket closed before message completed")
+            yield chunk
+
+    def _put(self, chunk: bytes, fin: bool) -> None:
+        with self._cond:
+            while (
+                self.max_pending is not None
+                and self.pending >= self.max_pending
+                and not self.aborted
+            ):
+                self._cond.wait()
+            if chunk:
+                self._chunks.append(chunk)
+                self.pending += len(chunk)
+            self.complete = fin
+            self._cond.notify_all()
+
+    def _abort(self) -> None:
+        with self._cond:
+            self.aborted = True
+            self._cond.notify_all()
+
+
+class MessageAssembler:
+    """
+    Reassembles fragmented messages from the data frames of a connection, as described
+    in RFC 6455 section 5.4.
+
+    Fragments are collected and joined once, when the final one arrives. In streaming
+    mode each message is instead handed out as a `MessageStream` when its first frame
+    arrives, and later fragments are passed through as they come. Messages compressed
+    with permessage-deflate are decompressed on the way.
+
+    Text is checked to be valid UTF-8 fragment by fragment as it arrives, with an
+    incremental decoder that carries characters split between fragments over, and
+    complete text messages are given as `str`, or `RawText` in raw text mode.
+    """
+
+    def __init__(
+        self,
+        max_size: Optional[int] = None,
+        stream: bool = False,
+        max_pending: Optional[int] = None,
+        deflate: Optional[PerMessageDeflate] = None,
+        raw_text: bool = False,
+    ) -> None:
+        """
+        Constructs a new MessageAssembler.
+
+        Args:
+            max_size: The largest reassembled message accepted. In streaming mode,
+                    where messages have no overall limit, the most each compressed
+                    fragment may decompress to. Defaults to no limit.
+            stream: Whether to hand out messages as `MessageStream`s. Defaults to False.
+            max_pending: The most unread bytes buffered by each `MessageStream`.
+                    Defaults to no limit.
+            deflate: The negotiated permessage-deflate extension, if any.
+            raw_text: Give text messages as their validated UTF-8 bytes, `RawText`,
+                    instead of decoding them to `str`. Defaults to False.
+        """
+        self.max_size = max_size
+        self.stream = stream
+        self.max_pending = max_pending
+        self.deflate = deflate
+        self.raw_text = raw_text
+        self.opcode: Optional[int] = None
+        self.compressed = False
+        self._chunks: list = []
+        self._size = 0
+        self._stream: Optional[MessageStream] = None
+        self._utf8: Optional[codecs.IncrementalDecoder] = None
+
+    def feed(
+        self, frame: Frame
+    ) -> Optional[tuple[int, str | bytes | MessageStream]]:
+        """
+        Adds a data frame to the message being assembled.
+
+        Args:
+            frame: A `TEXT`, `BINARY` or `CONTINUE` frame.
+
+        Returns:
+            (int, str | bytes | MessageStream) | None: The opcode and payload once a
+                    message is complete, or its `MessageStream` once it starts in
+                    streaming mode. An unfragmented binary payload is the frame's own,
+                    which may be a view.
+
+        Raises:
+            InvalidText: If a text message isn't valid UTF-8.
+            ProtocolError: If the frame does not fit the message being assembled.
+            FrameTooLarge: If the message grows larger than `max_size`.
+        """
+        opcode = self.opcode
+        started = None
+        if frame.opcode == Frame.CONTINUE:
+            if opcode is None:
+                raise ProtocolError("Continuation frame with no message to continue")
+            if frame.rsv1:
+                raise ProtocolError("RSV1 set on a continuation frame")
+        else:
+            if opcode is not None:
+                raise ProtocolError("New message started before the last one finished")
+            if frame.rsv1 and self.deflate is None:
+                raise ProtocolError("RSV1 set without a negotiated extension")
+            opcode = frame.opcode
+            self.compressed = frame.rsv1
+            if frame.fin and not self.stream:
+                payload = frame.payload
+                if self.compressed:
+                    payload = self._inflate(payload, True, self.max_size)
+                if opcode == Frame.TEXT:
+                    payload = self._text(payload)
+                return opcode, payload
+            self.opcode = opcode
+            if opcode == Frame.TEXT:
+                self._utf8 = _Utf8Decoder()
+            if self.stream:
+                self._stream = started = MessageStream(
+                    opcode == Frame.TEXT, self.max_pending
+                )
+
+        if self._stream is not None:
+            stream = self._stream
+            payload = frame.payload
+            if self.compressed:
+                payload = self._inflate(payload, frame.fin, self.max_size)
+            else:
+                payload = bytes(payload)
+            if self._utf8 is not None:
+                self._validate(payload, frame.fin)
+            if frame.fin:
+                self._reset()
+            stream._put(payload, frame.fin)
+            return None if started is None else (opcode, started)
+
+        payload = frame.payload
+        if self.compressed:
+            limit = None if self.max_size is None else self.max_size - self._size
+            payload = self._inflate(payload, frame.fin, limit)
+        self._size += len(payload)
+        if self.max_size is not None and self._size > self.max_size:
+            raise FrameTooLarge(
+                f"Message of {self._size} bytes exceeds the limit of {self.max_size}"
+            )
+        if self._utf8 is None or self.raw_text:
+            if self._utf8 is not None:
+                self._validate(payload, frame.fin)
+            # Payloads may be views of a receive buffer that is about to be reused
+            self._chunks.append(payload if frame.fin else bytes(payload))
+        else:
+            self._chunks.append(self._decode(payload, frame.fin))
+        if not frame.fin:
+            return None
+        if opcode != Frame.TEXT:
+            payload = b"".join(self._chunks)
+        elif self.raw_text:
+            payload = RawText(b"".join(self._chunks))
+        else:
+            payload = "".join(self._chunks)
+        self._reset()
+        return opcode, payload
+
+    def _text(self, payload: bytes) -> str | RawText:
+        """
+        Decodes or validates a whole text message.
+        """
+        try:
+            if not self.raw_text:
+                return str(payload, "utf-8")
+            payload = RawText(payload)
+            if not payload.isascii():
+                str(payload, "utf-8")
+            return payload
+        except UnicodeDecodeError as e:
+            raise InvalidText(f"Invalid UTF-8 in text message: {e.reason}")
+
+    def _decode(self, data: bytes, fin: bool) -> str:
+        try:
+            return self._utf8.decode(data, fin)
+        except UnicodeDecodeError as e:
+            raise InvalidText(f"Invalid UTF-8 in text message: {e.reason}")
+
+    def _validate(self, data: bytes, fin: bool) -> None:
+        # ASCII needs no decoding to check, unless it follows part of a character
+        if isinstance(data, bytes) and data.isascii() and not self._utf8.getstate()[0]:
+            return
+        self._decode(data, fin)
+
+    def _inflate(self, data: bytes, fin: bool, max_size: Optional[int]) -> bytes:
+        try:
+            return self.deflate.decompress_fragment(data, fin, max_size)
+        except OverflowError:
+            raise FrameTooLarge("Message decompresses to more than the size limit")
+        except zlib.error as e:
+            raise ProtocolError(f"Invalid compressed message: {e}")
+
+    def _reset(self) -> None:
+        self.opcode = None
+        self.compressed = False
+        self._chunks = []
+        self._size = 0
+        self._stream = None
+        self._utf8 = None
+
+    def close(self) -> None:
+        """
+        Abandons the message being assembled, waking readers of its stream.
+        """
+        if self._stream is not None:
+            self._stream._abort()
+        self._reset()
+
+
+def _size(msg: str | bytes | MessageStream) -> int:
+    if isinstance(msg, MessageStream):
+        return 0
+    return len(msg)
@@ -0,0 +1,188 @@
+"""
+Instrumentation for `WebSocket` connections: a `Hooks` interface called on every frame,
+handshake and close, and `Metrics`, hooks that count them and export the counts in the
+Prometheus text format.
+"""
+
+import bisect, threading, weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from websocket.frames import Frame
+
+OPCODE_NAMES = {
+    Frame.CONTINUE: "continue",
+    Frame.TEXT: "text",
+    Frame.BINARY: "binary",
+    Frame.CLOSE: "close",
+    Frame.PING: "ping",
+    Frame.PONG: "pong",
+}
+
+
+class Hooks:
+    """
+    Called by connections as things happen to them. Every method does nothing, override
+    the ones needed. Hooks run on the thread doing the work, so they should be quick.
+    """
+
+    def on_frame_in(self, ws, frame: Frame) -> None:
+        """
+        Called with each frame received, before it is handled.
+        """
+
+    def on_frame_out(self, ws, opcode: int, size: int, seconds: float) -> None:
+        """
+        Called after each frame is sent, with its payload size and the time the send
+        took, including waiting for other sends on the connection.
+        """
+
+    def on_handshake(self, ws, seconds: float) -> None:
+        """
+        Called once a connection's opening handshake completes, with the time from the
+        TCP connection being accepted, or opened on the client side.
+        """
+
+    def on_close(self, ws, code: int) -> None:
+        """
+        Called once a connection has stopped reading, with the close status code it
+        received or sent, or 1006 if it was lost without one.
+        """
+
+
+class Histogram:
+    """
+    Counts observations into cumulative buckets, like a Prometheus histogram.
+    """
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def render(self, name: str) -> list[str]:
+        lines = [f"# TYPE {name} histogram"]
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {total}')
+        total += self.counts[-1]
+        lines.append(f'{name}_bucket{{le="+Inf"}} {total}')
+        lines.append(f"{name}_sum {self.sum}")
+        lines.append(f"{name}_count {total}")
+        return lines
+
+
+SEND_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 1.0)
+HANDSHAKE_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class Metrics(Hooks):
+    """
+    Hooks counting frames and bytes in each direction by opcode, send latency,
+    handshake duration and close codes, across every connection they are given to.
+    Queue depths and open connections are read from the connections when rendered.
+
+    Pass the same `Metrics` as `hooks` to a `WebSocketServer` or `WebSocket.connect()`
+    to collect over all their connections.
+    """
+
+    def __init__(self) -> None:
+        self.frames_in = [0] * 16
+        self.bytes_in = [0] * 16
+        self.frames_out = [0] * 16
+        self.bytes_out = [0] * 16
+        self.send_seconds = Histogram(SEND_BUCKETS)
+        self.handshake_seconds = Histogram(HANDSHAKE_BUCKETS)
+        self.close_codes: dict[int, int] = {}
+        self.connections: weakref.WeakSet = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def on_frame_in(self, ws, frame: Frame) -> None:
+        with self._lock:
+            self.frames_in[frame.opcode] += 1
+            self.bytes_in[frame.opcode] += len(frame.payload)
+
+    def on_frame_out(self, ws, opcode: int, size: int, seconds: float) -> None:
+        with self._lock:
+            self.frames_out[opcode] += 1
+            self.bytes_out[opcode] += size
+            self.send_seconds.observe(seconds)
+
+    def on_handshake(self, ws, seconds: float) -> None:
+        with self._lock:
+            self.handshake_seconds.observe(seconds)
+            self.connections.add(ws)
+
+    def on_close(self, ws, code: int) -> None:
+        with self._lock:
+            self.close_codes[code] = self.close_codes.get(code, 0) + 1
+            self.connections.discard(ws)
+
+    def render(self) -> str:
+        """
+        Formats the metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            lines = []
+            for name, counts in (
+                ("websocket_frames_in_total", self.frames_in),
+                ("websocket_bytes_in_total", self.bytes_in),
+                ("websocket_frames_out_total", self.frames_out),
+                ("websocket_bytes_out_total", self.bytes_out),
+            ):
+                lines.append(f"# TYPE {name} counter")
+                for opcode, label in OPCODE_NAMES.items():
+                    lines.append(f'{name}{{opcode="{label}"}} {counts[opcode]}')
+            lines += self.send_seconds.render("websocket_send_seconds")
+            lines += self.handshake_seconds.render("websocket_handshake_seconds")
+            lines.append("# TYPE websocket_closes_total counter")
+            for code, count in sorted(self.close_codes.items()):
+                lines.append(f'websocket_closes_total{{code="{code}"}} {count}')
+            connections = list(self.connections)
+        queued_messages = sum(ws.buffered_messages for ws in connections)
+        queued_bytes = sum(ws.buffered_bytes for ws in connections)
+        lines.append("# TYPE websocket_connections gauge")
+        lines.append(f"websocket_connections {len(connections)}")
+        lines.append("# TYPE websocket_queued_messages gauge")
+        lines.append(f"websocket_queued_messages {queued_messages}")
+        lines.append("# TYPE websocket_queued_bytes gauge")
+        lines.append(f"websocket_queued_bytes {queued_bytes}")
+        return "\n".join(lines) + "\n"
+
+
+def serve_metrics(
+    metrics: Metrics, addr: tuple[str, int] = ("127.0.0.1", 9100)
+) -> ThreadingHTTPServer:
+    """
+    Serves `metrics` to Prometheus over HTTP at /metrics, from a background thread.
+
+    Args:
+        metrics: The metrics to serve.
+        addr: The address to listen on. Defaults to ("127.0.0.1", 9100).
+
+    Returns:
+        ThreadingHTTPServer: The running server, call `shutdown()` to stop it
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(addr, Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
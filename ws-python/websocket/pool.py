@@ -0,0 +1,255 @@
+import random, socket, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from websocket.websockets import WebSocket, parse_ws_url
+
+# How long, in seconds, a discarded connection waits for the peer's close frame
+_CLOSE_TIMEOUT = 1.0
+
+
+class AddressCache:
+    """
+    Remembers the addresses hosts resolved to, so opening many connections to the same
+    host resolves it once instead of once per connection.
+    """
+
+    def __init__(self, ttl: float = 60.0) -> None:
+        """
+        Constructs a new AddressCache.
+
+        Args:
+            ttl: How long, in seconds, a resolved address is reused. Defaults to 60.
+        """
+        self.ttl = ttl
+        self._addresses: dict[tuple[str, int], tuple[float, tuple[str, int]]] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, host: str, port: int) -> tuple[str, int]:
+        """
+        Gives the address to connect to for a host and port, resolving it if it isn't
+        cached.
+
+        Raises:
+            socket.gaierror: If the host can't be resolved.
+        """
+        key = (host, port)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._addresses.get(key)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        info = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addr = info[0][4][:2]
+        with self._lock:
+            self._addresses[key] = (now + self.ttl, addr)
+        return addr
+
+
+def connect_many(
+    urls: list[str],
+    concurrency: int = 64,
+    timeout: Optional[float] = 3.0,
+    addresses: Optional[AddressCache] = None,
+    **options,
+) -> list[Optional[WebSocket]]:
+    """
+    Opens a connection to each url, running up to `concurrency` handshakes at once.
+
+    Args:
+        urls: The urls to connect to, repeated to open several connections to one.
+        concurrency: The most handshakes in flight at once. Defaults to 64.
+        timeout: The timeout, in seconds, of each connection's socket operations.
+                Defaults to 3.
+        addresses: The cache of resolved addresses to use. Defaults to a new one shared
+                by these connections.
+        options: Keyword arguments passed on to `WebSocket.connect()`, such as
+                `protocols` or `max_queue`.
+
+    Returns:
+        list[WebSocket | None]: The connection to each url in order, None where it
+                couldn't be opened
+    """
+    addresses = addresses or AddressCache()
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(urls)))) as pool:
+        return list(
+            pool.map(lambda url: _connect(url, timeout, addresses, options), urls)
+        )
+
+
+def _connect(
+    url: str, timeout: Optional[float], addresses: AddressCache, options: dict
+) -> Optional[WebSocket]:
+    try:
+        host, port = parse_ws_url(url).hostpair()
+        return WebSocket.connect(
+            url, timeout=timeout, addr=addresses.resolve(host, port), **options
+        )
+    except (OSError, ValueError):
+        # Such as a refused connection, or a malformed url or handshake response
+        return None
+
+
+class WebSocketPool:
+    """
+    Keeps a client connection open to each of a list of urls, reconnecting dropped ones
+    with jittered exponential backoff, and hands out healthy connections round-robin.
+    """
+
+    def __init__(
+        self,
+        urls: list[str],
+        concurrency: int = 64,
+        timeout: Optional[float] = 3.0,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        check_interval: float = 0.1,
+        **options,
+    ) -> None:
+        """
+        Constructs a new WebSocketPool and opens its connections, waiting for the first
+        attempt at each to finish. Failed connections are retried in the background.
+
+        Args:
+            urls: The urls to connect to, repeated to open several connections to one.
+            concurrency: The most handshakes in flight at once. Defaults to 64.
+            timeout: The timeout, in seconds, of each connection's socket operations.
+                    Defaults to 3.
+            backoff: The delay, in seconds, before the first retry of a connection. Each
+                    failed retry doubles it, and every delay is picked at random
+                    between zero and this. Defaults to 0.5.
+            max_backoff: The longest delay between retries, in seconds. Defaults to 30.
+            check_interval: How often, in seconds, to look for dropped connections.
+                    Defaults to 0.1.
+            options: Keyword arguments passed on to `WebSocket.connect()`, such as
+                    `protocols` or `max_queue`.
+        """
+        self.urls = urls
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.check_interval = check_interval
+        self.options = options
+        self.addresses = AddressCache()
+        self.connections: list[Optional[WebSocket]] = connect_many(
+            urls, concurrency, timeout, self.addresses, **options
+        )
+        now = time.monotonic()
+        self._attempts = [0 if ws else 1 for ws in self.connections]
+        self._retry_at = [now + self._delay(1) for _ in urls]
+        self._connecting = [False] * len(urls)
+        self._next = 0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+        self._monitor = threading.Thread(target=self._run, daemon=True)
+        self._monitor.start()
+
+    def healthy(self) -> list[WebSocket]:
+        """
+        Gives the connections currently open.
+        """
+        return [ws for ws in self.connections if ws is not None and not ws.shutdown]
+
+    def get(self) -> WebSocket:
+        """
+        Gives the next open connection, in round-robin order.
+
+        Raises:
+            ConnectionError: If no connection is open.
+        """
+        with self._lock:
+            count = len(self.connections)
+            for _ in range(count):
+                idx = self._next
+                self._next = (idx + 1) % count
+                ws = self.connections[idx]
+                if ws is not None and not ws.shutdown:
+                    return ws
+        raise ConnectionError("No open connection in the pool")
+
+    def send(self, msg: bytes) -> WebSocket:
+        """
+        Sends binary data on the next open connection, moving on to the one after it
+        if the send fails.
+
+        Returns:
+            WebSocket: The connection the message was sent on
+        """
+        return self._send(WebSocket.send, msg)
+
+    def send_text(self, msg: str) -> WebSocket:
+        """
+        Sends text data on the next open connection, like `send()`.
+
+        Returns:
+            WebSocket: The connection the message was sent on
+        """
+        return self._send(WebSocket.send_text, msg)
+
+    def _send(self, send, msg) -> WebSocket:
+        for _ in range(len(self.connections)):
+            ws = self.get()
+            try:
+                send(ws, msg)
+                return ws
+            except OSError:
+                ws.shutdown = True
+        raise ConnectionError("No open connection in the pool")
+
+    def _delay(self, attempt: int) -> float:
+        ceiling = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+    def _run(self) -> None:
+        while not self._closed.wait(self.check_interval):
+            now = time.monotonic()
+            for idx, ws in enumerate(self.connections):
+                if self._connecting[idx] or (ws is not None and not ws.shutdown):
+                    continue
+                if ws is not None:
+                    # Newly dropped, retry after the first backoff
+                    _discard(ws)
+                    self.connections[idx] = None
+                    self._attempts[idx] = 1
+                    self._retry_at[idx] = now + self._delay(1)
+                if self._retry_at[idx] <= now:
+                    self._connecting[idx] = True
+                    self._executor.submit(self._reconnect, idx)
+
+    def _reconnect(self, idx: int) -> None:
+        ws = _connect(self.urls[idx], self.timeout, self.addresses, self.options)
+        if self._closed.is_set():
+            if ws is not None:
+                _discard(ws)
+            return
+        if ws is None:
+            self._attempts[idx] += 1
+            self._retry_at[idx] = time.monotonic() + self._delay(self._attempts[idx])
+        else:
+            self._attempts[idx] = 0
+            self.connections[idx] = ws
+        self._connecting[idx] = False
+
+    def close(self) -> None:
+        """
+        Stops reconnecting and closes every connection.
+        """
+        self._closed.set()
+        self._monitor.join()
+        self._executor.shutdown(wait=True)
+        for ws in self.connections:
+            if ws is not None:
+                _discard(ws)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
+
+
+def _discard(ws: WebSocket) -> None:
+    # Closes with the closing handshake, and only shuts the socket down if the peer
+    # doesn't answer in time
+    ws.close_timeout = min(ws.close_timeout, _CLOSE_TIMEOUT)
+    ws.close()
@@ -0,0 +1,144 @@
+import itertools, threading, time
+from typing import Iterator, Optional
+
+
+class _Entry:
+    __slots__ = ("ws", "host", "bucket")
+
+    def __init__(self, ws, host: Optional[str], bucket: int) -> None:
+        self.ws = ws
+        self.host = host
+        self.bucket = bucket
+
+
+class ConnectionRegistry:
+    """
+    The open connections of a server, keyed by an id given to each one as it is added,
+    with indexes by peer host and by when each last received data. Adding and removing a
+    connection is constant time, and finding idle connections only looks at the idle
+    ones.
+
+    Connections constructed with `registry=` add themselves, record activity and remove
+    themselves once they stop reading. Iterating gives a snapshot, so connections may
+    come and go meanwhile.
+    """
+
+    def __init__(self, granularity: float = 1.0) -> None:
+        """
+        Constructs a new, empty ConnectionRegistry.
+
+        Args:
+            granularity: The precision, in seconds, of last-activity times. Activity is
+                    only recorded once per connection in each period, so the listener
+                    rarely takes the registry's lock. Defaults to 1.
+        """
+        self.granularity = granularity
+        self._connections: dict[int, _Entry] = {}
+        self._by_host: dict[Optional[str], dict[int, None]] = {}
+        # Activity buckets in time order, each holding the ids last active in it
+        self._buckets: dict[int, dict[int, None]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, ws) -> int:
+        """
+        Adds a connection, recording it as active now.
+
+        Returns:
+            int: The connection's id, also set as `ws.conn_id`
+        """
+        try:
+            peer = ws.conn.getpeername()
+        except OSError:
+            peer = None
+        host = peer[0] if isinstance(peer, tuple) else peer or None
+        with self._lock:
+            conn_id = next(self._ids)
+            ws.conn_id = conn_id
+            bucket = self._bucket()
+            self._connections[conn_id] = _Entry(ws, host, bucket)
+            self._by_host.setdefault(host, {})[conn_id] = None
+            self._buckets.setdefault(bucket, {})[conn_id] = None
+        return conn_id
+
+    def remove(self, ws) -> None:
+        """
+        Removes a connection, if it is in the registry.
+        """
+        with self._lock:
+            entry = self._connections.get(getattr(ws, "conn_id", None))
+            if entry is None or entry.ws is not ws:
+                return
+            del self._connections[ws.conn_id]
+            _discard(self._by_host, entry.host, ws.conn_id)
+            _discard(self._buckets, entry.bucket, ws.conn_id)
+
+    def touch(self, ws) -> None:
+        """
+        Records that a connection received data now.
+        """
+        entry = self._connections.get(getattr(ws, "conn_id", None))
+        if entry is None or entry.bucket == self._bucket():
+            return
+        with self._lock:
+            # Checked again as the connection may have been removed meanwhile, and
+            # the bucket is only picked under the lock so buckets stay in time order
+            if self._connections.get(ws.conn_id) is not entry:
+                return
+            bucket = self._bucket()
+            if bucket != entry.bucket:
+                _discard(self._buckets, entry.bucket, ws.conn_id)
+                self._buckets.setdefault(bucket, {})[ws.conn_id] = None
+                entry.bucket = bucket
+
+    def get(self, conn_id: int):
+        """
+        Gives the connection with an id, or None if it isn't in the registry.
+        """
+        entry = self._connections.get(conn_id)
+        return None if entry is None else entry.ws
+
+    def by_host(self, host: Optional[str]) -> list:
+        """
+        Gives the connections from a peer host, such as "127.0.0.1".
+        """
+        with self._lock:
+            return [self._connections[i].ws for i in self._by_host.get(host, ())]
+
+    def idle(self, timeout: float) -> list:
+        """
+        Gives the connections that haven't received data for at least `timeout`
+        seconds, least recently active first.
+        """
+        cutoff = int((time.monotonic() - timeout) / self.granularity)
+        idle = []
+        with self._lock:
+            for bucket, ids in self._buckets.items():
+                if bucket >= cutoff:
+                    break
+                idle.extend(self._connections[i].ws for i in ids)
+        return idle
+
+    def _bucket(self) -> int:
+        return int(time.monotonic() / self.granularity)
+
+    def __len__(self) -> int:
+        return len(self._connections)
+
+    def __contains__(self, ws) -> bool:
+        entry = self._connections.get(getattr(ws, "conn_id", None))
+        return entry is not None and entry.ws is ws
+
+    def __iter__(self) -> Iterator:
+        with self._lock:
+            snapshot = [entry.ws for entry in self._connections.values()]
+        return iter(snapshot)
+
+
+def _discard(index: dict, key, conn_id: int) -> None:
+    ids = index.get(key)
+    if ids is None:
+        return
+    ids.pop(conn_id, None)
+    if not ids:
+        del index[key]
@@ -0,0 +1,377 @@
+import selectors, socket, struct, time, traceback
+from collections import deque
+from typing import Callable, Optional
+from websocket import http
+from websocket.frames import (
+    Frame,
+    FrameDecoder,
+    FrameTooLarge,
+    InvalidText,
+    ProtocolError,
+)
+from websocket.http import Response
+from websocket.messages import MessageAssembler
+from websocket.websockets import sendmsg_some
+
+
+class SelectorConnection:
+    """
+    A server side WebSocket connection multiplexed by a `SelectorWebSocketServer`.
+
+    Sends never block: frames are queued and written whenever the socket can take them.
+    Connections are not thread safe, use them from the server's callbacks.
+    """
+
+    def __init__(
+        self, server: "SelectorWebSocketServer", conn: socket.socket, addr
+    ) -> None:
+        self.server = server
+        self.conn = conn
+        self.addr = addr
+        self.is_server = True
+        self.protocols = server.protocols
+        self.extensions = server.extensions
+        self.is_open = False
+        self.closed = False
+        self.deadline = time.monotonic() + server.handshake_timeout
+        self._closing = False
+        self._parser = http.HandshakeParser(is_request=True)
+        self._decoder = FrameDecoder(
+            bufsize=4096, max_size=server.max_message_size, masked=True
+        )
+        self._outbox: deque[memoryview] = deque()
+        self._assembler = MessageAssembler(server.max_message_size)
+        self._events = selectors.EVENT_READ
+
+    @property
+    def buffered_amount(self) -> int:
+        """
+        The number of bytes queued but not yet written to the socket
+        """
+        return sum(len(buf) for buf in self._outbox)
+
+    def send(self, msg: bytes) -> None:
+        """
+        Queue binary data to send over the websocket connection.
+
+        Args:
+            msg: The data to send.
+        """
+        self._send_frame(Frame.BINARY, msg)
+
+    def send_text(self, msg: str) -> None:
+        """
+        Queue text data to send over the websocket connection.
+
+        Args:
+            msg: The text data to send.
+        """
+        self._send_frame(Frame.TEXT, msg.encode())
+
+    def ping(self, payload: bytes = bytes()) -> None:
+        """
+        Queue a ping control frame, the peer should answer with a pong.
+
+        Args:
+            payload: Up to 125 bytes of application data, echoed back in the pong.
+        """
+        self._send_control(Frame.PING, payload)
+
+    def pong(self, payload: bytes = bytes()) -> None:
+        """
+        Queue a pong control frame.
+
+        Args:
+            payload: Up to 125 bytes of application data, usually that of the ping
+                    being answered.
+        """
+        self._send_control(Frame.PONG, payload)
+
+    def close(self, code: int = 1000) -> None:
+        """
+        Queue a close frame, the connection is closed once it has been written.
+
+        Args:
+            code: The close status code to send. Defaults to 1000.
+        """
+        if self._closing:
+            return
+        self._send_frame(Frame.CLOSE, struct.pack("!H", code))
+        self._closing = True
+        self._flush()
+
+    def _send_control(self, opcode: int, payload: bytes) -> None:
+        if len(payload) > 125:
+            raise ValueError("Control frame payloads must be at most 125 bytes")
+        self._send_frame(opcode, payload)
+
+    def _send_frame(self, opcode: int, payload: bytes) -> None:
+        if self._closing:
+            raise ConnectionError("WebSocket connection is closed")
+        buffers = Frame(opcode, payload).buffers()
+        self._write([memoryview(buf) for buf in buffers if len(buf)])
+
+    def _write(self, buffers: list[memoryview]) -> None:
+        self._outbox.extend(buffers)
+        self._flush()
+
+    def _flush(self) -> None:
+        outbox = self._outbox
+        while outbox:
+            try:
+                sendmsg_some(self.conn, outbox)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                self._teardown()
+                return
+        if self._closing and not outbox:
+            self._teardown()
+            return
+        self._watch(
+            selectors.EVENT_READ | selectors.EVENT_WRITE
+            if outbox
+            else selectors.EVENT_READ
+        )
+
+    def _watch(self, events: int) -> None:
+        if events != self._events and not self.closed:
+            self._events = events
+            self.server.selector.modify(self.conn, events, self)
+
+    def _on_readable(self) -> None:
+        if self.is_open:
+            view = self._decoder.get_buffer()
+        else:
+            view = memoryview(bytearray(4096))
+        try:
+            nbytes = self.conn.recv_into(view)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            nbytes = 0
+        if nbytes == 0:
+            self._teardown()
+            return
+        if self.is_open:
+            self._decoder.buffer_updated(nbytes)
+            self._dispatch()
+        else:
+            self._read_handshake(view[:nbytes])
+
+    def _read_handshake(self, data: memoryview) -> None:
+        try:
+            req = self._parser.feed(data)
+        except ValueError:
+            self._teardown()
+            return
+        if req is None:
+            return
+        if not req.is_valid_ws():
+            self._teardown()
+            return
+        res = Response.new_ws(req.headers[http.HEADER_WS_KEY])
+        self._write([memoryview(str(res).encode("utf-8"))])
+        self._decoder.feed(self._parser.leftover)
+        self._parser = None
+        self.is_open = True
+        self.server._on_open(self)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        try:
+            self._handle_frames()
+        except FrameTooLarge:
+            self.close(1009)
+        except InvalidText:
+            self.close(1007)
+        except ProtocolError:
+            self.close(1002)
+        except Exception:
+            # Only this connection is dropped, the loop goes on serving the others
+            traceback.print_exc()
+            self._teardown()
+
+    def _handle_frames(self) -> None:
+        for frame in self._decoder.frames():
+            # Frames after our close frame are ignored, such as those following a
+            # callback that failed
+            if self._closing:
+                return
+            match frame.opcode:
+                case Frame.BINARY | Frame.TEXT | Frame.CONTINUE:
+                    message = self._assembler.feed(frame)
+                    if message is not None:
+                        self.server._on_message(self, message[1])
+                case Frame.PING:
+                    self.pong(frame.payload)
+                case Frame.CLOSE:
+                    self._send_frame(Frame.CLOSE, frame.payload[:2])
+                    self._closing = True
+                    self._flush()
+
+    def _teardown(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self._closing = True
+        self._outbox.clear()
+        self.server._on_close(self)
+        self.conn.close()
+
+
+class SelectorWebSocketServer:
+    """
+    A WebSocket server that accepts, handshakes and serves every connection from one
+    thread, with a `selectors` loop (epoll on Linux) instead of a thread per connection.
+    Connections are handed to callbacks rather than returned from `accept()`.
+    """
+
+    def __init__(
+        self,
+        addr: tuple[str, int] = ("", 80),
+        protocols: list[str] = [],
+        extensions: list[str] = [],
+        on_open: Optional[Callable[[SelectorConnection], None]] = None,
+        on_message: Optional[Callable[[SelectorConnection, str | bytes], None]] = None,
+        on_close: Optional[Callable[[SelectorConnection], None]] = None,
+        handshake_timeout: float = 10.0,
+        max_message_size: Optional[int] = 16 * 1024 * 1024,
+    ) -> None:
+        """
+        Constructs a new SelectorWebSocketServer, call `serve_forever()` to run it.
+
+        A callback that raises closes only its connection, with status 1011, and the
+        traceback is printed.
+
+        Args:
+            addr: The address to listen on. Defaults to ("", 80).
+            protocols: A list of protocols on top of the WebSocket connection. Defaults to [].
+            extensions: A list of extensions on top of the WebSocket connection. Defaults to [].
+            on_open: Called with each connection once its handshake completes.
+            on_message: Called with the connection and message, `str` for text and
+                    `bytes` for binary, for every message received.
+            on_close: Called with each connection once it is closed.
+            handshake_timeout: How long, in seconds, a client has to send its opening
+                    handshake before it is disconnected. Defaults to 10.
+            max_message_size: The largest message accepted, larger ones close the
+                    connection with status 1009. None for no limit. Defaults to 16 MiB.
+        """
+        self.protocols = protocols
+        self.extensions = extensions
+        self.on_open = on_open
+        self.on_message = on_message
+        self.on_close = on_close
+        self.handshake_timeout = handshake_timeout
+        self.max_message_size = max_message_size
+        self.connections: set[SelectorConnection] = set()
+        # Connections in the order they were accepted, so by handshake deadline
+        self._handshakes: deque[SelectorConnection] = deque()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(addr)
+        self.sock.listen(1024)
+        self.sock.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.sock, selectors.EVENT_READ, None)
+        self._stopped = False
+
+    def serve_forever(self, poll_interval: float = 0.5) -> None:
+        """
+        Serves connections until `stop()` is called.
+
+        Args:
+            poll_interval: How often, in seconds, to check if the server was stopped.
+        """
+        self._stopped = False
+        while not self._stopped:
+            self.run_once(poll_interval)
+
+    def run_once(self, timeout: Optional[float] = None) -> None:
+        """
+        Waits for socket activity and handles it.
+
+        Args:
+            timeout: The longest time, in seconds, to wait for activity.
+        """
+        if self._handshakes:
+            # Wake in time to drop the next handshake that runs out of time
+            due = max(0.0, self._handshakes[0].deadline - time.monotonic())
+            timeout = due if timeout is None else min(timeout, due)
+        for key, events in self.selector.select(timeout):
+            conn = key.data
+            if conn is None:
+                self._accept()
+                continue
+            if events & selectors.EVENT_WRITE:
+                conn._flush()
+            if events & selectors.EVENT_READ and not conn.closed:
+                conn._on_readable()
+        self._expire_handshakes()
+
+    def _expire_handshakes(self) -> None:
+        handshakes = self._handshakes
+        now = time.monotonic()
+        while handshakes and (
+            handshakes[0].is_open
+            or handshakes[0].closed
+            or handshakes[0].deadline <= now
+        ):
+            ws = handshakes.popleft()
+            if not ws.is_open:
+                ws._teardown()
+
+    def stop(self) -> None:
+        """
+        Makes `serve_forever()` return, may be called from any thread.
+        """
+        self._stopped = True
+
+    def _accept(self) -> None:
+        for _ in range(64):
+            try:
+                conn, addr = self.sock.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            conn.setblocking(False)
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            ws = SelectorConnection(self, conn, addr)
+            self.selector.register(conn, selectors.EVENT_READ, ws)
+            self._handshakes.append(ws)
+
+    def _on_open(self, ws: SelectorConnection) -> None:
+        self.connections.add(ws)
+        if self.on_open is not None:
+            self._run_callback(ws, self.on_open, ws)
+
+    def _on_message(self, ws: SelectorConnection, msg: str | bytes) -> None:
+        if self.on_message is not None:
+            self._run_callback(ws, self.on_message, ws, msg)
+
+    def _on_close(self, ws: SelectorConnection) -> None:
+        self.selector.unregister(ws.conn)
+        if ws.is_open:
+            self.connections.discard(ws)
+            if self.on_close is not None:
+                self._run_callback(ws, self.on_close, ws)
+
+    def _run_callback(self, ws: SelectorConnection, callback: Callable, *args) -> None:
+        # One connection's failing callback must not stop the loop serving the others
+        try:
+            callback(*args)
+        except Exception:
+            traceback.print_exc()
+            ws.close(1011)
+
+    def close(self):
+        for key in list(self.selector.get_map().values()):
+            if key.data is not None:
+                key.data._teardown()
+        self.selector.unregister(self.sock)
+        self.selector.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
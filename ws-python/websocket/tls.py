@@ -0,0 +1,102 @@
+"""
+TLS for `wss://` connections: contexts set up for session resumption, and a cache of
+client sessions so reconnecting to a server takes an abbreviated handshake.
+"""
+
+import ssl, threading
+from collections import OrderedDict
+from typing import Optional
+
+# The largest plaintext a TLS record carries
+RECORD_SIZE = 16384
+
+_default_context: Optional[ssl.SSLContext] = None
+_default_lock = threading.Lock()
+
+
+def default_context() -> ssl.SSLContext:
+    """
+    Gives the client context used for `wss://` urls when none is given, created once,
+    as sessions can only be resumed with the context that made them.
+    """
+    global _default_context
+    with _default_lock:
+        if _default_context is None:
+            _default_context = ssl.create_default_context()
+        return _default_context
+
+
+def server_context(
+    certfile: str, keyfile: Optional[str] = None, tickets: int = 2
+) -> ssl.SSLContext:
+    """
+    Makes a server context for `WebSocketServer(ssl_context=...)` that issues session
+    tickets, so returning clients resume their session instead of a full handshake.
+    Workers forked by a server share the context's ticket keys, so a ticket from one
+    worker is accepted by the others.
+
+    Args:
+        certfile: The path of the PEM certificate chain.
+        keyfile: The path of the private key, if it isn't in `certfile`.
+        tickets: The number of TLS 1.3 session tickets sent after each full
+                handshake. Defaults to 2.
+
+    Returns:
+        ssl.SSLContext: The server context
+    """
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(certfile, keyfile)
+    context.options &= ~ssl.OP_NO_TICKET
+    context.num_tickets = tickets
+    return context
+
+
+class SessionCache:
+    """
+    Remembers the TLS session of the last connection to each server, to resume it on
+    the next connection. Holds at most `size` sessions, dropping the least recently
+    used.
+    """
+
+    def __init__(self, size: int = 1024) -> None:
+        """
+        Constructs a new, empty SessionCache.
+
+        Args:
+            size: The most sessions kept. Defaults to 1024.
+        """
+        self.size = size
+        self._sessions: OrderedDict[tuple, ssl.SSLSession] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self, context: ssl.SSLContext, host: str, port: int
+    ) -> Optional[ssl.SSLSession]:
+        """
+        Gives the session to resume with a server, or None to take a full handshake.
+        """
+        key = (context, host, port)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                self._sessions.move_to_end(key)
+            return session
+
+    def put(
+        self, context: ssl.SSLContext, host: str, port: int, session: ssl.SSLSession
+    ) -> None:
+        """
+        Records the session of a connection to a server.
+        """
+        key = (context, host, port)
+        with self._lock:
+            self._sessions[key] = session
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.size:
+                self._sessions.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+sessions = SessionCache()
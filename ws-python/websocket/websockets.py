@@ -1,106 +1,206 @@
-import socket, os, time
-from typing import Optional
-from websocket import http
-from websocket.http import Request, Response
+import socket, os, select, signal, ssl, struct, time, traceback
+from collections import deque
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Optional
+from websocket import codec, http, tls
+from websocket.http import HandshakeParser, Request, Response
+from websocket.acceptor import Acceptor
+from websocket.deflate import (
+    NAME as deflate_name,
+    PerMessageDeflate,
+    find_config as find_deflate,
+    parse_extensions,
+)
+from websocket.frames import (
+    Frame,
+    FrameDecoder,
+    FrameTooLarge,
+    InvalidText,
+    ProtocolError,
+)
+from websocket.keepalive import Keepalive
+from websocket.metrics import Hooks
+from websocket.messages import MessageAssembler, MessageQueue, MessageStream, RawText
+from websocket.registry import ConnectionRegistry
 from websocket.url import Url
+from websocket.workers import Supervisor
 from urllib.parse import urlparse
 import threading
 
+# Buffers passed to one `socket.sendmsg` call, kept under the IOV_MAX of any platform
+_IOV_MAX = 512
 
-class Frame:
-    CONTINUE = 0x0
-    TEXT = 0x1
-    BINARY = 0x2
-    CLOSE = 0x8
-    PING = 0x9
-    PONG = 0xA
 
-    def __init__(self, opcode: int, payload: bytes, mask: bytes = bytes([])) -> None:
-        """
-        Constructs a new Frame object.
+def parse_ws_url(url: str) -> Url:
+    """
+    Parses a `ws://` or `wss://` url into the parts needed to open a connection and
+    send the opening handshake.
 
-        Args:
-            opcode (int): The opcode specifying the kind of message, use one of the Frame
-                    constants such as `Frame.TEXT`
-            payload (bytes): The data contained by this frame
-            mask (bytes): The mask key, either an empty `bytes` object if not masking or a
-                    `bytes` object of length 4
-        """
-        self.opcode = opcode
-        self.__payload = payload
-        self.length: int = len(payload)
-        self.__mask = mask
-        self.is_masked = len(mask) != 0
+    Args:
+        url: The url of the server, such as `ws://localhost:8080/chat`
 
-    @staticmethod
-    def parse(raw_frame: bytes) -> Optional["Frame"]:
-        """
-        Parses a binary frame into a Frame object
+    Returns:
+        Url: The parsed url, with the default port filled in for the scheme
+    """
+    try:
+        parsed = urlparse(url)
+        port = parsed.port
+    except ValueError as e:
+        err = ValueError(f"Failed to parse provided url {url}")
+        err.add_note(str(e))
+        raise err
+    if port is None:
+        port = 443 if parsed.scheme == "wss" else 80
+    path = parsed.path or "/"
+    if parsed.query:
+        path = f"{path}?{parsed.query}"
+    return Url(parsed.scheme, parsed.hostname or "", str(port), path)
 
-        Args:
-            raw_frame (bytes): The binary frame received from a websocket connection
-        """
-        opcode = int(raw_frame[0] & 0b0000_1111)
-        isMasked = bool(raw_frame[1] & 0b1000_0000)
-        mask = bytes()
-        length = int(raw_frame[1] & 0b01111_111)
-        idx = 2
-        if length == 126:
-            length = int(raw_frame[2:4])
-            idx = 4
-        elif length == 127:
-            length = int(raw_frame[2:10])
-            idx = 10
-        if isMasked:
-            mask = raw_frame[idx : idx + 4]
-            idx += 4
-        payload = raw_frame[idx:]
-        return Frame(opcode, payload, mask)
 
-    def __get_payload(self) -> bytes:
-        return self.__payload
+def sendmsg_all(sock: socket.socket, buffers: list) -> None:
+    """
+    Sends every buffer in `buffers` in order with scatter/gather `socket.sendmsg`,
+    retrying after partial sends, so the buffers are never joined into one copy.
 
-    def __set_payload(self, payload: bytes) -> None:
-        self.__payload = payload
-        self.length = len(payload)
+    TLS sockets have no `sendmsg`, so small buffers are joined up to the size of a TLS
+    record and written together, and buffers of a record or more are written as they
+    are.
 
-    def __del_payload(self) -> None:
-        del self.__payload
+    Args:
+        sock: The connected socket to send on.
+        buffers: The bytes-like objects to send.
+    """
+    if isinstance(sock, ssl.SSLSocket):
+        pending: list = []
+        size = 0
+        for buf in buffers:
+            if pending and size + len(buf) > tls.RECORD_SIZE:
+                sock.sendall(b"".join(pending))
+                pending, size = [], 0
+            if len(buf) >= tls.RECORD_SIZE:
+                sock.sendall(buf)
+            else:
+                pending.append(buf)
+                size += len(buf)
+        if pending:
+            sock.sendall(b"".join(pending))
+        return
+    views = deque(memoryview(buf) for buf in buffers)
+    while views:
+        sendmsg_some(sock, views)
 
-    payload = property(__get_payload, __set_payload, __del_payload)
 
-    def __get_mask(self):
-        return self.__mask
+def sendmsg_some(sock: socket.socket, views: deque[memoryview]) -> None:
+    """
+    Writes from the front of `views` with one scatter/gather `socket.sendmsg` call, of
+    at most `_IOV_MAX` buffers, and removes what was written, trimming a buffer that
+    was written in part.
 
-    def __set_mask(self, mask):
-        self.__mask = mask
+    Args:
+        sock: The connected socket to send on.
+        views: The buffers still to send, in order.
 
-    def __del_mask(self):
-        del self.__mask
+    Raises:
+        BlockingIOError: If a non-blocking socket had no room for any of it.
+    """
+    sent = sock.sendmsg(list(islice(views, _IOV_MAX)))
+    while views and sent >= len(views[0]):
+        sent -= len(views.popleft())
+    if sent:
+        views[0] = views[0][sent:]
 
-    mask = property(__get_mask, __set_mask, __del_mask)
 
-    def __bytes__(self) -> bytes:
-        """
-        Converts the frame to a byte array to be sent over the network
+def send_nowait(sock: socket.socket, data: bytes) -> int:
+    """
+    Sends as much of `data` as fits in the socket buffer without waiting. TLS sockets
+    take no send flags, so they are polled for room instead, and then write at least
+    a whole record.
+
+    Returns:
+        int: The number of bytes sent
+
+    Raises:
+        BlockingIOError: If there was no room for any of it.
+    """
+    if isinstance(sock, ssl.SSLSocket):
+        if not select.select((), (sock,), (), 0)[1]:
+            raise BlockingIOError("No room in the socket buffer")
+        return sock.send(data)
+    return sock.send(data, socket.MSG_DONTWAIT)
+
+
+def read_handshake(
+    conn: socket.socket, parser: HandshakeParser
+) -> Optional[Request | Response]:
+    """
+    Reads from `conn` until `parser` has a whole handshake, however it is split across
+    reads. Bytes after the handshake are left in `parser.leftover`.
+
+    Returns:
+        Request | Response | None: The handshake, or `None` if the connection closed
+                before it was complete
+
+    Raises:
+        ValueError: If the handshake is malformed or too large.
+    """
+    while True:
+        data = conn.recv(4096)
+        if not data:
+            return None
+        msg = parser.feed(data)
+        if msg is not None:
+            return msg
+
+
+def parse_close(payload: bytes) -> tuple[int, str]:
+    """
+    Parses the payload of a close frame.
+
+    Returns:
+        tuple[int, str]: The status code, 1005 if there was none, and the reason
+
+    Raises:
+        InvalidText: If the reason isn't valid UTF-8.
+        ProtocolError: If the payload is one byte long, or the status code isn't one
+                that may be sent.
+    """
+    if not payload:
+        return 1005, ""
+    if len(payload) == 1:
+        raise ProtocolError("Close frame payload of one byte")
+    code = struct.unpack("!H", payload[:2])[0]
+    if not (1000 <= code <= 1014 and code not in (1004, 1005, 1006)) and not (
+        3000 <= code <= 4999
+    ):
+        raise ProtocolError(f"Invalid close status code {code}")
+    try:
+        return code, payload[2:].decode()
+    except UnicodeDecodeError:
+        raise InvalidText("Close reason isn't valid UTF-8")
 
-        Returns:
-            bytes: The finalized bytes
-        """
-        fin = 0b1000_0000
-        mask = 0b1000_0000 if self.is_masked else 0
-        if self.length >= 65536:
-            length_ext = bytes(self.length)
-            length = 127
-        elif self.length > 125:
-            length_ext = bytes(self.length)
-            length = 126
-        else:
-            length_ext = bytes()
-            length = self.length
-        return bytes(
-            [fin | self.opcode, mask | length, *length_ext, *self.mask, *self.payload]
-        )
+
+def _fragments(chunks: Iterable[bytes | str], size: int) -> Iterator[bytes | memoryview]:
+    """
+    Regroups `chunks` into pieces of exactly `size` bytes, except for the last. Large
+    chunks are split into views rather than copied.
+    """
+    buf = bytearray()
+    for chunk in chunks:
+        view = memoryview(chunk.encode() if isinstance(chunk, str) else chunk)
+        if buf:
+            taken = size - len(buf)
+            buf += view[:taken]
+            view = view[taken:]
+            if len(buf) < size:
+                continue
+            yield buf
+            buf = bytearray()
+        while len(view) >= size:
+            yield view[:size]
+            view = view[size:]
+        buf += view
+    if buf:
+        yield buf
 
 
 class WebSocket:
@@ -114,6 +214,26 @@ class WebSocket:
         is_server: bool,
         protocols: list[str] = [],
         extensions: list[str] = [],
+        *,
+        max_message_size: Optional[int] = 16 * 1024 * 1024,
+        max_queue: Optional[int] = 1024,
+        max_queue_bytes: Optional[int] = 64 * 1024 * 1024,
+        low_queue: Optional[int] = None,
+        low_queue_bytes: Optional[int] = None,
+        fragment_size: int = 64 * 1024,
+        stream_messages: bool = False,
+        raw_text: bool = False,
+        subprotocol: Optional[str] = None,
+        deflate: Optional[PerMessageDeflate] = None,
+        buffered: bytes = bytes(),
+        hooks: Optional[Hooks] = None,
+        handshake_seconds: Optional[float] = None,
+        keepalive: Optional[Keepalive] = None,
+        close_timeout: float = 10.0,
+        cork: bool = False,
+        cork_bytes: int = 64 * 1024,
+        cork_interval: float = 0.005,
+        registry: Optional[ConnectionRegistry] = None,
     ) -> None:
         """
         Constructs a `WebSocket` connection from parts, note that `WebSocket` should usually
@@ -121,88 +241,393 @@ class WebSocket:
         to open client side connections, or use a `WebSocketServer` to open server side
         connections.
 
+        Received messages are queued until read. Once `max_queue` messages or
+        `max_queue_bytes` bytes are queued, the connection stops reading from the socket,
+        so TCP flow control pushes back on the peer, until the queue drains to `low_queue`
+        messages and `low_queue_bytes` bytes.
+
         Args:
             conn: A TCP connection for the websocket connection, assumes
                     a websocket handshake has already been performed.
             is_server: Describes if the connection is from a server or client.
             protocols: A list of protocols on top of the WebSocket connection. Defaults to [].
             extensions: A list of extensions on top of the WebSocket connection. Defaults to [].
+            max_message_size: The largest message accepted, larger ones close the
+                    connection with status 1009. None for no limit. Defaults to 16 MiB.
+            max_queue: The most messages queued before reading pauses, None for no
+                    limit. Defaults to 1024.
+            max_queue_bytes: The most bytes queued before reading pauses, None for no
+                    limit. Defaults to 64 MiB.
+            low_queue: The number of queued messages at which reading resumes.
+                    Defaults to half of `max_queue`.
+            low_queue_bytes: The number of queued bytes at which reading resumes.
+                    Defaults to half of `max_queue_bytes`.
+            fragment_size: The payload size of each fragment sent by `send_stream()`
+                    and `send_file()`. Defaults to 64 KiB.
+            stream_messages: Deliver every message through `recv_stream()` as its
+                    fragments arrive, instead of reassembling it first. Defaults to False.
+            raw_text: Give text messages from `recv_text()` and `recv_message()` as
+                    `RawText`, their UTF-8 bytes checked to be valid, instead of
+                    decoding them to `str`. Defaults to False.
+            subprotocol: The subprotocol negotiated in the handshake, if any. Its
+                    codec, if one is registered, is used by `send_obj()` and
+                    `recv_obj()`.
+            deflate: The permessage-deflate extension negotiated in the handshake, if any.
+            buffered: Bytes already read from `conn` after the handshake, such as frames
+                    the peer sent right after it, decoded before reading any more.
+            hooks: Called on every frame sent and received and when the connection
+                    closes, such as a `Metrics`. Defaults to none.
+            handshake_seconds: How long the opening handshake took, passed to
+                    `hooks.on_handshake()` before reading starts, so it always comes
+                    before `on_close()`. Defaults to not calling it.
+            keepalive: Pings the connection at an interval and closes it if the peer
+                    stops answering, usually shared by many connections. Defaults to
+                    no pings.
+            close_timeout: How long, in seconds, `close()` waits for the peer to answer
+                    the close frame before dropping the connection. Defaults to 10.
+            cork: Hold frames back and write them together with one system call, once
+                    `cork_bytes` are held, `cork_interval` has passed since the first,
+                    a control frame is sent or `flush()` is called. Defaults to False.
+            cork_bytes: The size, in bytes, of held frames at which they are written.
+                    Defaults to 64 KiB.
+            cork_interval: The longest time, in seconds, a frame is held back.
+                    Defaults to 5 milliseconds.
+            registry: The registry to add the connection to, which it records its
+                    activity in and leaves once it stops reading. Defaults to none.
         """
         self.conn = conn
         self.is_server = is_server
         self.protocols = protocols
         self.extensions = extensions
-        self.str_msgs: list[str] = []
-        self.bin_msgs: list[bytes] = []
+        self.max_message_size = max_message_size
+        self.fragment_size = fragment_size
+        self.stream_messages = stream_messages
+        self.subprotocol = subprotocol
+        self.codec = codec.get(subprotocol)
+        self.raw_text = raw_text
+        # With a codec, text is queued as bytes for `recv_obj()` to parse, and only
+        # decoded when it is read as text
+        self._queue_raw = raw_text or self.codec is not None
+        self.deflate = deflate
+        self._buffered = buffered
+        self.hooks = hooks
+        self.frames_in = 0
+        self.bytes_in = 0
+        self.frames_out = 0
+        self.bytes_out = 0
+        self.close_timeout = close_timeout
+        self.close_code = 1006
+        self.close_reason = ""
+        self._close_sent = False
+        self._close_received = False
+        self.rtt: Optional[float] = None
+        self.last_rtt: Optional[float] = None
+        self.missed_pongs = 0
+        self._ping: Optional[tuple[bytes, float]] = None
+        self.messages = MessageQueue(
+            max_queue, max_queue_bytes, low_queue, low_queue_bytes
+        )
         self.shutdown = False
+        self._send_lock = threading.Lock()
+        self._message_lock = threading.Lock()
+        self.cork = cork
+        self.cork_bytes = cork_bytes
+        self.cork_interval = cork_interval
+        self._outbox: list = []
+        self._outbox_size = 0
+        self._flush_due = threading.Condition(self._send_lock)
+        self._flusher: Optional[threading.Thread] = None
+        self._partial = False
+        if conn.family in (socket.AF_INET, socket.AF_INET6):
+            # Frames are written whole, or several at once when corked, so Nagle's
+            # algorithm would only delay them
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.registry = registry
+        self.conn_id: Optional[int] = None
+        if registry is not None:
+            registry.add(self)
+        if hooks is not None and handshake_seconds is not None:
+            hooks.on_handshake(self, handshake_seconds)
         self.listen_thread = threading.Thread(
             target=WebSocket._start_listener,
             daemon=True,
-            args=(self, self.str_msgs, self.bin_msgs),
+            args=(self,),
         )
         self.listen_thread.start()
+        if cork:
+            self._start_flusher()
+        if keepalive is not None:
+            keepalive.add(self)
 
     @staticmethod
     def connect(
         url: str,
         protocols: list[str] = [],
         extensions: list[str] = [],
+        timeout: Optional[float] = 3.0,
+        addr: Optional[tuple[str, int]] = None,
+        ssl_context: Optional[ssl.SSLContext] = None,
+        sessions: Optional[tls.SessionCache] = None,
+        **options,
     ) -> Optional["WebSocket"]:
         """Connect to a websocket server and perform an opening handshake
 
         Args:
             url: the url of the server to connect to
-            protocols: an optional list of protocols to request from the server. Defaults to [].
+            protocols: The subprotocols to offer the server, such as "json", in order of
+                    preference. The connection's `subprotocol` is the one it picks.
+                    Defaults to [].
             extensions: an optional list of extensions to request from the server Defaults to [].
+            timeout: The timeout, in seconds, of the connection's socket operations,
+                    including the handshake. None to block. Defaults to 3.
+            addr: The address to connect to, already resolved, instead of the url's
+                    host. The url's host is still sent in the handshake.
+            ssl_context: The TLS context for `wss://` urls. Defaults to one shared
+                    by every connection, verifying the server's certificate.
+            sessions: Where TLS sessions are kept to resume on later connections to
+                    the same server. Defaults to one shared by every connection.
+            options: Keyword arguments passed on to `WebSocket`, such as `max_queue`.
 
         Returns:
             Either an open WebSocket connection, or None if the connection failed
         """
-        try:
-            server_url = urlparse(url)
-        except ValueError as e:
-            err = ValueError(f"Failed to parse provided url {url}")
-            err.add_note(str(e))
-            raise err
-        
-        conn = socket.create_connection((server_url.hostname, server_url.port), 3)
-
-        req = Request.new_ws(server_url)
+        started = time.monotonic()
+        server_url = parse_ws_url(url)
+        conn = socket.create_connection(addr or server_url.hostpair(), timeout)
+        if server_url.scheme == "wss":
+            # Handshake flights are several small writes, which Nagle's algorithm
+            # would hold back for an ACK
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            ssl_context = ssl_context or tls.default_context()
+            sessions = tls.sessions if sessions is None else sessions
+            host, port = server_url.hostpair()
+            conn = ssl_context.wrap_socket(
+                conn,
+                server_hostname=host,
+                session=sessions.get(ssl_context, host, port),
+            )
+
+        deflate = find_deflate(extensions)
+        req = Request.new_ws(
+            server_url, [deflate.offer()] if deflate else [], protocols
+        )
         ws_key = req.headers[http.HEADER_WS_KEY]
         conn.sendall(bytes(req))
 
-        data = bytes()
-        while len(data) == 0:
-            data = conn.recv(2048)
-            if not data:
-                continue
-            res = Response.parse(data.decode("utf-8"))
-            if not isinstance(res, Response) or not res.is_valid_ws(ws_key):
+        parser = HandshakeParser(is_request=False)
+        try:
+            res = read_handshake(conn, parser)
+        except ValueError:
+            res = None
+        if res is None or not res.is_valid_ws(ws_key):
+            conn.close()
+            return None
+        subprotocol = res.headers.get(http.HEADER_WS_PROTOCOL)
+        if subprotocol is not None and subprotocol not in protocols:
+            conn.close()
+            return None
+        if isinstance(conn, ssl.SSLSocket) and conn.session is not None:
+            # TLS 1.3 tickets arrive after the handshake, so are in by the response
+            sessions.put(ssl_context, host, port, conn.session)
+        negotiated = None
+        for name, params in parse_extensions(
+            res.headers.get(http.HEADER_WS_EXTENSIONS, "")
+        ):
+            if name != deflate_name or deflate is None or negotiated is not None:
+                conn.close()
                 return None
-        return WebSocket(
-            conn, is_server=False, protocols=protocols, extensions=extensions
+            try:
+                negotiated = deflate.confirm(params)
+            except ValueError:
+                conn.close()
+                return None
+        ws = WebSocket(
+            conn,
+            is_server=False,
+            protocols=protocols,
+            extensions=extensions,
+            deflate=negotiated,
+            buffered=parser.leftover,
+            subprotocol=subprotocol,
+            handshake_seconds=time.monotonic() - started,
+            **options,
         )
+        return ws
 
-    def _start_listener(self, str_msgs, bin_msgs):
-        while not self.shutdown:
-            buf = bytes()
-            while len(buf) == 0:
-                try:
-                    buf = self.conn.recv(4096)
-                except TimeoutError:
-                    continue
-            frame = Frame.parse(buf)
-            if not isinstance(frame, Frame):
-                raise IOError("Received invalid data frame from WebSocket connection")
+    @property
+    def buffered_messages(self) -> int:
+        """
+        The number of received messages waiting to be read
+        """
+        return len(self.messages)
+
+    @property
+    def buffered_bytes(self) -> int:
+        """
+        The size of received messages waiting to be read, in bytes for binary messages
+        and characters for text
+        """
+        return self.messages.size
+
+    @property
+    def reading_paused(self) -> bool:
+        """
+        Whether reading from the socket is paused until queued messages are read
+        """
+        return self.messages.paused
+
+    def _start_listener(self):
+        # Reads leave room for a whole TLS record, so each takes one rather than
+        # leaving part of it for another call
+        decoder = FrameDecoder(
+            max_size=self.max_message_size,
+            min_read=tls.RECORD_SIZE if isinstance(self.conn, ssl.SSLSocket) else 4096,
+            masked=self.is_server,
+        )
+        assembler = MessageAssembler(
+            self.max_message_size,
+            self.stream_messages,
+            self.messages.max_bytes,
+            self.deflate,
+            self._queue_raw,
+        )
+        registry = self.registry
+        failed = False
+        try:
+            decoder.feed(self._buffered)
+            self._buffered = bytes()
+            self._listen(decoder, assembler)
+        except Exception:
+            # Whatever went wrong, the peer is told and nothing is left waiting
+            failed = True
+            traceback.print_exc()
+            self._fail(1011, "Internal error")
+        finally:
+            self.shutdown = True
+            assembler.close()
+            self.messages.close()
+            with self._flush_due:
+                self._flush_due.notify()
+            if registry is not None:
+                registry.remove(self)
+            if self.hooks is not None:
+                self.hooks.on_close(self, self.close_code)
+            # Nothing reads from the socket any more, so the peer is cut off rather
+            # than left to fill it
+            if failed:
+                self._abort()
+
+    def _listen(self, decoder: FrameDecoder, assembler: MessageAssembler) -> None:
+        registry = self.registry
+        while True:
+            try:
+                self._handle_frames(decoder, assembler)
+            except FrameTooLarge:
+                self._fail(1009, "Message too big")
+                return
+            except InvalidText as e:
+                self._fail(1007, str(e))
+                return
+            except ProtocolError as e:
+                self._fail(1002, str(e))
+                return
+            except OSError:
+                return
+            if self._close_received:
+                return
+            try:
+                nbytes = self.conn.recv_into(decoder.get_buffer())
+            except TimeoutError:
+                continue
+            except OSError:
+                return
+            if nbytes == 0:
+                return
+            decoder.buffer_updated(nbytes)
+            if registry is not None:
+                registry.touch(self)
+
+    def _handle_frames(self, decoder: FrameDecoder, assembler: MessageAssembler) -> None:
+        hooks = self.hooks
+        for frame in decoder.frames():
+            self.frames_in += 1
+            self.bytes_in += len(frame.payload)
+            if hooks is not None:
+                hooks.on_frame_in(self, frame)
             match frame.opcode:
-                case Frame.BINARY:
-                    bin_msgs.append(frame.payload)
-                case Frame.TEXT:
-                    str_msgs.append(frame.payload.decode())
+                case Frame.BINARY | Frame.TEXT | Frame.CONTINUE:
+                    message = assembler.feed(frame)
+                    if message is None:
+                        continue
+                    opcode, payload = message
+                    self.messages.wait_writable()
+                    if self.stream_messages or opcode == Frame.TEXT:
+                        self.messages.put(payload)
+                    else:
+                        self.messages.put(bytes(payload))
                 case Frame.PING:
-                    self.pong()
+                    # Nothing more may be sent after our close frame
+                    if not self._close_sent:
+                        self.pong(bytes(frame.payload))
+                case Frame.PONG:
+                    self._on_pong(frame.payload)
                 case Frame.CLOSE:
-                    self.close()
+                    self.close_code, self.close_reason = parse_close(
+                        bytes(frame.payload)
+                    )
+                    self._close_received = True
+                    # Answer with the same status, unless this answers our close frame
+                    self._send_close(frame.payload[:2])
+                    return
+
+    def _on_pong(self, payload: bytes) -> None:
+        # Any pong shows the peer is alive, but only the answer to the last keepalive
+        # ping can be timed
+        self.missed_pongs = 0
+        ping = self._ping
+        if ping is None or payload != ping[0]:
+            return
+        self._ping = None
+        rtt = time.perf_counter() - ping[1]
+        self.last_rtt = rtt
+        # Smoothed like TCP's SRTT, RFC 6298
+        self.rtt = rtt if self.rtt is None else self.rtt * 0.875 + rtt * 0.125
+
+    def _evict(self, code: int, reason: str) -> None:
+        """
+        Closes the connection to a peer that stopped responding, without waiting on it:
+        the close frame is only sent if it fits in the socket buffer.
+        """
+        self.close_code = code
+        self._send_close(struct.pack("!H", code) + reason.encode(), block=False)
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _fail(self, code: int, reason: str) -> None:
+        """
+        Sends a close frame with the given status and stops reading from the connection.
+        """
+        self.close_code = code
+        self._send_close(struct.pack("!H", code) + reason.encode()[:123])
+
+    def _send_close(self, payload: bytes, block: bool = True) -> None:
+        """
+        Sends a close frame unless one was already sent, after which nothing more may be
+        sent. Without `block`, the frame is only sent if that can be done without
+        waiting.
+        """
+        self.shutdown = True
+        if self._close_sent:
+            return
+        try:
+            if block:
+                self._send_frame(Frame.CLOSE, payload)
+            else:
+                self._send_nowait(Frame.CLOSE, payload)
+        except OSError:
+            pass
 
     def send(self, msg: bytes) -> None:
         """
@@ -211,21 +636,24 @@ class WebSocket:
         Args:
             msg: The data to send.
         """
-        frame = Frame(
-            Frame.BINARY, msg, mask=os.urandom(4) if self.is_server else bytes()
-        )
-        self.conn.sendall(bytes(frame))
+        self._send_message(Frame.BINARY, msg)
 
-    def recv(self) -> bytes | None:
+    def recv(self, timeout: Optional[float] = None) -> bytes:
         """
-        Receive bytes from the WebSocket connection.
+        Receive bytes from the WebSocket connection, waiting for a binary message if
+        none has arrived yet.
+
+        Args:
+            timeout: The longest time to wait in seconds, or None to wait forever.
 
         Returns:
             bytes: The binary data received from the connection.
+
+        Raises:
+            TimeoutError: If no binary message arrived within `timeout`.
+            ConnectionError: If the connection closed with no binary message left.
         """
-        if len(self.bin_msgs) == 0:
-            return None
-        return self.bin_msgs.pop(0)
+        return self.messages.get(bytes, timeout)
 
     def send_text(self, msg: str):
         """
@@ -234,24 +662,458 @@ class WebSocket:
         Args:
             msg: The text data to send.
         """
-        frame = Frame(
-            Frame.TEXT, msg.encode(), mask=os.urandom(4) if self.is_server else bytes()
-        )
-        self.conn.sendall(bytes(frame))
+        self._send_message(Frame.TEXT, msg.encode())
 
-    def recv_text(self) -> str:
+    def recv_text(self, timeout: Optional[float] = None) -> str | RawText:
         """
-        Receive text from the WebSocket connection.
+        Receive text from the WebSocket connection, waiting for a text message if none
+        has arrived yet.
+
+        Args:
+            timeout: The longest time to wait in seconds, or None to wait forever.
 
         Returns:
-            str: The binary data received from the connection.
+            str | RawText: The text received from the connection, as `RawText` when
+                    the connection was created with `raw_text=True`.
+
+        Raises:
+            TimeoutError: If no text message arrived within `timeout`.
+            ConnectionError: If the connection closed with no text message left.
         """
-        while len(self.str_msgs) == 0:
-            time.sleep(0.25)
-        return self.str_msgs.pop(0)
+        if not self._queue_raw:
+            return self.messages.get(str, timeout)
+        return self._text(self.messages.get(RawText, timeout))
 
-    def close(self):
-        self.listen_thread.join()
+    def recv_message(self, timeout: Optional[float] = None) -> str | bytes:
+        """
+        Receive the next message from the WebSocket connection, whether text or binary,
+        in the order they arrived.
+
+        Args:
+            timeout: The longest time to wait in seconds, or None to wait forever.
+
+        Returns:
+            str | bytes: The message, `str` for text messages, or `RawText` in raw
+                    text mode, and `bytes` for binary ones.
+
+        Raises:
+            TimeoutError: If no message arrived within `timeout`.
+            ConnectionError: If the connection closed with no message left.
+        """
+        return self._text(self.messages.get(None, timeout))
+
+    def send_obj(self, obj) -> None:
+        """
+        Send an object, encoded with the codec of the negotiated subprotocol, or as
+        JSON if it has none.
+
+        Args:
+            obj: The object to send.
+        """
+        obj_codec = self.codec or codec.JSON
+        self._send_message(obj_codec.opcode, obj_codec.encode(obj))
+
+    def recv_obj(self, timeout: Optional[float] = None):
+        """
+        Receive the next message and decode it with the codec of the negotiated
+        subprotocol, or as JSON if it has none. Text is parsed from the received bytes
+        when the subprotocol has a codec or raw text mode is on.
+
+        Args:
+            timeout: The longest time to wait in seconds, or None to wait forever.
+
+        Returns:
+            The decoded object
+
+        Raises:
+            ValueError: If the message couldn't be decoded, or the connection was
+                    created with `stream_messages=True`.
+            TimeoutError: If no message arrived within `timeout`.
+            ConnectionError: If the connection closed with no message left.
+        """
+        if self.stream_messages:
+            raise ValueError("recv_obj() isn't available with stream_messages=True")
+        return (self.codec or codec.JSON).decode(self.messages.get(None, timeout))
+
+    def recv_stream(self, timeout: Optional[float] = None) -> MessageStream:
+        """
+        Receive the next message as a stream of its fragments, only available when the
+        connection was created with `stream_messages=True`.
+
+        Args:
+            timeout: The longest time to wait for the message to start, in seconds, or
+                    None to wait forever.
+
+        Returns:
+            MessageStream: An iterable yielding the payload of each fragment as it
+                    arrives, with `is_text` telling text and binary messages apart.
+
+        Raises:
+            TimeoutError: If no message started within `timeout`.
+            ConnectionError: If the connection closed with no message left.
+        """
+        if not self.stream_messages:
+            raise ValueError("recv_stream() requires stream_messages=True")
+        return self.messages.get(MessageStream, timeout)
+
+    def send_stream(
+        self,
+        chunks: Iterable[bytes | str],
+        text: bool = False,
+        fragment_size: Optional[int] = None,
+    ) -> None:
+        """
+        Send one message made of every chunk in `chunks`, as fragments of
+        `fragment_size` bytes sent while the chunks are produced, so the whole message
+        is never held in memory.
+
+        Args:
+            chunks: The pieces of the message, `str` chunks are encoded as UTF-8.
+            text: Whether to send a text message rather than a binary one.
+            fragment_size: The payload size of each fragment. Defaults to the
+                    connection's `fragment_size`.
+        """
+        opcode = Frame.TEXT if text else Frame.BINARY
+        deflate = self.deflate
+        with self._message_lock:
+            pending = None
+            for fragment in _fragments(chunks, fragment_size or self.fragment_size):
+                if pending is not None:
+                    if deflate is not None:
+                        pending = deflate.compress_fragment(pending, fin=False)
+                    self._send_frame(
+                        opcode,
+                        pending,
+                        fin=False,
+                        rsv1=deflate is not None and opcode != Frame.CONTINUE,
+                    )
+                    opcode = Frame.CONTINUE
+                pending = fragment
+            if pending is None:
+                pending = bytes()
+            if deflate is not None:
+                pending = deflate.compress_fragment(pending, fin=True)
+            self._send_frame(
+                opcode, pending, rsv1=deflate is not None and opcode != Frame.CONTINUE
+            )
+
+    def send_file(self, path: str, fragment_size: Optional[int] = None) -> None:
+        """
+        Send the contents of a file as one binary message, read and sent a fragment at
+        a time.
+
+        Args:
+            path: The path of the file to send.
+            fragment_size: The payload size of each fragment. Defaults to the
+                    connection's `fragment_size`.
+        """
+        fragment_size = fragment_size or self.fragment_size
+        with open(path, "rb") as f:
+            self.send_stream(
+                iter(lambda: f.read(fragment_size), b""), fragment_size=fragment_size
+            )
+
+    def try_recv(self) -> str | bytes | None:
+        """
+        Receive the next message from the WebSocket connection without waiting.
+
+        Returns:
+            str | bytes | None: The message, or None if no message has arrived.
+        """
+        return self._text(self.messages.get_nowait())
+
+    def _text(self, msg):
+        # Text queued as bytes for `recv_obj()` is decoded unless raw text was asked for
+        if type(msg) is RawText and not self.raw_text:
+            return msg.decode()
+        return msg
+
+    def ping(self, payload: bytes = bytes()) -> None:
+        """
+        Send a ping control frame, the peer should answer with a pong.
+
+        Args:
+            payload: Up to 125 bytes of application data, echoed back in the pong.
+        """
+        self._send_control(Frame.PING, payload)
+
+    def pong(self, payload: bytes = bytes()) -> None:
+        """
+        Send a pong control frame.
+
+        Args:
+            payload: Up to 125 bytes of application data, usually that of the ping
+                    being answered.
+        """
+        self._send_control(Frame.PONG, payload)
+
+    def send_many(self, messages: Iterable[bytes | str]) -> None:
+        """
+        Send many messages at once, binary for `bytes` and text for `str`, written
+        together with as few system calls as possible instead of one per message.
+
+        Args:
+            messages: The messages to send, in order.
+        """
+        deflate = self.deflate
+        with self._message_lock:
+            frames = []
+            for msg in messages:
+                if isinstance(msg, str):
+                    opcode, payload = Frame.TEXT, msg.encode()
+                else:
+                    opcode, payload = Frame.BINARY, msg
+                if deflate is not None and len(payload) >= deflate.threshold:
+                    frames.append(
+                        self._frame(opcode, deflate.compress(payload), rsv1=True)
+                    )
+                else:
+                    frames.append(self._frame(opcode, payload))
+            if frames:
+                self._send_frames(frames)
+
+    def flush(self) -> None:
+        """
+        Write any frames held back by corking now.
+        """
+        with self._send_lock:
+            self._flush_locked()
+
+    def _send_control(self, opcode: int, payload: bytes) -> None:
+        if len(payload) > 125:
+            raise ValueError("Control frame payloads must be at most 125 bytes")
+        self._send_frame(opcode, payload)
+
+    def _send_message(self, opcode: int, payload: bytes) -> None:
+        with self._message_lock:
+            if self.deflate is not None and len(payload) >= self.deflate.threshold:
+                self._send_frame(opcode, self.deflate.compress(payload), rsv1=True)
+            else:
+                self._send_frame(opcode, payload)
+
+    def _frame(
+        self, opcode: int, payload: bytes, fin: bool = True, rsv1: bool = False
+    ) -> Frame:
+        return Frame(
+            opcode,
+            payload,
+            mask=bytes() if self.is_server else os.urandom(4),
+            fin=fin,
+            rsv1=rsv1,
+        )
+
+    def _send_frame(
+        self, opcode: int, payload: bytes, fin: bool = True, rsv1: bool = False
+    ) -> None:
+        self._send_frames([self._frame(opcode, payload, fin, rsv1)])
+
+    def _send_frames(self, frames: list[Frame]) -> None:
+        """
+        Writes frames, or holds them back if the connection is corked. Control frames
+        are never held back, and take any held frames with them.
+        """
+        started = time.perf_counter() if self.hooks is not None else 0.0
+        last = frames[-1].opcode
+        with self._send_lock:
+            if self._close_sent:
+                raise ConnectionError("WebSocket connection is closing")
+            self._close_sent = last == Frame.CLOSE
+            if len(frames) == 1 and not self.cork and not self._outbox:
+                size = frames[0].length
+                sendmsg_all(self.conn, frames[0].buffers())
+            else:
+                outbox = self._outbox
+                was_empty = not outbox
+                size = 0
+                for frame in frames:
+                    outbox += frame.buffers()
+                    size += frame.length
+                self._outbox_size += size
+                if (
+                    not self.cork
+                    or last >= Frame.CLOSE
+                    or self._outbox_size >= self.cork_bytes
+                ):
+                    self._flush_locked()
+                elif was_empty:
+                    self._flush_due.notify()
+            self.frames_out += len(frames)
+            self.bytes_out += size
+        if self.hooks is not None:
+            seconds = time.perf_counter() - started
+            for frame in frames:
+                self.hooks.on_frame_out(self, frame.opcode, frame.length, seconds)
+
+    def _flush_locked(self) -> None:
+        outbox = self._outbox
+        if not outbox:
+            return
+        self._outbox = []
+        self._outbox_size = 0
+        self._partial = False
+        sendmsg_all(self.conn, outbox)
+
+    def _start_flusher(self) -> None:
+        self._flusher = threading.Thread(
+            target=WebSocket._run_flusher, daemon=True, args=(self,)
+        )
+        self._flusher.start()
+
+    def _hold_tail(self, data: memoryview) -> None:
+        """
+        Keeps the part of a frame a non-blocking send couldn't write, for the flusher
+        to finish on its own thread. Called with the send lock held.
+        """
+        self._outbox.append(data)
+        self._outbox_size += len(data)
+        self._partial = True
+        if self._flusher is None:
+            self._start_flusher()
+        else:
+            self._flush_due.notify()
+
+    def _run_flusher(self) -> None:
+        # Runs on corked connections, and on others once a non-blocking send leaves
+        # part of a frame unwritten
+        while True:
+            with self._flush_due:
+                while not self._outbox:
+                    if self.shutdown:
+                        return
+                    self._flush_due.wait()
+            # Part of a frame is written at once, only whole frames are held back
+            if self.cork and not self._partial:
+                time.sleep(self.cork_interval)
+            try:
+                self.flush()
+            except OSError:
+                return
+
+    def _send_nowait(self, opcode: int, payload: bytes) -> bool:
+        """
+        Sends a small frame only if it can be done without waiting, on another send
+        or for room in the socket buffer. Returns whether it was sent. Whatever of it
+        doesn't fit is left to the flusher thread.
+        """
+        data = bytes(self._frame(opcode, payload))
+        if not self._send_lock.acquire(blocking=False):
+            return False
+        try:
+            if self._close_sent:
+                return False
+            if self._outbox:
+                # Held back frames go first, to keep the frames in order
+                data = b"".join(self._outbox) + data
+            sent = send_nowait(self.conn, data)
+            self._outbox = []
+            self._outbox_size = 0
+            self._close_sent = opcode == Frame.CLOSE
+            if sent < len(data):
+                self._hold_tail(memoryview(data)[sent:])
+        except OSError:
+            return False
+        finally:
+            self._send_lock.release()
+        self.frames_out += 1
+        self.bytes_out += len(payload)
+        if self.hooks is not None:
+            self.hooks.on_frame_out(self, opcode, len(payload), 0.0)
+        return True
+
+    def _send_shared(self, frame: Frame, data: bytes, block: bool) -> bool:
+        """
+        Sends a frame serialized once for many connections, as done by
+        `WebSocketServer.broadcast()`. Without `block`, gives up and returns False if
+        another message is being sent, part of an earlier frame is still unwritten or
+        none of the frame fits in the socket buffer. Once part of it is written, the
+        rest is left to the flusher thread rather than waited for. A corked connection
+        holds the frame back instead, and without `block` refuses it once `cork_bytes`
+        are held.
+        """
+        started = time.perf_counter() if self.hooks is not None else 0.0
+        if not self._message_lock.acquire(blocking=block):
+            return False
+        try:
+            # The flusher holds the send lock while it waits on the peer
+            if not self._send_lock.acquire(blocking=block):
+                return False
+            try:
+                if self._close_sent:
+                    return False
+                if self.cork:
+                    if not block and self._outbox_size >= self.cork_bytes:
+                        return False
+                    self._outbox.append(data)
+                    self._outbox_size += len(data)
+                    if block and self._outbox_size >= self.cork_bytes:
+                        self._flush_locked()
+                    elif len(self._outbox) == 1:
+                        self._flush_due.notify()
+                elif block:
+                    self._outbox.append(data)
+                    self._flush_locked()
+                else:
+                    if self._outbox:
+                        return False
+                    try:
+                        sent = send_nowait(self.conn, data)
+                    except BlockingIOError:
+                        return False
+                    if sent < len(data):
+                        self._hold_tail(memoryview(data)[sent:])
+                self.frames_out += 1
+                self.bytes_out += len(frame.payload)
+            finally:
+                self._send_lock.release()
+        finally:
+            self._message_lock.release()
+        if self.hooks is not None:
+            self.hooks.on_frame_out(
+                self, frame.opcode, len(frame.payload), time.perf_counter() - started
+            )
+        return True
+
+    def close(self, code: int = 1000, reason: str = "") -> None:
+        """
+        Closes the connection with the closing handshake: sends a close frame, waits up
+        to `close_timeout` for the peer's close frame in answer, then closes the socket.
+        Messages that arrive meanwhile can still be received. Does nothing more if the
+        connection is already closed.
+
+        Args:
+            code: The close status code to send. Defaults to 1000, a normal closure.
+            reason: Why the connection is closing, at most 123 bytes once encoded.
+                    Defaults to none.
+
+        Raises:
+            ValueError: If the reason is too long.
+        """
+        payload = struct.pack("!H", code) + reason.encode()
+        if len(payload) > 125:
+            raise ValueError("Close reasons must be at most 123 bytes")
+        self._send_close(payload)
+        if threading.current_thread() is self.listen_thread:
+            return
+        self.listen_thread.join(self.close_timeout)
+        self._abort()
+
+    def _abort(self) -> None:
+        """
+        Closes the socket, stopping the listener first if it is still waiting on the
+        peer.
+        """
+        self.shutdown = True
+        flusher = self._flusher
+        if self.listen_thread.is_alive() or (flusher and flusher.is_alive()):
+            # Wakes the listener, and the flusher if it's waiting on the peer
+            try:
+                self.conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            # Wakes the listener if it's waiting for room in a full queue
+            self.messages.close()
+            if threading.current_thread() is not self.listen_thread:
+                self.listen_thread.join()
         self.conn.close()
 
     def __enter__(self):
@@ -267,39 +1129,360 @@ class WebSocketServer:
         addr: tuple[str, int] = ("", 80),
         protocols: list[str] = [],
         extensions: list[str] = [],
+        workers: int = 1,
+        drain_timeout: float = 30.0,
+        slow_policy: str = "skip",
+        handshake_timeout: float = 10.0,
+        idle_timeout: Optional[float] = None,
+        ssl_context: Optional[ssl.SSLContext] = None,
+        **options,
     ) -> None:
-        self.connections: list[WebSocket] = []
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.sock.bind(addr)
-        self.sock.listen()
+        """
+        Constructs a new WebSocketServer.
+
+        Args:
+            addr: The address to listen on. Defaults to ("", 80).
+            protocols: The subprotocols served, in order of preference. Each connection
+                    speaks the first its client offers, or none. Defaults to [].
+            extensions: A list of extensions on top of the WebSocket connection. Defaults to [].
+            workers: The number of processes to serve from. With more than one, nothing
+                    is bound until `serve_forever()` forks the workers, which each bind
+                    `addr` with SO_REUSEPORT so the kernel spreads connections between
+                    them. Defaults to 1.
+            drain_timeout: How long, in seconds, connections may take to finish when the
+                    server is shut down with SIGTERM. Defaults to 30.
+            slow_policy: What `broadcast()` and `publish()` do with a connection that
+                    can't take a message without blocking: "skip" it for that message,
+                    "drop" it by shutting its socket down, or "block" until it can.
+                    Defaults to "skip".
+            handshake_timeout: How long, in seconds, a client has to send its opening
+                    handshake before it is disconnected. Defaults to 10.
+            idle_timeout: How long, in seconds, a connection may go without receiving
+                    anything before `serve_forever()` closes it with status 1001.
+                    Defaults to no limit.
+            ssl_context: A server side TLS context to serve `wss://` with, such as one
+                    from `tls.server_context()`, which issues session tickets. Create
+                    it before the server so forked workers share its ticket keys.
+                    Defaults to plain `ws://`.
+            options: Keyword arguments passed on to each `WebSocket`, such as `max_queue`.
+        """
+        self.connections = ConnectionRegistry()
+        self.addr = addr
         self.protocols = protocols
         self.extensions = extensions
+        self.workers = workers
+        self.drain_timeout = drain_timeout
+        if slow_policy not in ("skip", "drop", "block"):
+            raise ValueError(f"Unknown slow_policy: {slow_policy}")
+        self.slow_policy = slow_policy
+        self.handshake_timeout = handshake_timeout
+        self.idle_timeout = idle_timeout
+        self.ssl_context = ssl_context
+        self.acceptor: Optional[Acceptor] = None
+        self.options = options
+        self.topics: dict[str, set[WebSocket]] = {}
+        self._topics_lock = threading.Lock()
+        self.supervisor: Optional[Supervisor] = None
+        self.sock: Optional[socket.socket] = None
+        self._active = 0
+        self._active_lock = threading.Lock()
+        self._serving = False
+        self._worker_index: Optional[int] = None
+        if workers > 1:
+            self.supervisor = Supervisor(self._run_worker, workers, drain_timeout)
+        else:
+            self.sock = self._listen(reuse_port=False)
 
-    def accept(self) -> WebSocket | None:
-        conn, _addr = self.sock.accept()
-        data = conn.recv(2048)
-        if not data:
-            conn.close()
-            return None
-        req = Request.parse(data.decode("utf-8"))
+    def _listen(self, reuse_port: bool) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(self.addr)
+        sock.listen(1024)
+        return sock
+
+    def accept(self, timeout: Optional[float] = None) -> WebSocket:
+        """
+        Returns the next connection whose opening handshake has completed. Handshakes
+        are read concurrently on a background thread, started by the first call, so a
+        slow client doesn't hold up the others.
+
+        Args:
+            timeout: The longest time to wait in seconds, or None to wait forever.
+
+        Returns:
+            WebSocket: The upgraded connection
+
+        Raises:
+            TimeoutError: If no connection was upgraded within `timeout`.
+        """
+        if self.acceptor is None:
+            self.acceptor = Acceptor(
+                self.sock,
+                self._upgrade,
+                self.handshake_timeout,
+                ssl_context=self.ssl_context,
+            )
+            self.acceptor.start()
+        return self.acceptor.get(timeout)
+
+    def _upgrade(
+        self, conn: socket.socket, req: Request, buffered: bytes, started: float
+    ) -> Optional[WebSocket]:
         if not req.is_valid_ws():
-            conn.close()
             return None
         ws_key = req.headers[http.HEADER_WS_KEY]
-        res = Response.new_ws(ws_key)
+        deflate = find_deflate(self.extensions)
+        accepted = None
+        if deflate is not None:
+            accepted = deflate.accept(
+                [
+                    params
+                    for name, params in parse_extensions(
+                        req.headers.get(http.HEADER_WS_EXTENSIONS, "")
+                    )
+                    if name == deflate_name
+                ]
+            )
+        subprotocol = http.select_protocol(req.headers, self.protocols)
+        res = Response.new_ws(ws_key, [accepted[1]] if accepted else [], subprotocol)
         conn.sendall(str(res).encode("utf-8"))
 
         ws = WebSocket(
-            conn, is_server=True, protocols=self.protocols, extensions=self.extensions
+            conn,
+            is_server=True,
+            protocols=self.protocols,
+            extensions=self.extensions,
+            deflate=accepted[0] if accepted else None,
+            buffered=buffered,
+            registry=self.connections,
+            subprotocol=subprotocol,
+            handshake_seconds=time.monotonic() - started,
+            **self.options,
         )
-        self.connections.append(ws)
         return ws
 
-    def close(self):
-        for conn in self.connections:
-            conn.close()
+    def broadcast(
+        self, msg: bytes | str, connections: Optional[Iterable[WebSocket]] = None
+    ) -> int:
+        """
+        Sends a message to many connections, binary for `bytes` and text for `str`. The
+        frame is serialized once and the same buffer is written to every connection,
+        which is possible because server frames are unmasked. Connections that can't
+        take the message without blocking are handled by the server's `slow_policy`.
+
+        With more than one worker, only reaches the connections of the calling worker.
+
+        Args:
+            msg: The message to send.
+            connections: The connections to send to. Defaults to every connection
+                    accepted by this server.
+
+        Returns:
+            int: The number of connections the message was sent to
+        """
+        if isinstance(msg, str):
+            frame = Frame(Frame.TEXT, msg.encode())
+        else:
+            frame = Frame(Frame.BINARY, msg)
+        data = bytes(frame)
+        if connections is None:
+            connections = self.connections
+        block = self.slow_policy == "block"
+        count = 0
+        for ws in connections:
+            if ws.shutdown:
+                continue
+            try:
+                sent = ws._send_shared(frame, data, block)
+            except OSError:
+                sent = False
+            if sent:
+                count += 1
+            elif self.slow_policy == "drop":
+                self._drop(ws)
+        return count
+
+    def subscribe(self, ws: WebSocket, topic: str) -> None:
+        """
+        Adds a connection to the subscribers of a topic.
+
+        Args:
+            ws: The connection to subscribe.
+            topic: The topic to subscribe to.
+        """
+        with self._topics_lock:
+            self.topics.setdefault(topic, set()).add(ws)
+
+    def unsubscribe(self, ws: WebSocket, topic: Optional[str] = None) -> None:
+        """
+        Removes a connection from the subscribers of a topic.
+
+        Args:
+            ws: The connection to unsubscribe.
+            topic: The topic to unsubscribe from. Defaults to every topic.
+        """
+        with self._topics_lock:
+            for name in [topic] if topic is not None else list(self.topics):
+                subscribers = self.topics.get(name)
+                if subscribers is None:
+                    continue
+                subscribers.discard(ws)
+                if not subscribers:
+                    del self.topics[name]
+
+    def publish(self, topic: str, msg: bytes | str) -> int:
+        """
+        Sends a message to every subscriber of a topic, like `broadcast()`.
+
+        Args:
+            topic: The topic to publish to.
+            msg: The message to send, binary for `bytes` and text for `str`.
+
+        Returns:
+            int: The number of subscribers the message was sent to
+        """
+        with self._topics_lock:
+            subscribers = list(self.topics.get(topic, ()))
+        return self.broadcast(msg, subscribers)
+
+    def _drop(self, ws: WebSocket) -> None:
+        self.unsubscribe(ws)
+        try:
+            ws.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def serve_forever(
+        self, handler: Callable[[WebSocket], None], poll_interval: float = 0.5
+    ) -> None:
+        """
+        Accepts connections until `shutdown()` is called, running `handler` on its own
+        thread for each one. With more than one worker, this forks the workers and
+        supervises them instead, restarting any that crash, until SIGTERM or SIGINT has
+        each worker stop accepting and wait up to `drain_timeout` for its connections.
+
+        Args:
+            handler: Called with each new connection, the connection is closed once
+                    it returns.
+            poll_interval: How often, in seconds, to check if the server was shut down.
+        """
+        if self.supervisor is not None and self._worker_index is None:
+            self._handler = handler
+            self.supervisor.run()
+            return
+        self._serving = True
+        while self._serving:
+            if self.idle_timeout is not None:
+                self.close_idle(self.idle_timeout)
+            try:
+                ws = self.accept(timeout=poll_interval)
+            except TimeoutError:
+                continue
+            self._add_active(1)
+            threading.Thread(
+                target=self._run_handler, args=(handler, ws), daemon=True
+            ).start()
+
+    def close_idle(self, timeout: float) -> int:
+        """
+        Closes every connection that hasn't received anything for `timeout` seconds,
+        with status 1001, without waiting on their peers. Only the idle connections
+        are looked at.
+
+        Args:
+            timeout: The idle time, in seconds, after which connections are closed.
+
+        Returns:
+            int: The number of connections closed
+        """
+        idle = self.connections.idle(timeout)
+        for ws in idle:
+            self.unsubscribe(ws)
+            ws._evict(1001, "Idle timeout")
+        return len(idle)
+
+    def shutdown(self) -> None:
+        """
+        Makes `serve_forever()` stop accepting connections and return.
+        """
+        self._serving = False
+
+    def connection_count(self) -> int:
+        """
+        Gives the number of connections being handled by `serve_forever()`, across
+        every worker process.
+        """
+        if self.supervisor is not None and self._worker_index is None:
+            return self.supervisor.connection_count()
+        return self._active
+
+    def _run_handler(self, handler: Callable[[WebSocket], None], ws: WebSocket) -> None:
+        try:
+            handler(ws)
+        finally:
+            self._add_active(-1)
+            self.unsubscribe(ws)
+            ws.close()
+
+    def _add_active(self, delta: int) -> None:
+        with self._active_lock:
+            self._active += delta
+            if self._worker_index is not None:
+                self.supervisor.counts[self._worker_index] = self._active
+
+    def _run_worker(self, index: int) -> None:
+        self._worker_index = index
+        self.sock = self._listen(reuse_port=True)
+        signal.signal(signal.SIGTERM, lambda *_: self.shutdown())
+        self.serve_forever(self._handler)
+        self.drain(self.drain_timeout)
+
+    def _stop_accepting(self) -> None:
+        if self.acceptor is not None:
+            self.acceptor.close()
         self.sock.close()
 
+    def drain(self, timeout: float = 30.0) -> None:
+        """
+        Shuts the server down gracefully: stops accepting, sends every connection a
+        close frame with status 1001 Going Away, and waits up to `timeout` for their
+        closing handshakes to finish and for `serve_forever()` handlers to return.
+        Connections still open after that are dropped. With more than one worker, asks
+        every worker to drain within `drain_timeout` instead.
+
+        Args:
+            timeout: The longest time to wait, in seconds. Defaults to 30.
+        """
+        if self.supervisor is not None and self._worker_index is None:
+            self.supervisor.stop()
+            return
+        deadline = time.monotonic() + timeout
+        self.shutdown()
+        if self.sock is not None:
+            self._stop_accepting()
+        payload = struct.pack("!H", 1001) + b"Going away"
+        pending = list(self.connections)
+        while True:
+            # Close frames are sent without waiting, so one slow peer can't hold up
+            # the rest, and retried for connections that were busy sending
+            for ws in pending:
+                ws._send_close(payload, block=False)
+            pending = [ws for ws in pending if ws.listen_thread.is_alive()]
+            if (not pending and self._active == 0) or time.monotonic() >= deadline:
+                break
+            time.sleep(0.05)
+        for ws in self.connections:
+            ws._abort()
+
+    def close(self):
+        """
+        Stops accepting and closes every connection at once, sending each a close frame
+        if it can be sent without waiting. Use `drain()` to let them finish first.
+        """
+        if self.supervisor is None or self._worker_index is not None:
+            self.drain(0)
+
     def __enter__(self):
         return self
 
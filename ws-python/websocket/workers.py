@@ -0,0 +1,127 @@
+import os, signal, sys, time, traceback
+from multiprocessing.sharedctypes import RawArray
+from typing import Callable
+
+
+class Supervisor:
+    """
+    Forks worker processes and keeps them running: crashed workers are restarted, and
+    on SIGTERM or SIGINT every worker is asked to drain before the supervisor exits.
+
+    Workers share a block of memory with the supervisor where each one publishes its
+    number of open connections.
+    """
+
+    def __init__(
+        self,
+        target: Callable[[int], None],
+        workers: int,
+        drain_timeout: float = 30.0,
+        restart_delay: float = 1.0,
+    ) -> None:
+        """
+        Constructs a new Supervisor, call `run()` to start the workers.
+
+        Args:
+            target: Run in each worker process with the index of the worker, the
+                    worker exits when it returns.
+            workers: The number of worker processes to keep running.
+            drain_timeout: How long, in seconds, workers may take to finish after
+                    SIGTERM before they are killed. Defaults to 30.
+            restart_delay: The least time, in seconds, between restarts of the same
+                    worker, so a worker that crashes on startup doesn't spin. Defaults to 1.
+        """
+        self.target = target
+        self.workers = workers
+        self.drain_timeout = drain_timeout
+        self.restart_delay = restart_delay
+        self.counts = RawArray("q", workers)
+        self.pids: dict[int, int] = {}
+        self._started = [0.0] * workers
+        self._stopping = False
+
+    def connection_count(self) -> int:
+        """
+        Gives the number of open connections across every worker.
+        """
+        return sum(self.counts)
+
+    def run(self, poll_interval: float = 0.1) -> None:
+        """
+        Starts the workers and supervises them until they have all exited after a call
+        to `stop()`, a SIGTERM or a SIGINT. Must be called from the main thread.
+
+        Args:
+            poll_interval: How often, in seconds, to check on the workers.
+        """
+        handlers = {
+            sig: signal.signal(sig, lambda *_: self.stop())
+            for sig in (signal.SIGTERM, signal.SIGINT)
+        }
+        try:
+            for index in range(self.workers):
+                self._spawn(index)
+            deadline = None
+            while self.pids:
+                if self._stopping and deadline is None:
+                    deadline = time.monotonic() + self.drain_timeout
+                    self._signal_all(signal.SIGTERM)
+                elif deadline is not None and time.monotonic() > deadline:
+                    self._signal_all(signal.SIGKILL)
+                self._reap()
+                time.sleep(poll_interval)
+        finally:
+            for sig, handler in handlers.items():
+                signal.signal(sig, handler)
+
+    def stop(self) -> None:
+        """
+        Asks every worker to drain and exit.
+        """
+        self._stopping = True
+
+    def _spawn(self, index: int) -> None:
+        self.counts[index] = 0
+        self._started[index] = time.monotonic()
+        pid = os.fork()
+        if pid != 0:
+            self.pids[pid] = index
+            return
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        code = 0
+        try:
+            self.target(index)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    def _reap(self) -> None:
+        while self.pids:
+            try:
+                pid, _status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.pids.clear()
+                return
+            if pid == 0:
+                return
+            index = self.pids.pop(pid, None)
+            if index is None:
+                continue
+            self.counts[index] = 0
+            if not self._stopping:
+                delay = self._started[index] + self.restart_delay - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                self._spawn(index)
+
+    def _signal_all(self, sig: int) -> None:
+        for pid in self.pids:
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass